@@ -1,80 +1,9 @@
 import tkinter as tk
 from tkinter import Canvas, Entry, Label, Button, Frame, OptionMenu, StringVar, Checkbutton
 from tkinter.font import Font
-import random
 import math
-
-class Crop:
-    """Represents a crop with various attributes and methods to manage its state."""
-    def __init__(self, id, color, harvestable, plot_id, tier_one, tier_two, tier_three, tier_four):
-        """Initialize a new crop with specific attributes."""
-        self.id = id  # Unique identifier for the crop
-        self.color = color  # Visual representation color for the crop
-        self.harvestable = harvestable  # Status indicating if the crop can be harvested
-        self.plot_id = plot_id  # Identifier for the plot this crop belongs to
-        self.tier_one = tier_one  # First tier value influencing the crop's output
-        self.tier_two = tier_two  # Second tier value
-        self.tier_three = tier_three  # Third tier value
-        self.tier_four = tier_four  # Fourth tier value
-        self.initial_state = (harvestable, tier_one, tier_two, tier_three, tier_four)  # Save initial state for reset
-
-    def reset(self):
-        """Reset the crop to its initial state."""
-        self.harvestable, self.tier_one, self.tier_two, self.tier_three, self.tier_four = self.initial_state
-
-    def __repr__(self):
-        """Provide a string representation of the crop for debugging and logging purposes."""
-        return (f"Crop(ID={self.id}, Color={self.color}, Harvestable={self.harvestable}, "
-                f"PlotID={self.plot_id}, TierOne={self.tier_one}, TierTwo={self.tier_two}, "
-                f"TierThree={self.tier_three}, TierFour={self.tier_four})")
-
-def simulate_process(crops, permutation, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1=5, p2=20, p3=25, iterations=10000):
-    """Simulate the crop processing to calculate average and variance of seed counts."""
-    seed_counts = []
-    p1 /= 100.0  # Convert percentage probability to decimal for calculation
-    p2 /= 100.0
-    p3 /= 100.0
-    for _ in range(iterations):  # Loop through each simulation iteration
-        for crop in crops:
-            crop.reset()  # Reset crops to initial state before each simulation run
-        seed_count = 0       # Sets the seed count to 0 for the start of the iteration
-        for crop_id in permutation:  # Process each crop based on the permutation of IDs
-            current_crop = next((crop for crop in crops if crop.id == crop_id), None)
-            if current_crop and current_crop.harvestable:
-                current_crop.harvestable = 0  # Mark crop as non-harvestable after processing
-                # Check for adjacency effects within the same plot
-                for other_crop in [c for c in crops if c.plot_id == current_crop.plot_id and c.id != current_crop.id]:
-                    if random.random() < 0.4:
-                        other_crop.harvestable = 0
-                # Calculate seed addition based on crop tier values and multipliers
-                addition = current_crop.tier_two + t3_mult * current_crop.tier_three + t4_mult * current_crop.tier_four
-                # Apply color-specific multipliers
-                if current_crop.color == 'Yellow':
-                    addition *= vivid_mult
-                if current_crop.color == 'Blue':
-                    addition *= primal_mult
-                if current_crop.color == 'Purple':
-                    addition *= wild_mult
-                seed_count += addition
-
-                # Additional effects on other crops based on tier probabilities
-                for other_crop in [c for c in crops if c.harvestable == 1 and c.color != current_crop.color]:
-                    T3Success = sum(random.random() < p1 for _ in range(other_crop.tier_three))
-                    other_crop.tier_four += T3Success
-
-                    T2Success = sum(random.random() < p2 for _ in range(other_crop.tier_two))
-                    other_crop.tier_three += T2Success - T3Success
-
-                    T1Success = sum(random.random() < p3 for _ in range(other_crop.tier_one))
-                    other_crop.tier_two += T1Success - T2Success
-
-                    other_crop.tier_one -= T1Success
-
-        seed_counts.append(seed_count)  # Record seed count separately for this iteration so the value can be reset
-
-    average_seed_count = sum(seed_counts) / len(seed_counts)  # Calculate average seed count
-    variance = sum((x - average_seed_count) ** 2 for x in seed_counts) / len(seed_counts)  # Calculate variance
-    return average_seed_count, variance
+import multiprocessing
+from harvest_core import Crop, exact_process, ProgressiveSearch, price_multipliers, ProgressiveSimulation, OrderCache, order_key, adjacent_swaps
 
 class DraggableIcon:
     def __init__(self, canvas, crop, slot_x):
@@ -264,6 +193,13 @@ class Application(tk.Frame):
         self.crops = []
         self.next_id = 1
         self.icons = []
+        self.pool = None  # Worker processes for the simulation, started on first use and kept for the rest of the session
+        self.evaluation = None  # The ProgressiveSimulation currently running, if any
+        self.search = None  # The ProgressiveSearch behind the Find Best Order window, if one is running
+        self.result_cache = OrderCache(maxsize=256)  # (grove, order, settings, exact) -> (mean, variance) of finished evaluations
+        self.speculation = None  # (key, ProgressiveSimulation) of the neighbouring order being precomputed in the background
+        self.speculation_queue = []  # Neighbouring orders still to precompute, as (key, permutation)
+        self.speculation_generation = 0  # Bumped whenever speculation restarts, so stale after() callbacks know to stop
 
     def create_widgets(self):
         # Main frame for input fields arranged in a trapezoid
@@ -358,6 +294,14 @@ class Application(tk.Frame):
         self.add_button.pack(side='left', anchor='nw', padx=(10, 0))
         self.confirm_button = Button(button_frame, text="Simulate Harvest Order", command=self.confirm_arrangement)
         self.confirm_button.pack(side='left', anchor='nw', padx=(30, 0))
+        self.exact_mode = tk.BooleanVar(value=True)  # Exact expected value instead of 10,000 Monte Carlo runs
+        self.exact_checkbox = Checkbutton(button_frame, text="Exact", variable=self.exact_mode)
+        self.exact_checkbox.pack(side='left', padx=(2, 0))
+        Label(button_frame, text="ms:").pack(side='left', padx=(2, 0))
+        self.time_budget_entry = Entry(button_frame, width=5)  # Optional time budget for the simulation, blank runs all 10,000 iterations
+        self.time_budget_entry.pack(side='left')
+        self.best_order_button = Button(button_frame, text="Find Best Order", command=self.find_best_arrangement)
+        self.best_order_button.pack(side='left', padx=(5, 0))
         self.resetperm_button = Button(button_frame, text="Clear Current Order", command=self.add_all_crops)
         self.resetperm_button.pack(side='left', padx=(5, 0))  # Adjust location as needed
         self.clear_button = Button(button_frame, text="Clear Tier Counts", command=self.clear_tier_entries)
@@ -387,6 +331,7 @@ class Application(tk.Frame):
 
     def add_all_crops(self):
         # Clear existing crops and icons, including shadow texts
+        self.stop_speculation()  # Neighbouring orders of the old grove aren't worth finishing
         self.crops.clear()
         DraggableIcon.nonoslots.clear()
         for icon in self.icons:
@@ -434,29 +379,169 @@ class Application(tk.Frame):
                 self.icons.append(icon)
                 self.next_id += 1
 
-    def confirm_arrangement(self):
-        # Sort icons based on their position to determine the user-defined order
-        sorted_icons = sorted(self.icons, key=lambda icon: self.canvas.coords(icon.icon)[0])
-        permutation = [icon.crop.id for icon in sorted_icons]  # This keeps the permutation logic intact
-        icon_order = [self.canvas.itemcget(icon.text, 'text') for icon in sorted_icons]  # Get the icon labels
-
+    def read_settings(self):
+        # Reads the settings entries and turns the lifeforce prices into color multipliers
         t3_mult = int(self.settings_entries[0].get())  # Assuming index 0 is for T2 Mult
         t4_mult = int(self.settings_entries[1].get())  # Assuming index 1 is for T4 Mult
         vd_value = int(self.settings_entries[2].get())
         wd_value = int(self.settings_entries[3].get())
         pd_value= int(self.settings_entries[4].get())
 
-        # Calculate the new multipliers
-        max_value = max(vd_value, pd_value, wd_value)
-        vivid_mult = max_value / vd_value if vd_value != 0 else 0
-        primal_mult = max_value / pd_value if pd_value != 0 else 0
-        wild_mult = max_value / wd_value if wd_value != 0 else 0
+        vivid_mult, primal_mult, wild_mult = price_multipliers(vd_value, pd_value, wd_value)
+        return t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult
 
-        average_seed_count = simulate_process(self.crops, permutation, t3_mult=t3_mult, t4_mult=t4_mult,
-                                              wild_mult=wild_mult, vivid_mult=vivid_mult, primal_mult=primal_mult)
-        self.display_results(average_seed_count, icon_order)  # Pass icon_order instead of permutation
+    def confirm_arrangement(self):
+        # Sort icons based on their position to determine the user-defined order
+        sorted_icons = sorted(self.icons, key=lambda icon: self.canvas.coords(icon.icon)[0])
+        permutation = [icon.crop.id for icon in sorted_icons]  # This keeps the permutation logic intact
+        icon_order = [self.canvas.itemcget(icon.text, 'text') for icon in sorted_icons]  # Get the icon labels
+
+        settings = self.read_settings()
+        exact = self.exact_mode.get()
+        key = order_key(self.crops, permutation, settings, exact)
+
+        # Orders that were evaluated before, or precomputed while the user was dragging icons around, come straight from the cache
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            self.display_results(cached, icon_order, exact=exact)
+            self.speculate(permutation, settings, exact)
+            return
+
+        if exact:
+            self.stop_speculation()
+            average_seed_count = exact_process(self.crops, permutation, *settings)
+            self.result_cache.put(key, average_seed_count)
+            self.display_results(average_seed_count, icon_order, exact=True)  # Pass icon_order instead of permutation
+            self.speculate(permutation, settings, exact)
+            return
+
+        # Monte Carlo runs on the worker pool so the window stays responsive, the results window refines as chunks come back
+        self.cancel_evaluation()
+        budget = self.time_budget_entry.get().strip()
+        time_budget = float(budget) / 1000 if budget else None
+        evaluation = self.adopt_speculation(key, time_budget)
+        if evaluation is None:
+            evaluation = ProgressiveSimulation(self.get_pool(), list(self.crops), permutation, *settings, time_budget=time_budget)
+        self.stop_speculation()
+        self.evaluation = evaluation
+        self.show_progress(key, permutation, icon_order)
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool()
+        return self.pool
+
+    def show_progress(self, key, permutation, icon_order):
+        """Open a results window for the running simulation and keep refreshing it until the simulation is done."""
+        evaluation = self.evaluation
+        settings = key[2]
+        result_window = tk.Toplevel(self.master)
+        result_window.title("Simulation Results")
+        result_label = tk.Label(result_window, text="Simulating...")
+        result_label.pack(padx=20, pady=(20, 5))
+        cancel_button = Button(result_window, text="Cancel", command=evaluation.cancel)
+        cancel_button.pack(pady=(0, 10))
+        result_window.protocol("WM_DELETE_WINDOW", lambda: (evaluation.cancel(), result_window.destroy()))
+        result_window.geometry('+600+670')
 
-    def display_results(self, results, icon_order):
+        def refresh():
+            running = evaluation.poll()
+            if not result_window.winfo_exists():
+                if evaluation is self.evaluation:
+                    self.evaluation = None
+                return
+            average_seed_count, variance, count = evaluation.result()
+            if count:
+                status = "running" if running else ("stopped early" if count < evaluation.iterations else "done")
+                result_label.config(text=f"Average Seed Count: {average_seed_count:.1f} ± {math.sqrt(variance):.1f}\n"
+                                         f"{count:,} / {evaluation.iterations:,} iterations, {evaluation.elapsed * 1000:.0f} ms ({status})\n"
+                                         f"Harvest Order: {', '.join(icon_order)}")
+            if running:
+                self.after(50, refresh)
+            else:
+                cancel_button.config(state='disabled')
+                if not evaluation.cancelled:  # Only complete runs are cached, a cancelled or timed out estimate would be worse than a fresh one
+                    self.result_cache.put(key, (average_seed_count, variance))
+                if evaluation is self.evaluation:
+                    self.evaluation = None
+                    self.speculate(permutation, settings, exact=False)
+        refresh()
+
+    def adopt_speculation(self, key, time_budget):
+        """Take over the background run for key, if there is one, held to the same time budget as a fresh evaluation."""
+        if self.speculation is None or self.speculation[0] != key:
+            return None
+        evaluation = self.speculation[1]
+        self.speculation = None
+        # It has to be simulating exactly what key describes and still be usable, otherwise a fresh run is started instead.
+        # The GUI's settings stop before p1-p3, which the run fills in with their defaults
+        settings = evaluation.settings[:len(key[2])]
+        if evaluation.cancelled or order_key(evaluation.crops, evaluation.permutation, settings, False) != key:
+            evaluation.cancel()
+            return None
+        evaluation.limit_time(time_budget)  # The budget counts from the click, like it does for a fresh run
+        return evaluation
+
+    def cancel_evaluation(self):
+        if self.evaluation is not None:
+            self.evaluation.cancel()
+            self.evaluation = None
+
+    def speculate(self, permutation, settings, exact):
+        """Precompute every order one adjacent swap away from permutation while the GUI is idle, so trying one of them next is instant."""
+        self.stop_speculation()
+        crops = list(self.crops)
+        for order in adjacent_swaps(permutation):
+            key = order_key(crops, order, settings, exact)
+            if key not in self.result_cache:
+                self.speculation_queue.append((key, order))
+        generation = self.speculation_generation
+        self.after_idle(lambda: self.speculate_step(crops, settings, exact, generation))
+
+    def speculate_step(self, crops, settings, exact, generation):
+        """One step of the background precomputation, reschedules itself until the queue is empty or speculation is stopped."""
+        if generation != self.speculation_generation:
+            return
+        if self.evaluation is not None or self.search is not None:  # Never compete with a simulation or search the user is waiting on
+            self.after(100, lambda: self.speculate_step(crops, settings, exact, generation))
+            return
+        if self.speculation is not None:
+            key, evaluation = self.speculation
+            if evaluation.poll():
+                self.after(50, lambda: self.speculate_step(crops, settings, exact, generation))
+                return
+            average_seed_count, variance, _ = evaluation.result()
+            if not evaluation.cancelled:  # Same rule as a foreground run, only complete runs are cached
+                self.result_cache.put(key, (average_seed_count, variance))
+            self.speculation = None
+        if not self.speculation_queue:
+            return
+        key, order = self.speculation_queue.pop(0)
+        if exact:
+            self.result_cache.put(key, exact_process(crops, order, *settings))  # Milliseconds each, one per idle callback keeps the GUI responsive
+            self.after_idle(lambda: self.speculate_step(crops, settings, exact, generation))
+        else:
+            self.speculation = (key, ProgressiveSimulation(self.get_pool(), crops, order, *settings))
+            self.after(50, lambda: self.speculate_step(crops, settings, exact, generation))
+
+    def stop_speculation(self):
+        self.speculation_generation += 1
+        self.speculation_queue = []
+        if self.speculation is not None:
+            self.speculation[1].cancel()
+            self.speculation = None
+
+    def shutdown(self):
+        """Stop any running simulation and the worker pool before the window closes."""
+        self.stop_speculation()
+        self.cancel_evaluation()
+        self.cancel_search()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+        self.master.destroy()
+
+    def display_results(self, results, icon_order, exact=False):
         average_seed_count, variance = results
         standard_deviation = math.sqrt(variance)
         # Display the results and the icon order in a new window
@@ -464,13 +549,65 @@ class Application(tk.Frame):
         result_window.title("Simulation Results")
         formatted_average = f"{average_seed_count:.1f}"
         formatted_sd = f"{standard_deviation:.1f}"
-        result_label_text = f"Average Seed Count: {formatted_average} ± {formatted_sd}\nHarvest Order: {', '.join(icon_order)}"
+        label = "Expected Seed Count (exact)" if exact else "Average Seed Count"
+        result_label_text = f"{label}: {formatted_average} ± {formatted_sd}\nHarvest Order: {', '.join(icon_order)}"
         tk.Label(result_window, text=result_label_text).pack(padx=20, pady=20)
         result_window.geometry('+600+670')
 
-root = tk.Tk()
-custom_font = Font(family="Helvetica", size=12, weight="bold")
-root.geometry('780x600+800+200')
-root.title("Crop Rotation Simulator")
-app = Application(master=root)
-app.mainloop()
+    def find_best_arrangement(self):
+        """Search every harvest order for the current crops on the worker pool and list the best few once it's done."""
+        if not self.crops:
+            return
+        self.cancel_search()
+        self.stop_speculation()  # The search wants every core
+        labels = {icon.crop.id: self.canvas.itemcget(icon.text, 'text') for icon in self.icons}
+        search = self.search = ProgressiveSearch(self.get_pool(), list(self.crops), *self.read_settings(), top_n=5)
+
+        result_window = tk.Toplevel(self.master)
+        result_window.title("Best Harvest Orders")
+        result_label = tk.Label(result_window, text="Searching...", justify='left')
+        result_label.pack(padx=20, pady=(20, 5))
+        cancel_button = Button(result_window, text="Cancel", command=search.cancel)
+        cancel_button.pack(pady=(0, 10))
+        result_window.protocol("WM_DELETE_WINDOW", lambda: (search.cancel(), result_window.destroy()))
+        result_window.geometry('+600+670')
+
+        def refresh():
+            running = search.poll()
+            if not result_window.winfo_exists():
+                if search is self.search:
+                    self.search = None
+                return
+            if running:
+                stage = "verifying the best orders" if search.verifying is not None else f"{search.searched} / {search.subtrees} first crops searched"
+                result_label.config(text=f"Searching... {stage}, {search.elapsed:.1f} s")
+                self.after(50, refresh)
+                return
+            cancel_button.config(state='disabled')
+            if search is self.search:
+                self.search = None
+            if search.results is None:
+                result_label.config(text=f"Search cancelled after {search.elapsed:.1f} s")
+                return
+            lines = []
+            for rank, result in enumerate(search.results, start=1):
+                line = f"{rank}. {', '.join(labels[crop_id] for crop_id in result['order'])}: {result['mean']:.1f} ± {result['sd']:.1f}"
+                if result['ci']:
+                    line += f"  (95% CI {result['ci'][0]:.1f} - {result['ci'][1]:.1f})"
+                lines.append(line)
+            result_label.config(text="\n".join(lines))
+        refresh()
+
+    def cancel_search(self):
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+
+if __name__ == '__main__':  # Guarded so the search's worker processes can import this file without opening another window
+    root = tk.Tk()
+    custom_font = Font(family="Helvetica", size=12, weight="bold")
+    root.geometry('780x600+800+200')
+    root.title("Crop Rotation Simulator")
+    app = Application(master=root)
+    root.protocol("WM_DELETE_WINDOW", app.shutdown)
+    app.mainloop()
@@ -1,12 +1,29 @@
-import multiprocessing
+import queue
 import random
-import pandas as pd
+import json
 import time
 from copy import deepcopy
 from itertools import product
+from statistics import NormalDist
+from upgrade_kernel import upgrade_crop
+from compact_grove import CompactGrove, simulate_compact_iteration
+from random_streams import GroveStreams, derive_seed
+from grove_stats import GroveStats, TIER_NAMES, SCORE_NAMES
+from result_cache import ResultCache, config_key
+from stratified_grove_engine import run_stratified_simulation
+from harvest_profile import HarvestProfile, timed
+from sweep_executors import InProcessExecutor, PoolExecutor
+from result_sinks import ResultSink
+from time import perf_counter
+
+STRATEGY_VERSION = 3 # Bump whenever the harvest logic (or the draws a seed produces) changes, so results cached under the old logic stop being reused
+# 2: upgrades drawn from upgrade_kernel's alias tables
+# 3: the python engine stops upgrading crops outside the grove
 
 # Define a Crop and all of its in-game attributes, plus some special ones used for logical harvest ordering and/or data gathering
 class Crop:
+    colors = ('Yellow', 'Blue', 'Purple') # Duh. Shared by every crop instead of stored per instance
+
     def __init__(self, id, harvestable, plot_id, tier_one, tier_two, tier_three, tier_four, weights=None, neighbor=None):
         self.id = id
         self.harvestable = harvestable # Boolean tag indicating that a crop has yet to be harvested. Set to 0 after harvesting or with 40% odds after other crop in same plot is harvested
@@ -18,7 +35,6 @@ class Crop:
         self.neighbor = neighbor # Hardcoded 1:1 matching assignment for crops in the same plot, makes functions run faster by allowing easy access to neighboring crop's stats. 
         self.upgrade_count = 0  # Tracks how many upgrades a crop has received so far, used in reordering logic to determine if it is even worth deciding between two crops of the same color. Also for data gathering. 
         self.initial_state = (harvestable, tier_one, tier_two, tier_three, tier_four, 0) # Saves the initial state of the crop so that it can be reset for each new grove. 
-        self.colors = ['Yellow', 'Blue', 'Purple'] # Duh
         self.weights = weights # Used to set the weight of each color as program iterates through all 52 "unique" (assuming purple and blue are the same value) distributions of Atlas Points so they can be compared. 
         self.color = random.choices(self.colors, weights=self.weights, k=1)[0] # The internal function that randomizes the color of the crop according to the weights, used at the start of each new grove. 
         self.priority = None  # A dynamically assigned label used by the sorting algorithm to determine the inital planned harvesting order for each grove. 
@@ -67,8 +83,9 @@ def choose_crops_by_weight():
     return chosen_count 
 
 # Function that takes random grove conditions and generates strategic inital harvesting order
-def generate_color_based_permutation(crops_dict):
-    num_crops_to_include = choose_crops_by_weight()
+def generate_color_based_permutation(crops_dict, num_crops_to_include=None):
+    if num_crops_to_include is None:
+        num_crops_to_include = choose_crops_by_weight() # GrovePlanCache draws the plot count itself and passes it in
     included_crops = [crop for crop in crops_dict.values() if crop.id <= num_crops_to_include] # Shaves list of 10 hard coded crops down to whatever is relevant for the current grove based on how many plots it has. 
 
     blue_crops = []
@@ -139,13 +156,81 @@ def generate_color_based_permutation(crops_dict):
     '''
 
     return ordered_ids, yellow_crops
+
+# Memoized version of prioritization_process + generate_color_based_permutation.
+# Both only depend on the plot count and the colors of the crops in the grove, so each of those (at most 3^6 + 3^8 + 3^10 = 66,339 of them)
+# only gets bucketed once, and every later grove with the same colors just copies the stored priorities and order.
+# The plans are plain ids and labels, so they're shared by every crops dictionary with the same layout, including the copies in forked workers
+# when precompute() ran in the parent first.
+class GrovePlanCache:
+    shared_plans = {} # Layout (crop id, neighbor id pairs) -> {(plot count, colors) -> plan}
+
+    def __init__(self, crops_dict):
+        crops = list(crops_dict.values())
+        layout = tuple((crop.id, crop.neighbor.id) for crop in crops)
+        self.included = {}
+        for num_crops in (6, 8, 10):
+            included = [crop for crop in crops if crop.id <= num_crops]
+            if any(crop.neighbor.id > num_crops for crop in included):
+                raise ValueError("GrovePlanCache needs both crops of a plot to be in or out of the grove together")
+            self.included[num_crops] = included
+        self.crops_dict = crops_dict
+        self.plans = self.shared_plans.setdefault(layout, {})
+
+    def plan(self):
+        # Same result and same random draws as prioritization_process(crops_dict) + generate_color_based_permutation(crops_dict),
+        # except that crops outside the grove keep their old priority (nothing ever reads it)
+        num_crops = choose_crops_by_weight()
+        included = self.included[num_crops]
+        key = (num_crops, tuple([crop.color for crop in included]))
+        plan = self.plans.get(key)
+        if plan is None:
+            prioritization_process(self.crops_dict)
+            ordered_ids, yellow_crops = generate_color_based_permutation(self.crops_dict, num_crops)
+            plan = self.plans[key] = (tuple(crop.priority for crop in included), tuple(ordered_ids), tuple(yellow_crops))
+        else:
+            for crop, priority in zip(included, plan[0]):
+                crop.priority = priority
+        return list(plan[1]), plan[2] # The order gets rearranged during the harvest, so it's handed out as a fresh list
+
+    def precompute(self):
+        # Fills the table for every possible grove, about a second. Done before starting a Pool, forked workers start with all of it
+        saved_colors = [crop.color for crop in self.crops_dict.values()]
+        for num_crops, included in self.included.items():
+            for colors in product(Crop.colors, repeat=num_crops):
+                key = (num_crops, colors)
+                if key not in self.plans:
+                    for crop, color in zip(included, colors):
+                        crop.color = color
+                    prioritization_process(self.crops_dict)
+                    ordered_ids, yellow_crops = generate_color_based_permutation(self.crops_dict, num_crops)
+                    self.plans[key] = (tuple(crop.priority for crop in included), tuple(ordered_ids), tuple(yellow_crops))
+        for crop, color in zip(self.crops_dict.values(), saved_colors):
+            crop.color = color
     
-def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3):
+def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, legacy_upgrades=False, harvested_tiers=None, plan_cache=None, profile=None,
+                                      scores=None):
     #This is the meat of the simulation, the process that collects the randomly generated grove, and simulates harvesting each crop according to the initial order and any reordering decisions. 
+    #harvested_tiers (optional list of 9 zeros) collects the harvested T2/T3/T4 seeds per color, see grove_stats.TierTotals for why that's useful
+    #plan_cache (a GrovePlanCache for crops_dict) skips re-bucketing groves whose colors have been seen before, same results either way
+    #profile (a harvest_profile.HarvestProfile) gets the time spent in each phase and a count of every decision branch taken, see run_parallel_simulation's profile_file
+    #scores (optional list of 4 zeros) collects the grove's score for p1, p2, p3 and the 40% loss chance, see grove_stats.ScoreGradients
+    if profile is not None:
+        clock = perf_counter()
+        profile.counts['groves'] += 1
     for crop in crops_dict.values():
         crop.reset()
-    prioritization_process(crops_dict)
-    ordered_ids, yellow_crops = generate_color_based_permutation(crops_dict)
+    if profile is not None:
+        clock = timed(profile, 'reset', clock)
+        known_plans = len(plan_cache.plans) if plan_cache is not None else 0
+    if plan_cache is not None:
+        ordered_ids, yellow_crops = plan_cache.plan()
+    else:
+        prioritization_process(crops_dict)
+        ordered_ids, yellow_crops = generate_color_based_permutation(crops_dict)
+    if profile is not None:
+        clock = timed(profile, 'plan', clock)
+        profile.counts['plan_cache_misses'] += len(plan_cache.plans) - known_plans if plan_cache is not None else 1
     
     yellow_harvestable_crops = [
         crop_id for crop_id in yellow_crops if crops_dict[crop_id].harvestable == 1
@@ -155,6 +240,7 @@ def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult,
 
     seed_count = 0 #resets the value extracted from the grove to 0
     index = 0 #sets function to begining of initial harvest order. 
+    grove_crops = [crop for crop in crops_dict.values() if crop.id in ordered_ids] #Only the crops in this grove's plots get upgraded, the rest of the 10 aren't there
 
     while index < len(ordered_ids):
         crop_id = ordered_ids[index]
@@ -162,13 +248,21 @@ def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult,
 
         if current_crop and current_crop.harvestable:
             current_crop.harvestable = 0
+            if profile is not None:
+                profile.counts['harvests'] += 1
             if current_crop.color == 'Yellow' and current_crop.id in yellow_harvestable_crops:
                 yellow_harvestable_crops.remove(current_crop.id) #When the crop is harvested, it's toggled so that it can't be harvested or upgraded any more, and if it was yellow it is removed from the list of yellows remaining. 
                
             if current_crop.neighbor.harvestable == 1 and random.random() < 0.4:
+                if profile is not None:
+                    profile.counts['neighbor_losses'] += 1
                 current_crop.neighbor.harvestable = 0
                 if current_crop.neighbor.color == 'Yellow' and current_crop.neighbor.id in yellow_harvestable_crops:
                     yellow_harvestable_crops.remove(current_crop.neighbor.id) #The crop's neighbor is given a 40% chance of also being toggled off, and removed from the yellow list if appropriate. 
+                if scores is not None:
+                    scores[3] += 1 / 0.4
+            elif scores is not None and current_crop.neighbor.harvestable == 1:
+                scores[3] -= 1 / 0.6 #Neighbor survived its roll
                     
             addition = current_crop.tier_two + t3_mult * current_crop.tier_three + t4_mult * current_crop.tier_four
             if current_crop.color == 'Yellow':
@@ -178,6 +272,11 @@ def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult,
             elif current_crop.color == 'Purple':
                 addition *= wild_mult
             seed_count += addition 
+            if harvested_tiers is not None:
+                base = Crop.colors.index(current_crop.color) * 3
+                harvested_tiers[base] += current_crop.tier_two
+                harvested_tiers[base + 1] += current_crop.tier_three
+                harvested_tiers[base + 2] += current_crop.tier_four
             '''
             This is the step that adds the current "seed value" of the crop to the total. 
             This is a semi-arbitrary unit where T2 seeds are given a value of 1, T3 seeds a value of 25, and T4 seeds a value of 100.
@@ -192,20 +291,16 @@ def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult,
             There is no way to get more lifeforce from less seed value with the same amount of juice, so it serves as the best unit for comparison of harvesting strategies.
             '''
 
-            for other_crop in [c for c in crops_dict.values() if c.harvestable == 1 and c.color != current_crop.color]:
+            if profile is not None:
+                clock = timed(profile, 'harvest', clock)
+            upgrade_targets = [c for c in grove_crops if c.harvestable == 1 and c.color != current_crop.color]
+            for other_crop in upgrade_targets:
                 other_crop.upgrade_count += 1
-
-                T3Success = sum(random.random() < p1 for _ in range(other_crop.tier_three))
-                other_crop.tier_four += T3Success
-
-                T2Success = sum(random.random() < p2 for _ in range(other_crop.tier_two))
-                other_crop.tier_three += T2Success - T3Success
-
-                T1Success = sum(random.random() < p3 for _ in range(other_crop.tier_one))
-                other_crop.tier_two += T1Success - T2Success
-
-                other_crop.tier_one -= T1Success
-                #Simulated upgrade process that rolls for each seed in each crop independently and adjusts the counts accordingly. 
+                upgrade_crop(other_crop, p1, p2, p3, legacy=legacy_upgrades, scores=scores)
+                #Simulated upgrade process, draws the whole crop's upgrade from one roll against a precomputed alias table (or rolls every seed independently with legacy_upgrades=True) and adjusts the counts accordingly. 
+            if profile is not None:
+                clock = timed(profile, 'upgrades', clock)
+                profile.counts['upgrades'] += len(upgrade_targets)
 
         if len(ordered_ids) - 1 > index:
             next_cropid = ordered_ids[index + 1]
@@ -213,6 +308,8 @@ def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult,
 
             if next_crop.neighbor.harvestable == 1 and next_crop.neighbor.color == 'Yellow' and next_crop.color != 'Yellow':
                 #Checks if a yellow crop is potentially in danger if the current order is followed and a non-yellow crop is harvested next. 
+                if profile is not None:
+                    profile.counts['yellow_at_risk'] += 1
                 if next_crop.color == 'Blue':
                     relevant_priority = 'BYH'
                 elif next_crop.color == 'Purple':
@@ -237,6 +334,8 @@ def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult,
                 
                         crop_with_least_value = min(hybrid_values, key=hybrid_values.get)
                         neighbor_crop = crops_dict[crop_with_least_value].neighbor
+                        if profile is not None and neighbor_crop.id != next_cropid:
+                            profile.counts['hybrid_swap'] += 1
                         # Singles out the less juicy one and identifies its non-yellow neighbor
                         
 
@@ -257,61 +356,516 @@ def simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult,
                 ]) #Counts harvestable yellow crops remaining in the harvest order
 
                 if harvestable_yellows >= 3:
-                    pass #As explained above, if there are more than 3 yellows that could be upgraded, it's almost always worth the risk. 
+                    if profile is not None:
+                        profile.counts['three_plus_yellows'] += 1 #As explained above, if there are more than 3 yellows that could be upgraded, it's almost always worth the risk. 
                 elif harvestable_yellows == 1:
+                    if profile is not None:
+                        profile.counts['one_yellow_check'] += 1
                     if ((next_crop.neighbor.tier_two * .12) - (next_crop.neighbor.tier_three * .28) - (next_crop.neighbor.tier_four * 1.6)) <= 0:
                         ordered_ids.remove(next_crop.neighbor.id)
                         ordered_ids.insert(index + 1, next_crop.neighbor.id) #EV calculation for situation with only one yellow crop remaining and the decision is to harvest it or its neighbor. 
+                        if profile is not None:
+                            profile.counts['one_yellow_reorder'] += 1
                 elif harvestable_yellows == 2:   
+                    if profile is not None:
+                        profile.counts['two_yellow_check'] += 1
                     outside_tier_two_count = sum(crops_dict[crop_id].tier_two for crop_id in yellow_harvestable_crops if crop_id != next_crop.neighbor.id)
                     outside_tier_three_count = sum(crops_dict[crop_id].tier_three for crop_id in yellow_harvestable_crops if crop_id != next_crop.neighbor.id)
                     if ((next_crop.neighbor.tier_two * .12) - (next_crop.neighbor.tier_three * .28) - (next_crop.neighbor.tier_four * 1.6) + (outside_tier_two_count * .08) + (outside_tier_three_count * .08)) <= 0:
                         ordered_ids.remove(next_crop.neighbor.id)
                         ordered_ids.insert(index + 1, next_crop.neighbor.id) #EV calculation for situation with only two yellow crops remaining and one might be put at risk.  
+                        if profile is not None:
+                            profile.counts['two_yellow_reorder'] += 1
             
             if next_crop.neighbor.harvestable == 1 and next_crop.neighbor.color == next_crop.color and next_crop.upgrade_count >= 2:
+                if profile is not None:
+                    profile.counts['same_color_check'] += 1
                 if (next_crop.tier_three + (next_crop.tier_four * 4)) < (next_crop.neighbor.tier_three + (next_crop.neighbor.tier_four * 4)):
+                    if profile is not None:
+                        profile.counts['same_color_swap'] += 1
                     ordered_ids.remove(next_crop.neighbor.id)
                     ordered_ids.insert(index + 1, next_crop.neighbor.id) # If the next crop in the order and its neighbor are the same color, moves the juicier one to the front. 
                             
+        if profile is not None:
+            clock = timed(profile, 'decision', clock)
         index += 1  #increments index to proceed with next harvesting
 
     return seed_count
 
 
+def make_chunk_runner(initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, weights, engine, legacy_upgrades, crn_seed=None, antithetic=False, stream_seed=None, tier_accounting=False,
+                      sensitivities=False, profile=None):
+    # Sets up one weight combination on the chosen engine and returns run_chunk(start, count, stats), which simulates groves start..start + count - 1
+    # and adds each one to a GroveStats summary. worker() and the chunk scheduler below are built on top of this.
+    # The compact and numpy engines also record the plot count and color mix of every grove, the original Crop loop doesn't expose them.
+    # With stream_seed set, every call reseeds the engine's generator from (stream_seed, start), so a block of groves always gets the same
+    # random numbers no matter which process runs it or what ran there before.
+    # tier_accounting=True also records the harvested T2/T3/T4 seeds per color of every grove, so other lifeforce prices can be priced afterwards.
+    # profile (a HarvestProfile) collects phase timers and decision branch counters, the numpy and jit engines only report their total time.
+    # sensitivities=True also records every grove's score for p1, p2, p3 and the 40% loss chance (grove_stats.ScoreGradients), which only the
+    # python and compact engines can do, so numpy and jit run as compact.
+    sim_args = (t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3)
+    if sensitivities and engine in ('numpy', 'jit'):
+        engine = 'compact'
+    if engine == 'jit':
+        try:
+            from jit_grove_engine import NUMBA_AVAILABLE
+        except ImportError: # No NumPy either
+            NUMBA_AVAILABLE = False
+        if not NUMBA_AVAILABLE or legacy_upgrades:
+            engine = 'compact' # Same heuristic in plain Python, so a sweep still runs (just slower) on a machine without Numba
+
+    if crn_seed is not None:
+        # Common random numbers: grove number i always gets the same seeded streams, whatever the weights (see run_parallel_simulation)
+        grove = CompactGrove.from_crops_dict(initial_crops_dict, weights)
+        streams = GroveStreams()
+        def run_chunk(start, count, stats):
+            for i in range(start, start + count):
+                color_rng, neighbor_rng, upgrade_rng = streams.for_grove(crn_seed, i, antithetic)
+                tiers = [0] * 9 if tier_accounting else None
+                scores = [0.0] * 4 if sensitivities else None
+                seed_count = simulate_compact_iteration(grove, *sim_args, legacy_upgrades, upgrade_rng, color_rng, neighbor_rng, tiers, profile=profile, scores=scores)
+                if profile is not None:
+                    clock = perf_counter()
+                stats.add(seed_count, len(grove.included) // 2, grove.color_counts(), tiers, scores)
+                if profile is not None:
+                    timed(profile, 'stats', clock)
+
+    elif engine == 'numpy':
+        import numpy as np # Imported here so NumPy is only needed when the batched engine is actually used
+        from batched_grove_engine import simulate_groves_batched, DEFAULT_BATCH_SIZE
+        def run_chunk(start, count, stats):
+            rng = np.random.default_rng(derive_seed(stream_seed, start) if stream_seed is not None else None)
+            while count > 0:
+                batch = min(DEFAULT_BATCH_SIZE, count)
+                if profile is not None:
+                    clock = perf_counter()
+                seed_counts, plot_counts, color_counts, *tiers = simulate_groves_batched(batch, weights, *sim_args, rng, details=True, tier_totals=tier_accounting)
+                if profile is not None:
+                    clock = timed(profile, 'engine', clock)
+                    profile.counts['groves'] += batch
+                stats.add_many(seed_counts, plot_counts, color_counts, tiers[0] if tiers else None)
+                if profile is not None:
+                    timed(profile, 'stats', clock)
+                count -= batch
+
+    elif engine == 'jit':
+        import numpy as np
+        from jit_grove_engine import simulate_groves_jit, grove_template_arrays
+        template = grove_template_arrays(initial_crops_dict)
+        def run_chunk(start, count, stats):
+            seed = derive_seed(stream_seed, start) if stream_seed is not None else random.getrandbits(32)
+            if profile is not None:
+                clock = perf_counter()
+            seed_counts, plot_counts, color_counts, tiers = simulate_groves_jit(count, weights, *sim_args, template, seed)
+            if profile is not None:
+                clock = timed(profile, 'engine', clock)
+                profile.counts['groves'] += count
+            stats.add_many(seed_counts, plot_counts, color_counts, tiers if tier_accounting else None)
+            if profile is not None:
+                timed(profile, 'stats', clock)
+
+    elif engine == 'compact':
+        grove = CompactGrove.from_crops_dict(initial_crops_dict, weights) # Slotted crops + linked harvest queue, same results as the Crop objects
+        rng = random.Random()
+        def run_chunk(start, count, stats):
+            rng.seed(derive_seed(stream_seed, start) if stream_seed is not None else None)
+            for _ in range(count):
+                tiers = [0] * 9 if tier_accounting else None
+                scores = [0.0] * 4 if sensitivities else None
+                seed_count = simulate_compact_iteration(grove, *sim_args, legacy_upgrades, rng, harvested_tiers=tiers, profile=profile, scores=scores)
+                if profile is not None:
+                    clock = perf_counter()
+                stats.add(seed_count, len(grove.included) // 2, grove.color_counts(), tiers, scores)
+                if profile is not None:
+                    timed(profile, 'stats', clock)
+
+    else:
+        crops_dict = deepcopy(initial_crops_dict)
+        for crop in crops_dict.values():
+            crop.weights = weights  # Assign the weights for this worker
+        plan_cache = GrovePlanCache(crops_dict)
+        def run_chunk(start, count, stats):
+            if stream_seed is not None:
+                random.seed(derive_seed(stream_seed, start)) # The Crop loop only knows the global generator, so that's what gets seeded
+            for _ in range(count):
+                tiers = [0] * 9 if tier_accounting else None
+                scores = [0.0] * 4 if sensitivities else None
+                seed_count = simulate_process_single_iteration(crops_dict, *sim_args, legacy_upgrades, tiers, plan_cache, profile, scores)
+                if profile is not None:
+                    clock = perf_counter()
+                stats.add(seed_count, tiers=tiers, scores=scores)
+                if profile is not None:
+                    timed(profile, 'stats', clock)
+
+    return run_chunk
+
 def worker(params):
     #Parallel threading process, I barely understand what's going on here, I just know that the results are the same with or without it, but without it they take 30 times longer to get. 
-    initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, iterations, weights = params
-    crops_dict = deepcopy(initial_crops_dict)
-    for crop in crops_dict.values():
-        crop.weights = weights  # Assign the weights for this worker
-
-    total_seed_count = 0
-
-    for _ in range(iterations):
-        seed_count = simulate_process_single_iteration(crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3)
-        total_seed_count += seed_count
-        
-    return total_seed_count, weights
-
-def run_parallel_simulation(initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, total_iterations, num_parallel_processes, weight_combinations):
+    #Returns a GroveStats summary of every grove instead of just the total, so the distribution can be reported without keeping the seed counts around.
+    initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, iterations, weights, engine, legacy_upgrades, detailed_stats = params
+    run_chunk = make_chunk_runner(initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, weights, engine, legacy_upgrades)
+    stats = GroveStats(detailed_stats)
+    run_chunk(0, iterations, stats)
+    return stats, weights
+
+def chunk_worker(params):
+    # One scheduler task: a run of consecutive blocks from one weight combination. Each block gets its own GroveStats so the parent can merge
+    # them in block order, which is what keeps the results the same however the blocks were grouped into chunks.
+    # With profiled set, a HarvestProfile for the whole chunk comes back as well (None otherwise).
+    config_index, first_block, num_blocks, block_size, iterations, runner_args, detailed_stats, profiled = params
+    profile = HarvestProfile() if profiled else None
+    run_chunk = make_chunk_runner(*runner_args, profile=profile)
+    block_stats = []
+    for block in range(first_block, first_block + num_blocks):
+        start = block * block_size
+        stats = GroveStats(detailed_stats)
+        run_chunk(start, min(block_size, iterations - start), stats)
+        block_stats.append(stats)
+    return config_index, first_block, block_stats, profile
+
+class ConfigState:
+    # Scheduler bookkeeping for one weight combination. Blocks can come back from the pool in any order, early ones wait in self.waiting
+    # until everything before them has been merged.
+    def __init__(self, weights, runner_args, num_blocks, detailed_stats, cache_key=None, stream_seed=None):
+        self.weights = weights
+        self.runner_args = runner_args
+        self.stream_seed = stream_seed
+        self.num_blocks = num_blocks
+        self.stats = GroveStats(detailed_stats)
+        self.next_submit = 0 # First block that hasn't been sent to the pool yet
+        self.next_merge = 0 # First block that hasn't been merged into self.stats yet
+        self.waiting = {}
+        self.batch_totals = [] # Seed count total of every merged block, used for the CRN variance ratios
+        self.half_width = float('inf')
+        self.done = False
+        self.cache_key = cache_key # Key of this combination in the result cache, if there is one
+        self.cached_blocks = 0 # How many blocks came from the cache instead of being simulated
+        self.profile = None # Merged HarvestProfile of every chunk simulated for this combination, when profiling
+
+    def merge_ready(self, stop_check=None, block_callback=None):
+        # Merges every block that's next in line, returns True if the summary grew. block_callback(state, block, stats) sees each block as it's merged
+        merged = False
+        while self.next_merge in self.waiting:
+            stats = self.waiting.pop(self.next_merge)
+            self.batch_totals.append(stats.total)
+            self.stats.merge(stats)
+            if block_callback is not None:
+                block_callback(self, self.next_merge, stats)
+            self.next_merge += 1
+            merged = True
+            if self.next_merge == self.num_blocks or (stop_check is not None and stop_check(self)):
+                self.done = True
+                self.waiting.clear()
+                break
+        return merged
+
+def run_chunked(states, block_size, blocks_per_chunk, iterations, detailed_stats, num_parallel_processes, stop_check=None, cancel_event=None, progress_callback=None, cache=None, profile=False,
+                executor=None, block_callback=None, done_callback=None):
+    # Load-balanced replacement for one pool.map task per weight combination. Every combination is cut into blocks of block_size groves,
+    # chunks of blocks_per_chunk blocks are handed out round-robin across the combinations, and only about two chunks per process are in flight
+    # at once, so no core sits idle while the last few big tasks finish and a combination that hits its precision target stops getting work.
+    # stop_check(state) is asked after every merged block, cancel_event (anything with is_set()) stops the sweep early,
+    # and progress_callback(weights, stats) is called every time a combination's merged summary grows.
+    # num_parallel_processes=0 runs every chunk in this process instead, in the same order, which is handy for debugging and for checking
+    # that a seeded parallel run gives exactly the same numbers as a serial one.
+    # With a ResultCache, blocks saved by earlier runs are merged straight away and never resubmitted, and every new block is saved as it arrives.
+    # profile=True has every chunk bring back a HarvestProfile, merged into state.profile (including chunks that finished after their combination stopped).
+    # executor (see sweep_executors.py) decides where chunks run, by default a local Pool of num_parallel_processes or this process when that's 0.
+    # block_callback(state, block, stats) is called for every block in merge order and done_callback(state) once a combination finishes, for streaming results out.
+    finished = queue.Queue()
+    if executor is None:
+        executor = PoolExecutor(num_parallel_processes) if num_parallel_processes else InProcessExecutor()
+    in_flight = 0
+    cursor = 0
+
+    def merge(state):
+        was_done = state.done
+        if state.merge_ready(stop_check, block_callback) and progress_callback is not None:
+            progress_callback(state.weights, state.stats)
+        if state.done and not was_done and done_callback is not None:
+            done_callback(state)
+
+    if cache is not None:
+        for state in states:
+            for block, stats in cache.load_blocks(state.cache_key, state.num_blocks).items():
+                if stats.count == min(block_size, iterations - block * block_size): # A shorter last block from a smaller run doesn't count
+                    state.waiting[block] = stats
+            state.cached_blocks = len(state.waiting)
+            merge(state)
+
+    with executor:
+        def submit_more():
+            nonlocal in_flight, cursor
+            while in_flight < executor.max_in_flight: # Read every time, a coordinator's worker count can change during the sweep
+                for offset in range(len(states)):
+                    config_index = (cursor + offset) % len(states)
+                    state = states[config_index]
+                    state.next_submit = max(state.next_submit, state.next_merge)
+                    while state.next_submit in state.waiting: # Already cached
+                        state.next_submit += 1
+                    if not state.done and state.next_submit < state.num_blocks:
+                        break
+                else:
+                    return
+                num_blocks = 1
+                while num_blocks < blocks_per_chunk and state.next_submit + num_blocks < state.num_blocks and state.next_submit + num_blocks not in state.waiting:
+                    num_blocks += 1
+                params = (config_index, state.next_submit, num_blocks, block_size, iterations, state.runner_args, detailed_stats, profile)
+                executor.submit(chunk_worker, (params,), finished.put, finished.put)
+                state.next_submit += num_blocks
+                in_flight += 1
+                cursor = config_index + 1
+
+        submit_more()
+        while in_flight:
+            if cancel_event is not None and cancel_event.is_set():
+                break # Leaving the with block terminates the pool, whatever was merged so far is kept
+            try:
+                result = finished.get(timeout=0.1)
+            except queue.Empty:
+                submit_more() # Remote workers can join mid-sweep
+                continue
+            in_flight -= 1
+            if isinstance(result, BaseException):
+                raise result
+
+            config_index, first_block, block_stats, chunk_profile = result
+            state = states[config_index]
+            if chunk_profile is not None:
+                if state.profile is None:
+                    state.profile = HarvestProfile()
+                state.profile.merge(chunk_profile)
+            if cache is not None:
+                cache.store_blocks(state.cache_key, first_block, block_stats) # Saved even if the combination already stopped, a later run may want more
+            if state.done:
+                submit_more()
+                continue # Leftover work for a combination that already stopped
+            for block, stats in enumerate(block_stats, first_block):
+                state.waiting[block] = stats
+            merge(state)
+            submit_more()
+
+    return states
+
+def pairwise_variance_ratios(crn_results):
+    # For every pair of weight combinations, compares the variance of the difference between their batch averages with what it would be
+    # if both had been simulated with independent random numbers (per-grove variance of each / batch size).
+    # A ratio of 0.2 means the comparison is as precise as an independent run with 5x the iterations.
+    summaries = []
+    for stats, weights, batch_totals, batch_size in crn_results:
+        iterations = stats.count
+        batch_sizes = [min(batch_size, iterations - b * batch_size) for b in range(len(batch_totals))]
+        batch_means = [total / size for total, size in zip(batch_totals, batch_sizes)]
+        summaries.append((weights, stats.variance, batch_means, iterations))
+
+    ratios = {summary[0]: [] for summary in summaries}
+    num_batches = len(summaries[0][2])
+    for a in range(len(summaries)):
+        for b in range(a + 1, len(summaries)):
+            weights_a, variance_a, means_a, iterations = summaries[a]
+            weights_b, variance_b, means_b, _ = summaries[b]
+            differences = [x - y for x, y in zip(means_a, means_b)]
+            average_difference = sum(differences) / num_batches
+            crn_variance = sum((d - average_difference) ** 2 for d in differences) / (num_batches - 1)
+            independent_variance = (variance_a + variance_b) * num_batches / iterations
+            if independent_variance > 0:
+                ratios[weights_a].append(crn_variance / independent_variance)
+                ratios[weights_b].append(crn_variance / independent_variance)
+    return {weights: sum(values) / len(values) for weights, values in ratios.items() if values}
+
+def run_parallel_simulation(initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, total_iterations, num_parallel_processes, weight_combinations, engine='python', legacy_upgrades=False, crn_seed=None, antithetic=False, num_batches=20,
+                            target_half_width=None, target_relative_error=None, confidence=0.95, block_size=10000, detailed_stats=True, distribution_file=None,
+                            chunk_size=None, cancel_event=None, progress_callback=None, seed=None, cache_file=None, tier_accounting=False, price_scenarios=None,
+                            profile_file=None, executor=None, results_file=None, sensitivities=False):
     # Set iterations_per_process to a fixed value
+    # engine='python' walks one grove at a time through simulate_process_single_iteration, engine='compact' does the same on the slotted state in compact_grove.py,
+    # engine='numpy' runs thousands of groves at once in batched_grove_engine.py, engine='jit' runs the Numba kernel in jit_grove_engine.py (compact without Numba)
+    # legacy_upgrades=True makes the python engine roll every seed individually again instead of one alias table draw per crop, for validating the kernel
+    # Setting crn_seed uses common random numbers on the compact engine (optionally antithetic pairs), split into num_batches batches, and adds a column
+    # with the average variance ratio of that combination's pairwise differences compared to independent sampling
+    # Setting target_half_width (in seed count) or target_relative_error (e.g. 0.001 for 0.1%) checks each combination after every block_size groves
+    # and stops it once its confidence interval is that tight, with total_iterations as the cap, and the rows report the iterations actually used
+    # detailed_stats=True adds the std. dev. and a few percentiles to every row, and distribution_file (a .json path) saves the full summaries
+    # (histogram, quantiles, breakdowns by plot count and color mix) of every combination
+    # The work is handed out in chunks of chunk_size groves (rounded to whole blocks, None picks ~8 chunks per process) by run_chunked().
+    # Blocks are always merged in order, so the chunk size only changes the load balancing, never the results.
+    # cancel_event stops the sweep early and returns rows for whatever was finished, progress_callback(weights, stats) reports partial summaries.
+    # seed is the master seed. Every combination gets its own stream seed derived from (seed, weights) and every block its own stream derived
+    # from that, so runs can be replayed exactly and serial/parallel runs (num_parallel_processes=0 vs 32) match bit for bit.
+    # Without one a fresh master seed is drawn from the OS. Either way it's recorded in the "Seed" and "Stream Seed" columns.
+    # (crn_seed runs are already fully seeded and share their streams across combinations on purpose, so seed doesn't change them.)
+    # cache_file (a SQLite path) saves every finished block and reuses the ones that match on a rerun, so a killed sweep resumes and overlapping
+    # sweeps only simulate what's new. Blocks are only reusable with the same seed, so set one when using the cache.
+    # tier_accounting=True adds the average harvested T2/T3/T4 seeds per color (9 columns). The color multipliers never change a harvest decision,
+    # so price_scenarios, a list of (vivid, primal, wild) multipliers, can then be priced from those same groves: every scenario adds an
+    # "Avg @ vivid/primal/wild" and "SD @ ..." column, without simulating anything again.
+    # engine='stratified' hands the whole sweep to stratified_grove_engine.py instead: total_iterations becomes one budget shared by every
+    # combination, each color configuration is simulated once and priced with its exact probability under every set of weights.
+    # It raises ValueError for the options it has no equivalent for (legacy upgrades, CRN, precision targets, distributions, cancelling and
+    # progress, caching, tier accounting and price scenarios, profiling, executors, streamed results and sensitivities).
+    # profile_file (a .json path) turns on the harvest_profile instrumentation: time per phase (reset, plan, harvest, upgrades, decision) and how often
+    # each decision branch fired, per combination and merged over the whole sweep. Blocks that come from cache_file weren't simulated, so they aren't in it.
+    # executor runs the chunks somewhere other than a local Pool, e.g. sweep_executors.SocketCoordinator for worker processes on other machines
+    # (num_parallel_processes should then be about the total number of remote worker processes, it sets the chunk size).
+    # results_file streams the results to disk while the sweep runs (see result_sinks.py, .arrow/.parquet/.npz or CSV by extension): a summary row per combination
+    # as soon as it finishes, and every merged block (weights, block, groves, mean, variance, total) to the matching .blocks file. Streamed rows always have
+    # "Iterations Used" and never the pairwise variance ratio, which needs every combination first.
+    # sensitivities=True adds dEV/dp1, dEV/dp2, dEV/dp3 and dEV/dloss (the 40% neighbor loss chance) columns with their standard errors, estimated
+    # from the same groves by the likelihood ratio method (grove_stats.ScoreGradients) instead of rerunning the sweep with nudged values.
+    # They're in seed count per unit of probability, so dEV/dp1 * 0.01 is roughly what p1 = 0.06 instead of 0.05 would add. Runs on the python
+    # or compact engine (numpy and jit fall back to compact).
+    if engine == 'stratified':
+        options = {'legacy_upgrades': legacy_upgrades, 'crn_seed': crn_seed is not None, 'antithetic': antithetic, 'target_half_width': target_half_width is not None,
+                   'target_relative_error': target_relative_error is not None, 'distribution_file': distribution_file, 'cancel_event': cancel_event,
+                   'progress_callback': progress_callback, 'cache_file': cache_file, 'tier_accounting': tier_accounting, 'price_scenarios': price_scenarios,
+                   'profile_file': profile_file, 'executor': executor, 'results_file': results_file, 'sensitivities': sensitivities}
+        unsupported = [name for name, value in options.items() if value]
+        if unsupported:
+            raise ValueError(f"The stratified engine doesn't support {', '.join(unsupported)}")
+        return run_stratified_simulation(initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, total_iterations,
+                                         num_parallel_processes, weight_combinations, seed)
+    if price_scenarios:
+        tier_accounting = True
+    if sensitivities and not all(0 < p < 1 for p in (p1, p2, p3)):
+        raise ValueError("Sensitivities need every upgrade probability strictly between 0 and 1")
     iterations_per_process = total_iterations
-    all_params = [(initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, iterations_per_process, weights) for weights in weight_combinations]
-
-    with multiprocessing.Pool(processes=num_parallel_processes) as pool:
-        results = pool.map(worker, all_params)
-
-    # Aggregate results
-    aggregated_results = []
-    for total_seed_count, weights in results:
-        average_seed_count = total_seed_count / iterations_per_process
-        aggregated_results.append({
+    adaptive = target_half_width is not None or target_relative_error is not None
+    if crn_seed is not None and not adaptive:
+        block_size = -(-iterations_per_process // num_batches) # One block per batch
+    if crn_seed is not None and antithetic:
+        block_size += block_size % 2 # Keeps antithetic pairs inside the same block
+    num_blocks = -(-iterations_per_process // block_size)
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(63)
+
+    grove_template = [(crop.id, crop.neighbor.id, crop.initial_state) for crop in sorted(initial_crops_dict.values(), key=lambda crop: crop.id)]
+    states = []
+    for weights in weight_combinations:
+        stream_seed = derive_seed(seed, weights)
+        runner_args = (initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, weights, engine, legacy_upgrades, crn_seed, antithetic, stream_seed, tier_accounting, sensitivities)
+        key_params = dict(grove=grove_template, weights=weights, mults=(t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult), p=(p1, p2, p3), engine=engine,
+                          legacy_upgrades=legacy_upgrades, crn_seed=crn_seed, antithetic=antithetic, seed=seed, block_size=block_size,
+                          detailed_stats=detailed_stats, strategy_version=STRATEGY_VERSION)
+        if tier_accounting:
+            key_params["tier_accounting"] = True # Only added when on, so caches from before it existed keep their keys
+        if sensitivities:
+            key_params["sensitivities"] = True
+        states.append(ConfigState(weights, runner_args, num_blocks, detailed_stats, config_key(**key_params), stream_seed))
+
+    stop_check = None
+    if adaptive:
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        def stop_check(state):
+            stats = state.stats
+            if stats.count < 2:
+                return False
+            state.half_width = z * (stats.variance / stats.count) ** 0.5
+            if target_half_width is not None and state.half_width <= target_half_width:
+                return True
+            return target_relative_error is not None and state.half_width <= target_relative_error * abs(stats.mean)
+
+    if chunk_size is None:
+        blocks_per_chunk = max(1, len(states) * num_blocks // (8 * max(1, num_parallel_processes)))
+        if adaptive:
+            blocks_per_chunk = 1 # Anything past the stopping point is wasted, so keep chunks small
+    else:
+        blocks_per_chunk = max(1, -(-chunk_size // block_size))
+
+    if engine == 'python' and crn_seed is None and num_parallel_processes and len(states) * iterations_per_process >= 1000000:
+        GrovePlanCache(deepcopy(initial_crops_dict)).precompute() # Built once here so forked workers share it instead of each filling their own
+
+    variance_ratios = {}
+    def make_row(state):
+        stats, weights = state.stats, state.weights
+        iterations_used = stats.count
+        average_seed_count = stats.total / iterations_used
+        row = {
             "Yellow Weight": weights[0],
             "Blue Weight": weights[1],
             "Purple Weight": weights[2],
             "Average Seed Count": round(average_seed_count, 2)
-        })
+        }
+        if detailed_stats:
+            row["Std Dev"] = round(stats.variance ** 0.5, 2)
+            for q in (0.05, 0.5, 0.95, 0.99):
+                row[f"P{round(q * 100)}"] = round(stats.quantile(q), 1)
+        if weights in variance_ratios:
+            row["Pairwise Diff Variance Ratio"] = round(variance_ratios[weights], 4)
+        if adaptive or iterations_used < iterations_per_process:
+            row["Iterations Used"] = iterations_used
+        if adaptive:
+            row["CI Half Width"] = round(state.half_width, 3)
+        if tier_accounting and stats.tiers is not None:
+            for name, mean in zip(TIER_NAMES, stats.tiers.mean):
+                row[name] = round(mean, 3)
+            for scenario in price_scenarios or ():
+                mean, variance = stats.tiers.price(t3_mult, t4_mult, scenario)
+                label = "/".join(str(mult) for mult in scenario)
+                row[f"Avg @ {label}"] = round(mean, 2)
+                row[f"SD @ {label}"] = round(variance ** 0.5, 2)
+        if sensitivities and stats.scores is not None:
+            for index, name in enumerate(SCORE_NAMES):
+                gradient, standard_error = stats.scores.gradient(index)
+                row[f"dEV/d{name}"] = round(gradient, 1)
+                row[f"dEV/d{name} SE"] = round(standard_error, 1)
+        row["Seed"] = seed
+        row["Stream Seed"] = state.stream_seed
+        if cache_file:
+            row["Cached Iterations"] = min(state.cached_blocks * block_size, iterations_used)
+        return row
+
+    sink = ResultSink(results_file) if results_file else None
+    block_callback = done_callback = None
+    if sink is not None:
+        streamed = set()
+        def block_callback(state, block, stats):
+            yellow, blue, purple = map(float, state.weights) # Weights like 1 would otherwise make an integer column that .55 doesn't fit in
+            sink.write_block({"Yellow Weight": yellow, "Blue Weight": blue, "Purple Weight": purple, "Block": block,
+                              "Groves": stats.count, "Mean": stats.mean, "Variance": stats.variance, "Total": stats.total, "Stream Seed": state.stream_seed})
+        def done_callback(state):
+            row = make_row(state)
+            row.update({"Yellow Weight": float(state.weights[0]), "Blue Weight": float(state.weights[1]), "Purple Weight": float(state.weights[2])})
+            row.setdefault("Iterations Used", state.stats.count) # Same columns whether or not the combination stopped early
+            sink.write_summary(row)
+            streamed.add(id(state))
+
+    try:
+        if cache_file:
+            with ResultCache(cache_file) as cache:
+                for state, weights in zip(states, weight_combinations):
+                    cache.register(state.cache_key, dict(weights=weights, mults=(t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult), p=(p1, p2, p3), engine=engine,
+                                                         crn_seed=crn_seed, seed=seed, block_size=block_size, strategy_version=STRATEGY_VERSION))
+                run_chunked(states, block_size, blocks_per_chunk, iterations_per_process, detailed_stats, num_parallel_processes, stop_check, cancel_event, progress_callback, cache,
+                            bool(profile_file), executor, block_callback, done_callback)
+        else:
+            run_chunked(states, block_size, blocks_per_chunk, iterations_per_process, detailed_stats, num_parallel_processes, stop_check, cancel_event, progress_callback,
+                        profile=bool(profile_file), executor=executor, block_callback=block_callback, done_callback=done_callback)
+    finally:
+        if sink is not None:
+            for state in states:
+                if state.stats.count > 0 and id(state) not in streamed: # Cancelled (or failed) part way, whatever was merged still gets a row
+                    done_callback(state)
+            sink.close()
+    finished_states = [state for state in states if state.stats.count > 0] # Only matters when the sweep was cancelled
+
+    if crn_seed is not None and not adaptive and len(finished_states) > 1 and all(state.stats.count == iterations_per_process for state in finished_states):
+        variance_ratios.update(pairwise_variance_ratios([(state.stats, state.weights, state.batch_totals, block_size) for state in finished_states]))
+
+    aggregated_results = [make_row(state) for state in finished_states] # Aggregate results
+
+    if profile_file:
+        total_profile = HarvestProfile()
+        for state in states:
+            total_profile.merge(state.profile)
+        with open(profile_file, 'w') as f:
+            json.dump({"engine": engine, "seed": seed, "processes": num_parallel_processes, "total": total_profile.to_dict(),
+                       "by_weights": {"/".join(str(w) for w in state.weights): state.profile.to_dict() for state in states if state.profile is not None}}, f, indent=1)
+
+    if distribution_file:
+        with open(distribution_file, 'w') as f:
+            json.dump({"/".join(str(w) for w in state.weights): dict(state.stats.to_dict(), seed=seed, stream_seed=state.stream_seed, block_size=block_size)
+                       for state in finished_states}, f, indent=1)
 
     return aggregated_results #Puts it all together at the end
 
@@ -369,14 +923,38 @@ if __name__ == '__main__':
     p1 = .05 # Probability that a T3 plant will upgrade to a T4 plant when the crop is upgraded, taken from Prohibited Library Discord 
     p2 = .2 # Probability that a T2 plant will upgrade to a T3 plant when the crop is upgraded, ditto
     p3 = .25 # Probability that a T1 plant will upgrade to a T2 plant when the crop is upgraded, ditto
-    total_iterations = 1000000  # Set to the desired number of iterations per weight combination
+    total_iterations = 1000000  # Set to the desired number of iterations per weight combination (the cap when a precision target is set)
+    target_half_width = None # e.g. 2.0 to stop each combination once its 95% confidence interval is +/- 2 seed count
+    target_relative_error = None # e.g. 0.002 to stop once the interval is within 0.2% of the average instead
     num_parallel_processes = 32
+    seed = None # Master seed, set it to a previous run's "Seed" column to replay that run exactly
+    price_scenarios = None # e.g. [(2.5, 1, 1), (3, 1.2, 0.8)] to also price every combination at other lifeforce prices from the same groves
+    cache_file = None # e.g. 'sweep_cache.sqlite' to save finished blocks so an interrupted or repeated sweep (same seed) picks up where it left off
+    chunk_size = None # Groves per scheduler task, None splits the sweep into ~8 tasks per process. Only affects load balancing, not the results
+    engine = 'jit' # 'python' for the original Crop object loop, 'compact' for the same loop on slotted crops, 'numpy' for the batched engine (needs NumPy installed)
+    # 'jit' runs the whole harvest compiled with Numba (jit_grove_engine.py), about 10x faster than compact, and quietly uses 'compact' if Numba isn't installed
+    # 'stratified' simulates each color configuration once and reweights it for every combination, total_iterations is then the budget for the whole sweep
+    legacy_upgrades = False # True rolls each seed separately like the original upgrade loop, only useful for checking the upgrade kernel
+    crn_seed = None # Set to any integer to use common random numbers across the weight combinations (always runs on the compact engine)
+    antithetic = False # With crn_seed set, also simulates groves in mirrored pairs
+    distribution_file = None # e.g. 'distributions.json' to save histograms, quantiles and plot count/color breakdowns for every combination
+    sensitivities = False # True adds dEV/dp1, dEV/dp2, dEV/dp3 and dEV/dloss columns (with standard errors) to check how much the estimated odds matter
+    profile_file = None # e.g. 'profile.json' to time each phase of the harvest and count how often every reordering branch fires (python/compact engines)
+    results_file = None # e.g. 'sweep.arrow' (or .parquet/.npz/.csv) to write each combination's row and every merged block to disk as the sweep runs
+    executor = None # e.g. SocketCoordinator(('0.0.0.0', 5800), authkey='pick-a-secret') from sweep_executors.py to farm chunks out to other machines,
+    # each running python sweep_executors.py worker <this-host>:5800 --authkey pick-a-secret --retry
 
     results = run_parallel_simulation(
-        crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, total_iterations, num_parallel_processes, weight_combinations)
+        crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, total_iterations, num_parallel_processes, weight_combinations, engine, legacy_upgrades,
+        crn_seed, antithetic, target_half_width=target_half_width, target_relative_error=target_relative_error,
+        distribution_file=distribution_file, chunk_size=chunk_size, seed=seed, cache_file=cache_file, price_scenarios=price_scenarios, profile_file=profile_file,
+        executor=executor, results_file=results_file, sensitivities=sensitivities)
 
+    import pandas as pd # Only needed for printing, and it's most of the startup time, so worker processes and importers don't pay for it
     df = pd.DataFrame(results)
     print(df.to_csv(index=False, lineterminator='\n')) #Prints results as a CSV for easy copy/paste into google sheets. 
+    if "Pairwise Diff Variance Ratio" in df:
+        print(f"Average variance of pairwise differences vs independent sampling: {df['Pairwise Diff Variance Ratio'].mean():.4f}")
 
     # Record the end time
     end_time = time.time()
@@ -0,0 +1,171 @@
+import numpy as np
+
+# Structure-of-arrays version of the grove simulation in RandomGroveHarvesterWithLogic.py.
+# Instead of walking one Crop object graph at a time, every array below holds the state of thousands of groves at once
+# (one row per grove, one column per crop), and each harvesting step is applied to all of them with masked NumPy operations.
+# The initial order, the 40% neighbor loss, the upgrade rolls and the decision block follow simulate_process_single_iteration exactly,
+# so the seed counts come out in the same distribution, just a lot faster.
+
+YELLOW, BLUE, PURPLE = 0, 1, 2 # Integer color codes, same order as Crop.colors so the atlas weights line up
+MAX_CROPS = 10 # 5 plots of 2 crops, crop i (0-based) shares a plot with crop i ^ 1
+CROP_INDEX = np.arange(MAX_CROPS)
+NEIGHBOR_INDEX = CROP_INDEX ^ 1
+PLOT_COUNT_OPTIONS = np.array([6, 8, 10])
+PLOT_COUNT_PROBS = np.array([1, 2, 1]) / 4 # Same 1:2:1 odds as choose_crops_by_weight()
+DEFAULT_BATCH_SIZE = 4096
+
+
+def _gather(values, columns):
+    # Picks one column per grove, e.g. the tier counts of the crop each grove is currently harvesting
+    return np.take_along_axis(values, columns[:, None], axis=1)[:, 0]
+
+
+def _binomial(counts, targets, p, rng):
+    # Only draws for crops that are actually being upgraded and have seeds of that tier, most of the grid is empty early in a grove
+    drawn = targets & (counts > 0)
+    successes = np.zeros_like(counts)
+    successes[drawn] = rng.binomial(counts[drawn], p)
+    return successes
+
+
+def _move_to_position(order, rows, crop_ids, target):
+    # Vectorized version of ordered_ids.remove(crop_id) followed by ordered_ids.insert(target, crop_id) for the selected groves.
+    # The moved crop is always still ahead of the current index, so everything between the target and its old position shifts right by one.
+    current_pos = np.argmax(order == crop_ids[:, None], axis=1)
+    shifted = (CROP_INDEX > target) & (CROP_INDEX <= current_pos[:, None])
+    source = np.where(shifted, CROP_INDEX - 1, CROP_INDEX)
+    moved = np.take_along_axis(order, source, axis=1)
+    moved[:, target] = crop_ids
+    order[rows] = moved[rows]
+
+
+def generate_groves(n_groves, weights, rng):
+    # Batched Crop.reset() + choose_crops_by_weight(): random colors by atlas weight, and a 3/4/5 plot count per grove
+    cum_weights = np.cumsum(np.asarray(weights, dtype=float))
+    colors = np.searchsorted(cum_weights, rng.random((n_groves, MAX_CROPS)) * cum_weights[-1], side='right').astype(np.int8)
+    n_crops = rng.choice(PLOT_COUNT_OPTIONS, size=n_groves, p=PLOT_COUNT_PROBS)
+    return colors, n_crops
+
+
+def initial_order(colors, n_crops):
+    # Batched prioritization_process() + generate_color_based_permutation().
+    # Each crop gets a bucket rank (primary doubles, primary hybrids, primary dangers, secondary ..., yellow hybrids, yellow doubles)
+    # and the order is just a stable sort by (bucket, crop id), which is exactly how the bucket lists get concatenated in the original.
+    active = CROP_INDEX < n_crops[:, None]
+    neighbor_colors = colors[:, NEIGHBOR_INDEX]
+    blue_count = np.sum(active & (colors == BLUE), axis=1)
+    purple_count = np.sum(active & (colors == PURPLE), axis=1)
+    primary_color = np.where(blue_count > purple_count, BLUE, PURPLE)[:, None] # Purple wins ties, same as the original
+
+    pairing = np.where(neighbor_colors == colors, 0, np.where(neighbor_colors == YELLOW, 2, 1)) # double / hybrid / danger
+    bucket = np.where(colors == primary_color, pairing, 3 + pairing)
+    bucket = np.where(colors == YELLOW, np.where(neighbor_colors == YELLOW, 7, 6), bucket)
+    bucket = np.where(active, bucket, 8) # Crops past the plot count sit at the back and are never visited
+
+    return np.argsort(bucket * MAX_CROPS + CROP_INDEX, axis=1, kind='stable'), active
+
+
+def simulate_groves_batched(n_groves, weights, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, rng=None, details=False, tier_totals=False):
+    # Simulates n_groves independent random groves and returns an array with the seed count of each one.
+    # With details=True it returns (seed counts, plot counts, (n_groves, 3) yellow/blue/purple crop counts) for the breakdowns in grove_stats.py
+    # tier_totals=True adds an (n_groves, 9) array of harvested T2/T3/T4 seeds per color (layout of grove_stats.TIER_NAMES) to what's returned
+    rng = np.random.default_rng() if rng is None else rng
+    rows = np.arange(n_groves)
+    color_mults = np.array([vivid_mult, primal_mult, wild_mult], dtype=float)
+
+    colors, n_crops = generate_groves(n_groves, weights, rng)
+    order, harvestable = initial_order(colors, n_crops)
+    pending = harvestable.copy() # Crops that are still ahead of the current index in the harvest order
+    is_yellow = colors == YELLOW
+
+    tier_one = np.where(harvestable, 23, 0)
+    tier_two = np.zeros((n_groves, MAX_CROPS), dtype=np.int64)
+    tier_three = np.zeros((n_groves, MAX_CROPS), dtype=np.int64)
+    tier_four = np.zeros((n_groves, MAX_CROPS), dtype=np.int64)
+    upgrade_count = np.zeros((n_groves, MAX_CROPS), dtype=np.int64)
+    seed_count = np.zeros(n_groves)
+    harvested_tiers = np.zeros((n_groves, 9)) if tier_totals else None
+
+    for index in range(MAX_CROPS):
+        in_grove = index < n_crops
+        current = order[:, index]
+        pending[rows, current] &= ~in_grove
+
+        # Harvest the current crop, and give its neighbor the 40% chance to be lost
+        harvested = in_grove & harvestable[rows, current]
+        harvestable[rows, current] &= ~harvested
+        neighbor = current ^ 1
+        lost = harvested & harvestable[rows, neighbor] & (rng.random(n_groves) < 0.4)
+        harvestable[rows, neighbor] &= ~lost
+
+        current_colors = colors[rows, current]
+        addition = tier_two[rows, current] + t3_mult * tier_three[rows, current] + t4_mult * tier_four[rows, current]
+        seed_count += np.where(harvested, addition * color_mults[current_colors], 0)
+        if tier_totals:
+            for offset, tier in enumerate((tier_two, tier_three, tier_four)):
+                harvested_tiers[rows, current_colors * 3 + offset] += np.where(harvested, tier[rows, current], 0)
+
+        # Upgrade every remaining crop of a different color, one binomial draw per tier instead of one roll per seed
+        targets = harvested[:, None] & harvestable & (colors != current_colors[:, None])
+        upgrade_count += targets
+        t3_success = _binomial(tier_three, targets, p1, rng)
+        t2_success = _binomial(tier_two, targets, p2, rng)
+        t1_success = _binomial(tier_one, targets, p3, rng)
+        tier_four += t3_success
+        tier_three += t2_success - t3_success
+        tier_two += t1_success - t2_success
+        tier_one -= t1_success
+
+        # Decision block, only for groves that still have at least one crop left in the order
+        deciding = index + 1 < n_crops
+        if index + 1 >= MAX_CROPS or not deciding.any():
+            continue
+        next_crop = order[:, index + 1]
+        next_neighbor = next_crop ^ 1
+        yellow_left = is_yellow & harvestable & pending
+
+        at_risk = (deciding & harvestable[rows, next_neighbor] & is_yellow[rows, next_neighbor]
+                   & ~is_yellow[rows, next_crop]) # A yellow crop is in danger if a non-yellow is harvested next
+        if at_risk.any():
+            # Look for other harvestable yellows next to the same color as the next crop, and put the least juicy one at risk instead
+            next_colors = colors[rows, next_crop]
+            matching = (yellow_left & (colors[:, NEIGHBOR_INDEX] == next_colors[:, None])
+                        & harvestable[:, NEIGHBOR_INDEX] & at_risk[:, None])
+            hybrid_values = np.where(matching, tier_two + t3_mult * tier_three + t4_mult * tier_four, np.inf)
+            least_juicy = np.argmin(hybrid_values, axis=1)
+            swap = matching.any(axis=1)
+            if swap.any():
+                _move_to_position(order, swap, least_juicy ^ 1, index + 1)
+                next_crop = np.where(swap, least_juicy ^ 1, next_crop)
+                next_neighbor = next_crop ^ 1
+
+            harvestable_yellows = yellow_left.sum(axis=1)
+            nn_two = tier_two[rows, next_neighbor]
+            nn_three = tier_three[rows, next_neighbor]
+            nn_four = tier_four[rows, next_neighbor]
+            risk_ev = nn_two * .12 - nn_three * .28 - nn_four * 1.6
+            yellow_harvestable = is_yellow & harvestable
+            outside_two = np.sum(np.where(yellow_harvestable, tier_two, 0), axis=1) - np.where(yellow_harvestable[rows, next_neighbor], nn_two, 0)
+            outside_three = np.sum(np.where(yellow_harvestable, tier_three, 0), axis=1) - np.where(yellow_harvestable[rows, next_neighbor], nn_three, 0)
+            take_yellow = at_risk & (((harvestable_yellows == 1) & (risk_ev <= 0)) |
+                                     ((harvestable_yellows == 2) & (risk_ev + outside_two * .08 + outside_three * .08 <= 0)))
+            if take_yellow.any():
+                _move_to_position(order, take_yellow, next_neighbor, index + 1)
+
+        # Same color plot: take the juicier crop first once upgrades have started to pile up
+        juice = tier_three + tier_four * 4
+        juicier_first = (deciding & harvestable[rows, next_neighbor]
+                         & (colors[rows, next_neighbor] == colors[rows, next_crop])
+                         & (upgrade_count[rows, next_crop] >= 2)
+                         & (juice[rows, next_crop] < juice[rows, next_neighbor]))
+        if juicier_first.any():
+            _move_to_position(order, juicier_first, next_neighbor, index + 1)
+
+    result = (seed_count,)
+    if details:
+        active = CROP_INDEX < n_crops[:, None]
+        color_counts = np.stack([np.sum(active & (colors == color), axis=1) for color in (YELLOW, BLUE, PURPLE)], axis=1)
+        result += (n_crops // 2, color_counts)
+    if tier_totals:
+        result += (harvested_tiers,)
+    return result if len(result) > 1 else seed_count
@@ -0,0 +1,196 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from RandomGroveHarvesterWithLogic import simulate_process_single_iteration, worker, run_parallel_simulation
+from harvest_core import Crop, simulate_process
+from grove_fixtures import grove_crops_dict, SIM_ARGS
+
+# Benchmark suite for the simulators. Every workload uses a fixed seed and a fixed grove, so two runs on the same machine measure the same work
+# and a results file from one commit can be compared against another:
+#
+#   python benchmark.py -o before.json
+#   (make changes)
+#   python benchmark.py -o after.json --compare before.json
+#
+# Workloads:
+#   single_iteration  simulate_process_single_iteration one grove at a time, mixed and all-yellow atlas weights
+#   worker            worker() for one weight combination on each engine
+#   parallel          run_parallel_simulation at 1, 2, 4, ... processes up to the core count (scaling and efficiency)
+#   gui               HarvestSimEXEv4's simulate_process on standard 3-, 4- and 5-plot groves, all-yellow and mixed
+# Latency percentiles are per grove. Where a single grove is too quick to time on its own, groves are timed in small batches
+# and each batch contributes its per-grove average.
+
+WEIGHTS = {'mixed': (1, 1, 1), 'all_yellow': (1, 0, 0)}
+GUI_ARGS = (26, 100, 2.25, 1, 1)  # t3, t4, vivid, primal, wild, the GUI defaults
+GUI_COLORS = {'all_yellow': ('Yellow',) * 10, 'mixed': ('Yellow', 'Blue', 'Purple', 'Yellow', 'Blue', 'Blue', 'Purple', 'Yellow', 'Purple', 'Yellow')}
+GUI_TIERS = ((23, 0, 0, 0), (10, 9, 3, 1), (15, 6, 2, 0), (23, 0, 0, 0), (5, 12, 5, 1), (20, 3, 0, 0), (23, 0, 0, 0), (8, 10, 4, 1), (12, 8, 3, 0), (23, 0, 0, 0))
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    ordered = sorted(samples)
+    return {f"p{point}": ordered[min(len(ordered) - 1, int(point / 100 * len(ordered)))] for point in points}
+
+
+def gui_grove(plots, colors):
+    return [Crop(i + 1, colors[i], 1, 'ABCDE'[i // 2], *GUI_TIERS[i]) for i in range(2 * plots)]
+
+
+def bench_single_iteration(iterations, seed):
+    results = []
+    for name, weights in WEIGHTS.items():
+        crops_dict = grove_crops_dict(weights)
+        random.seed(seed)
+        for _ in range(min(1000, iterations)):  # Warm up caches and the interpreter before timing
+            simulate_process_single_iteration(crops_dict, *SIM_ARGS)
+        random.seed(seed)
+        latencies = []
+        clock = time.perf_counter_ns
+        started = clock()
+        for _ in range(iterations):
+            before = clock()
+            simulate_process_single_iteration(crops_dict, *SIM_ARGS)
+            latencies.append((clock() - before) / 1000)
+        elapsed = (clock() - started) / 1e9
+        results.append({'name': f"single_iteration/{name}", 'groves': iterations, 'seconds': elapsed, 'groves_per_sec': iterations / elapsed,
+                        'latency_us': percentiles(latencies)})
+    return results
+
+
+def bench_worker(iterations, seed, engines):
+    results = []
+    for engine in engines:
+        for name, weights in WEIGHTS.items():
+            params = (grove_crops_dict(weights), *SIM_ARGS, iterations, weights, engine, False, False)
+            worker((params[0], *SIM_ARGS, min(1000, iterations), weights, engine, False, False))  # Warm up (and compile, for 'jit')
+            random.seed(seed)
+            started = time.perf_counter()
+            stats, _ = worker(params)
+            elapsed = time.perf_counter() - started
+            results.append({'name': f"worker/{engine}/{name}", 'groves': iterations, 'seconds': elapsed, 'groves_per_sec': iterations / elapsed,
+                            'mean_seed_count': stats.mean})
+    return results
+
+
+def bench_parallel(iterations, seed, engine, max_processes, combinations=4):
+    # The same sweep (a few weight combinations, fixed master seed) at each process count. Results are identical at every count,
+    # so only the time changes
+    counts = []
+    processes = 1
+    while processes < max_processes:
+        counts.append(processes)
+        processes *= 2
+    counts.append(max_processes)
+    weight_combinations = [(.55, .55, 1), (1, .55, .55), (.55, 1, 1), (1, 1, .55)][:combinations]
+    results = []
+    baseline = None
+    for processes in counts:
+        started = time.perf_counter()
+        rows = run_parallel_simulation(grove_crops_dict(weight_combinations[0]), *SIM_ARGS, iterations, processes, weight_combinations, engine=engine,
+                                       detailed_stats=False, seed=seed)
+        elapsed = time.perf_counter() - started
+        groves = iterations * len(weight_combinations)
+        baseline = baseline or elapsed
+        results.append({'name': f"parallel/{engine}/{processes}", 'processes': processes, 'groves': groves, 'seconds': elapsed,
+                        'groves_per_sec': groves / elapsed, 'speedup': baseline / elapsed, 'efficiency': baseline / elapsed / processes,
+                        'mean_seed_count': sum(row['Average Seed Count'] for row in rows) / len(rows)})
+    return results
+
+
+def bench_gui(iterations, seed, batch=50):
+    results = []
+    for plots in (3, 4, 5):
+        for name, colors in GUI_COLORS.items():
+            crops = gui_grove(plots, colors)
+            permutation = [crop.id for crop in crops]
+            simulate_process(crops, permutation, *GUI_ARGS, iterations=min(500, iterations), rng=random.Random(seed))  # Warm up
+            rng = random.Random(seed)
+            latencies = []
+            started = time.perf_counter()
+            for done in range(0, iterations, batch):
+                size = min(batch, iterations - done)
+                before = time.perf_counter()
+                simulate_process(crops, permutation, *GUI_ARGS, iterations=size, rng=rng)
+                latencies.append((time.perf_counter() - before) / size * 1e6)
+            elapsed = time.perf_counter() - started
+            results.append({'name': f"gui/{plots}_plot/{name}", 'groves': iterations, 'seconds': elapsed, 'groves_per_sec': iterations / elapsed,
+                            'latency_us': percentiles(latencies)})
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpu_count': multiprocessing.cpu_count()}
+
+
+def compare(results, baseline_file):
+    # Prints groves/sec against an earlier results file, matched by workload name
+    with open(baseline_file) as f:
+        baseline = {entry['name']: entry for entry in json.load(f)['results']}
+    print(f"\n{'workload':<36}{'before':>14}{'after':>14}{'change':>10}")
+    for entry in results:
+        before = baseline.get(entry['name'])
+        if before is None:
+            continue
+        change = entry['groves_per_sec'] / before['groves_per_sec'] - 1
+        print(f"{entry['name']:<36}{before['groves_per_sec']:>14,.0f}{entry['groves_per_sec']:>14,.0f}{change:>+10.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fixed-seed benchmarks for the grove simulators.")
+    parser.add_argument('--only', nargs='+', choices=('single_iteration', 'worker', 'parallel', 'gui'), default=None, help="workloads to run (default: all)")
+    parser.add_argument('--quick', action='store_true', help="10x fewer groves, for a fast sanity check")
+    parser.add_argument('--engines', nargs='+', default=['python', 'compact', 'numpy', 'jit'], help="engines for the worker workload")
+    parser.add_argument('--parallel-engine', default='compact', help="engine for the parallel scaling workload")
+    parser.add_argument('--max-processes', type=int, default=multiprocessing.cpu_count(), help="largest process count for the parallel workload")
+    parser.add_argument('--seed', type=int, default=12345)
+    parser.add_argument('-o', '--output', default=None, help="write the results to this JSON file")
+    parser.add_argument('--compare', default=None, help="earlier results file to compare groves/sec against")
+    args = parser.parse_args(argv)
+    only = set(args.only or ('single_iteration', 'worker', 'parallel', 'gui'))
+    scale = 10 if args.quick else 1
+
+    results = []
+    if 'single_iteration' in only:
+        results += bench_single_iteration(50000 // scale, args.seed)
+    if 'worker' in only:
+        engines = []
+        for engine in args.engines:
+            try:
+                if engine == 'numpy':
+                    import numpy  # noqa: F401
+                elif engine == 'jit':
+                    from jit_grove_engine import NUMBA_AVAILABLE
+                    if not NUMBA_AVAILABLE:
+                        raise ImportError("Numba is not installed")
+                engines.append(engine)
+            except ImportError as error:
+                print(f"Skipping worker/{engine}: {error}", file=sys.stderr)
+        results += bench_worker(200000 // scale, args.seed, engines)
+    if 'parallel' in only:
+        results += bench_parallel(200000 // scale, args.seed, args.parallel_engine, args.max_processes)
+    if 'gui' in only:
+        results += bench_gui(20000 // scale, args.seed)
+
+    for entry in results:
+        latency = entry.get('latency_us')
+        latency_text = '  '.join(f"{key} {value:.1f}us" for key, value in latency.items()) if latency else ''
+        print(f"{entry['name']:<36}{entry['groves_per_sec']:>14,.0f} groves/s  {latency_text}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': dict(environment(), seed=args.seed, quick=args.quick), 'results': results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import random
+from bisect import bisect_right
+from itertools import accumulate
+from upgrade_kernel import upgrade_crop
+from harvest_profile import timed
+from time import perf_counter
+
+# Compact grove state for the random grove harvester.
+# Crop in RandomGroveHarvesterWithLogic.py stays the public way to describe a grove, CompactGrove.from_crops_dict() turns it into
+# slotted crops with integer color codes and precomputed neighbors, and HarvestQueue replaces the ordered_ids list so that
+# reordering and "is this crop still ahead of the current index" checks are O(1) instead of list.index/remove/insert calls.
+
+YELLOW, BLUE, PURPLE = 0, 1, 2 # Same order as Crop.colors, so the atlas weights can be used as-is
+COLOR_NAMES = ('Yellow', 'Blue', 'Purple')
+PLOT_COUNT_OPTIONS = (6, 8, 10)
+PLOT_COUNT_CUM_WEIGHTS = (1, 3, 4) # 1:2:1 odds, same as choose_crops_by_weight()
+
+
+class CompactCrop:
+    __slots__ = ('index', 'id', 'color', 'harvestable', 'tier_one', 'tier_two', 'tier_three', 'tier_four',
+                 'upgrade_count', 'neighbor', 'initial_state', 'pending', 'prev', 'next')
+
+    def __init__(self, index, id, initial_state):
+        self.index = index
+        self.id = id
+        self.color = YELLOW
+        self.initial_state = initial_state # (harvestable, tier_one, tier_two, tier_three, tier_four, upgrade_count), same layout as Crop.initial_state
+        self.harvestable, self.tier_one, self.tier_two, self.tier_three, self.tier_four, self.upgrade_count = initial_state
+        self.neighbor = None
+        self.pending = False # True while the crop is still ahead of the current index in the harvest queue
+        self.prev = None # Links for HarvestQueue
+        self.next = None
+
+    def __repr__(self):
+        return (f"CompactCrop(ID={self.id}, Color={COLOR_NAMES[self.color]}, Harvestable={self.harvestable}, "
+                f"TierOne={self.tier_one}, TierTwo={self.tier_two}, TierThree={self.tier_three}, TierFour={self.tier_four}, "
+                f"NeighborID={self.neighbor.id}, UpgradeCount={self.upgrade_count})")
+
+
+class HarvestQueue:
+    # Doubly linked harvest order. Only the crops that haven't been reached yet are linked in, so "is this crop after the current index"
+    # is just crop.pending, and moving a crop to index + 1 (the only reorder the decision block ever makes) is a constant time unlink + relink.
+    __slots__ = ('head',)
+
+    def __init__(self, ordered_crops):
+        self.head = None
+        previous = None
+        for crop in ordered_crops:
+            crop.pending = True
+            crop.prev = previous
+            crop.next = None
+            if previous is None:
+                self.head = crop
+            else:
+                previous.next = crop
+            previous = crop
+
+    def pop(self):
+        # Advances the index: returns the crop to harvest now and takes it out of the pending part of the order
+        crop = self.head
+        if crop is not None:
+            self.head = crop.next
+            if self.head is not None:
+                self.head.prev = None
+            crop.pending = False
+        return crop
+
+    def peek(self):
+        return self.head # The crop at index + 1
+
+    def move_to_front(self, crop):
+        # Same as ordered_ids.remove(crop.id); ordered_ids.insert(index + 1, crop.id)
+        if crop is self.head:
+            return
+        crop.prev.next = crop.next
+        if crop.next is not None:
+            crop.next.prev = crop.prev
+        crop.prev = None
+        crop.next = self.head
+        self.head.prev = crop
+        self.head = crop
+
+
+class CompactGrove:
+    def __init__(self, crops, weights):
+        self.crops = crops # Ordered by crop id, crops[i] shares a plot with crops[i].neighbor
+        self.cum_weights = tuple(accumulate(weights)) # Cumulative atlas weights for Yellow/Blue/Purple, used the same way random.choices uses them
+        self.included = [] # Crops that are part of the current grove, set by reset()
+        self.plans = {} # Color codes of the grove's crops -> (initial order, yellow crops), see simulate_compact_iteration
+
+    @classmethod
+    def from_crops_dict(cls, crops_dict, weights=None):
+        # Builds the compact state from the same hardcoded dictionary of Crop objects the rest of the harvester uses
+        ordered = sorted(crops_dict.values(), key=lambda crop: crop.id)
+        crops = [CompactCrop(index, crop.id, crop.initial_state) for index, crop in enumerate(ordered)]
+        position = {crop.id: index for index, crop in enumerate(ordered)}
+        for index, crop in enumerate(ordered):
+            crops[index].neighbor = crops[position[crop.neighbor.id]]
+        return cls(crops, weights if weights is not None else ordered[0].weights)
+
+    def reset(self, rng=random, colors=None):
+        # Compact version of Crop.reset() + choose_crops_by_weight(), returns the crops that are part of this grove
+        # colors (color codes of crops 1..n in id order) skips the random draws and sets up that exact grove instead
+        for crop in self.crops:
+            crop.harvestable, crop.tier_one, crop.tier_two, crop.tier_three, crop.tier_four, crop.upgrade_count = crop.initial_state
+        if colors is not None:
+            for crop, color in zip(self.crops, colors):
+                crop.color = color
+            self.included = self.crops[:len(colors)]
+            return self.included
+        cum_weights = self.cum_weights
+        total = cum_weights[-1]
+        for crop in self.crops:
+            crop.color = bisect_right(cum_weights, rng.random() * total)
+        num_crops = PLOT_COUNT_OPTIONS[bisect_right(PLOT_COUNT_CUM_WEIGHTS, rng.random() * PLOT_COUNT_CUM_WEIGHTS[-1])]
+        self.included = [crop for crop in self.crops if crop.id <= num_crops]
+        return self.included
+
+    def color_counts(self):
+        # (yellow, blue, purple) crop counts of the current grove, for the breakdowns in grove_stats.py
+        counts = [0, 0, 0]
+        for crop in self.included:
+            counts[crop.color] += 1
+        return tuple(counts)
+
+
+def initial_order(included_crops):
+    # Same buckets as prioritization_process() + generate_color_based_permutation(), computed straight from the color codes.
+    # 0-2: primary doubles/hybrids/dangers, 3-5: the same for the secondary color, 6: yellow hybrids, 7: yellow doubles
+    blue_count = sum(1 for crop in included_crops if crop.color == BLUE)
+    purple_count = sum(1 for crop in included_crops if crop.color == PURPLE)
+    primary_color = BLUE if blue_count > purple_count else PURPLE # Purple wins ties, same as the original
+
+    buckets = [[] for _ in range(8)]
+    for crop in included_crops:
+        neighbor_color = crop.neighbor.color
+        if crop.color == YELLOW:
+            buckets[7 if neighbor_color == YELLOW else 6].append(crop)
+        else:
+            pairing = 0 if neighbor_color == crop.color else (2 if neighbor_color == YELLOW else 1)
+            buckets[pairing if crop.color == primary_color else 3 + pairing].append(crop)
+    return [crop for bucket in buckets for crop in bucket]
+
+
+def simulate_compact_iteration(grove, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, legacy_upgrades=False, rng=random, color_rng=None, neighbor_rng=None,
+                               harvested_tiers=None, colors=None, profile=None, scores=None):
+    # Same harvest as simulate_process_single_iteration, on the compact state.
+    # rng drives the upgrade rolls, color_rng and neighbor_rng can optionally give the colors/plot count and the 40% rolls their own streams.
+    # harvested_tiers, a list of 9 zeros, gets the harvested T2/T3/T4 seeds of each color added to it (layout of grove_stats.TIER_NAMES).
+    # colors fixes the grove's colors and plot count instead of drawing them, see CompactGrove.reset()
+    # profile (a harvest_profile.HarvestProfile) gets the same phase timers and branch counters as simulate_process_single_iteration
+    # scores, a list of 4 zeros, gets the grove's score for p1, p2, p3 and the 40% loss chance added to it (layout of grove_stats.SCORE_NAMES)
+    if profile is not None:
+        clock = perf_counter()
+        profile.counts['groves'] += 1
+    color_rng = rng if color_rng is None else color_rng
+    neighbor_rng = rng if neighbor_rng is None else neighbor_rng
+    included_crops = grove.reset(color_rng, colors)
+    if profile is not None:
+        clock = timed(profile, 'reset', clock)
+    # The initial order and yellow list only depend on the colors, so they're worked out once per color tuple (66,339 possible at most)
+    key = tuple([crop.color for crop in included_crops])
+    plan = grove.plans.get(key)
+    if plan is None:
+        plan = grove.plans[key] = (initial_order(included_crops), [crop for crop in included_crops if crop.color == YELLOW]) # Yellows in id order, like yellow_harvestable_crops
+        if profile is not None:
+            profile.counts['plan_cache_misses'] += 1
+    ordered, yellow_crops = plan
+    color_mults = (vivid_mult, primal_mult, wild_mult)
+    queue = HarvestQueue(ordered)
+    seed_count = 0
+    if profile is not None:
+        clock = timed(profile, 'plan', clock)
+
+    current_crop = queue.pop()
+    while current_crop is not None:
+        if current_crop.harvestable:
+            current_crop.harvestable = 0
+            neighbor = current_crop.neighbor
+            if neighbor.harvestable == 1 and neighbor_rng.random() < 0.4:
+                neighbor.harvestable = 0
+                if profile is not None:
+                    profile.counts['neighbor_losses'] += 1
+                if scores is not None:
+                    scores[3] += 1 / 0.4
+            elif scores is not None and neighbor.harvestable == 1:
+                scores[3] -= 1 / 0.6 # Survived its roll
+
+            seed_count += (current_crop.tier_two + t3_mult * current_crop.tier_three + t4_mult * current_crop.tier_four) * color_mults[current_crop.color]
+            if harvested_tiers is not None:
+                base = current_crop.color * 3
+                harvested_tiers[base] += current_crop.tier_two
+                harvested_tiers[base + 1] += current_crop.tier_three
+                harvested_tiers[base + 2] += current_crop.tier_four
+
+            current_color = current_crop.color
+            if profile is not None:
+                clock = timed(profile, 'harvest', clock)
+                profile.counts['harvests'] += 1
+            for other_crop in included_crops:
+                if other_crop.harvestable == 1 and other_crop.color != current_color:
+                    other_crop.upgrade_count += 1
+                    upgrade_crop(other_crop, p1, p2, p3, rng, legacy_upgrades, scores)
+                    if profile is not None:
+                        profile.counts['upgrades'] += 1
+            if profile is not None:
+                clock = timed(profile, 'upgrades', clock)
+
+        next_crop = queue.peek()
+        if next_crop is not None:
+            # Decision block, see simulate_process_single_iteration for the reasoning behind each branch
+            if next_crop.neighbor.harvestable == 1 and next_crop.neighbor.color == YELLOW and next_crop.color != YELLOW:
+                if profile is not None:
+                    profile.counts['yellow_at_risk'] += 1
+                next_color = next_crop.color
+                least_juicy = None
+                least_value = None
+                for crop in yellow_crops:
+                    if crop.harvestable == 1 and crop.pending and crop.neighbor.color == next_color and crop.neighbor.harvestable == 1:
+                        value = crop.tier_two + t3_mult * crop.tier_three + t4_mult * crop.tier_four
+                        if least_value is None or value < least_value:
+                            least_juicy, least_value = crop, value
+                if least_juicy is not None:
+                    if profile is not None and least_juicy.neighbor is not next_crop:
+                        profile.counts['hybrid_swap'] += 1
+                    queue.move_to_front(least_juicy.neighbor)
+                    next_crop = least_juicy.neighbor
+
+                at_risk = next_crop.neighbor
+                harvestable_yellows = 0
+                outside_tier_two_count = 0
+                outside_tier_three_count = 0
+                for crop in yellow_crops:
+                    if crop.harvestable == 1:
+                        harvestable_yellows += crop.pending
+                        if crop is not at_risk:
+                            outside_tier_two_count += crop.tier_two
+                            outside_tier_three_count += crop.tier_three
+
+                if harvestable_yellows == 1:
+                    if profile is not None:
+                        profile.counts['one_yellow_check'] += 1
+                    if (at_risk.tier_two * .12) - (at_risk.tier_three * .28) - (at_risk.tier_four * 1.6) <= 0:
+                        queue.move_to_front(at_risk)
+                        if profile is not None:
+                            profile.counts['one_yellow_reorder'] += 1
+                elif harvestable_yellows == 2:
+                    if profile is not None:
+                        profile.counts['two_yellow_check'] += 1
+                    if ((at_risk.tier_two * .12) - (at_risk.tier_three * .28) - (at_risk.tier_four * 1.6) + (outside_tier_two_count * .08) + (outside_tier_three_count * .08)) <= 0:
+                        queue.move_to_front(at_risk)
+                        if profile is not None:
+                            profile.counts['two_yellow_reorder'] += 1
+                elif profile is not None and harvestable_yellows >= 3:
+                    profile.counts['three_plus_yellows'] += 1
+
+            neighbor = next_crop.neighbor
+            if neighbor.harvestable == 1 and neighbor.color == next_crop.color and next_crop.upgrade_count >= 2:
+                if profile is not None:
+                    profile.counts['same_color_check'] += 1
+                if (next_crop.tier_three + (next_crop.tier_four * 4)) < (neighbor.tier_three + (neighbor.tier_four * 4)):
+                    queue.move_to_front(neighbor)
+                    if profile is not None:
+                        profile.counts['same_color_swap'] += 1
+        if profile is not None:
+            clock = timed(profile, 'decision', clock)
+
+        current_crop = queue.pop()
+
+    return seed_count
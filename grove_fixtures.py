@@ -0,0 +1,14 @@
+from RandomGroveHarvesterWithLogic import Crop
+
+# Shared groves for benchmark.py and the tests, so both measure and check the same work
+
+SIM_ARGS = (25, 100, 2.5, 1, 1, .05, .2, .25)  # t3, t4, vivid, primal, wild, p1, p2, p3, same as the harvester's __main__
+
+
+def grove_crops_dict(weights):
+    # The harvester's hardcoded 10 crop layout, 5 plots of two neighbours
+    crops_dict = {i: Crop(id=i, harvestable=1, plot_id='ABCDE'[(i - 1) // 2], tier_one=23, tier_two=0, tier_three=0, tier_four=0, weights=weights) for i in range(1, 11)}
+    for i in range(1, 11, 2):
+        crops_dict[i].neighbor = crops_dict[i + 1]
+        crops_dict[i + 1].neighbor = crops_dict[i]
+    return crops_dict
@@ -0,0 +1,368 @@
+from bisect import bisect_right
+from math import isfinite
+
+# Streaming, mergeable summaries of simulated seed counts.
+# Workers update a GroveStats once per grove in O(1) memory, and summaries from different chunks or processes can be merged afterwards,
+# so a sweep can report the whole distribution (spread, histogram, quantiles, breakdowns) without ever keeping per-grove values around.
+
+
+class RunningMoments:
+    # Count, mean and sum of squared deviations (Welford), merged with Chan's parallel formula
+    __slots__ = ('count', 'mean', 'm2', 'total')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0 # Plain running sum, so totals merge exactly the way the old workers added them up
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def add_moments(self, count, total, m2):
+        # Merges a block of values given its count, sum and sum of squared deviations from its own mean
+        if count == 0:
+            return
+        block_mean = total / count
+        new_count = self.count + count
+        delta = block_mean - self.mean
+        self.mean += delta * count / new_count
+        self.m2 += m2 + delta * delta * self.count * count / new_count
+        self.count = new_count
+        self.total += total
+
+    def merge(self, other):
+        self.add_moments(other.count, other.total, other.m2)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def population_variance(self):
+        return self.m2 / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "variance": self.variance}
+
+
+class TDigest:
+    # Merging t-digest (Dunning) for approximate quantiles. Values are buffered and periodically folded into at most ~compression centroids,
+    # with small centroids near the tails so extreme quantiles stay accurate. Two digests merge by folding one's centroids into the other.
+    __slots__ = ('compression', 'centroids', 'buffer', 'weighted_buffer', 'minimum', 'maximum')
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.centroids = [] # Sorted [mean, weight] pairs
+        self.buffer = []
+        self.weighted_buffer = []
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+
+    def add(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) >= 10 * self.compression:
+            self.compress()
+
+    def add_many(self, values):
+        self.buffer.extend(values)
+        if len(self.buffer) >= 10 * self.compression:
+            self.compress()
+
+    def merge(self, other):
+        other.compress()
+        self.weighted_buffer.extend(other.centroids)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.compress()
+
+    def compress(self):
+        if not self.buffer and not self.weighted_buffer:
+            return
+        if self.buffer:
+            self.minimum = min(self.minimum, min(self.buffer))
+            self.maximum = max(self.maximum, max(self.buffer))
+        items = sorted(self.centroids + self.weighted_buffer + [[value, 1] for value in self.buffer])
+        self.buffer = []
+        self.weighted_buffer = []
+        total_weight = sum(weight for _, weight in items)
+        merged = []
+        cumulative = 0.0
+        current_mean, current_weight = items[0]
+        for mean, weight in items[1:]:
+            q = (cumulative + (current_weight + weight) / 2) / total_weight
+            limit = max(1.0, 4 * total_weight * q * (1 - q) / self.compression)
+            if current_weight + weight <= limit:
+                current_mean += (mean - current_mean) * weight / (current_weight + weight)
+                current_weight += weight
+            else:
+                merged.append([current_mean, current_weight])
+                cumulative += current_weight
+                current_mean, current_weight = mean, weight
+        merged.append([current_mean, current_weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        self.compress()
+        if not self.centroids:
+            return float('nan')
+        total_weight = sum(weight for _, weight in self.centroids)
+        target = q * total_weight
+        # Each centroid's weight is centered on its mean, interpolate linearly between neighboring centers (and out to the min/max at the ends)
+        positions = [self.minimum]
+        points = [0.0]
+        cumulative = 0.0
+        for mean, weight in self.centroids:
+            positions.append(mean)
+            points.append(cumulative + weight / 2)
+            cumulative += weight
+        positions.append(self.maximum)
+        points.append(total_weight)
+        index = bisect_right(points, target)
+        if index >= len(points):
+            return self.maximum
+        left, right = points[index - 1], points[index]
+        if right == left:
+            return positions[index]
+        return positions[index - 1] + (positions[index] - positions[index - 1]) * (target - left) / (right - left)
+
+
+TIER_NAMES = tuple(f"{color} T{tier}" for color in ('Yellow', 'Blue', 'Purple') for tier in (2, 3, 4))
+
+
+class TierTotals:
+    # Per-grove harvested T2/T3/T4 seeds of each color (9 numbers, laid out like TIER_NAMES), as a running mean vector and co-moment matrix.
+    # Color multipliers never feed the harvest decisions, only the final value, so any set of lifeforce prices can be priced from these
+    # afterwards (mean and std. dev. exactly) without simulating the groves again.
+    __slots__ = ('count', 'mean', 'comoment')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = [0.0] * 9
+        self.comoment = [[0.0] * 9 for _ in range(9)]
+
+    def add(self, tiers):
+        self.count += 1
+        delta = [value - mean for value, mean in zip(tiers, self.mean)]
+        self.mean = [mean + d / self.count for mean, d in zip(self.mean, delta)]
+        after = [value - mean for value, mean in zip(tiers, self.mean)]
+        for row, d in zip(self.comoment, delta):
+            if d:
+                for j, a in enumerate(after):
+                    row[j] += d * a
+
+    def add_moments(self, count, mean, comoment):
+        # Merges a block given its count, mean vector and co-moment matrix (Chan's formula, one dimension per tier)
+        if count == 0:
+            return
+        new_count = self.count + count
+        delta = [b - a for a, b in zip(self.mean, mean)]
+        scale = self.count * count / new_count
+        for i in range(9):
+            for j in range(9):
+                self.comoment[i][j] += comoment[i][j] + delta[i] * delta[j] * scale
+        self.mean = [a + d * count / new_count for a, d in zip(self.mean, delta)]
+        self.count = new_count
+
+    def merge(self, other):
+        self.add_moments(other.count, other.mean, other.comoment)
+
+    def price(self, t3_mult, t4_mult, color_mults):
+        # (mean, variance) of the grove value under a different set of (vivid, primal, wild) multipliers.
+        # t3_mult/t4_mult should be the ones that were simulated, other values give the value of the same harvests, not of re-optimized ones.
+        weights = [mult * tier_mult for mult in color_mults for tier_mult in (1, t3_mult, t4_mult)]
+        mean = sum(w * m for w, m in zip(weights, self.mean))
+        if self.count < 2:
+            return mean, 0.0
+        variance = sum(wi * wj * self.comoment[i][j] for i, wi in enumerate(weights) for j, wj in enumerate(weights)) / (self.count - 1)
+        return mean, max(variance, 0.0)
+
+    def to_dict(self):
+        covariance = [[value / (self.count - 1) if self.count > 1 else 0.0 for value in row] for row in self.comoment]
+        return {"count": self.count, "mean": dict(zip(TIER_NAMES, self.mean)), "covariance": covariance}
+
+
+SCORE_NAMES = ('p1', 'p2', 'p3', 'loss') # Layout of a grove's score list: the three upgrade odds and the 40% neighbor loss chance
+
+
+class ScoreGradients:
+    # Likelihood ratio (score function) estimates of dEV/dp for every probability in SCORE_NAMES.
+    # Each grove brings its seed count X and its score S = sum of d/dp log P(every roll the grove made). E[X * S] is the derivative of the average
+    # seed count with respect to p, with the harvest logic held fixed (its thresholds don't depend on p), so one run gives every sensitivity
+    # instead of rerunning the sweep with nudged values. The estimate is the sample covariance of X and S (E[S] = 0, subtracting the mean
+    # seed count only removes noise). Plain sums per probability, so blocks merge exactly and in any grouping.
+    __slots__ = ('count', 'value_total', 'sums')
+
+    def __init__(self):
+        self.count = 0
+        self.value_total = 0.0
+        self.sums = [[0.0] * 5 for _ in SCORE_NAMES] # Sums of S, X*S, S^2, X*S^2, (X*S)^2 per probability
+
+    def add(self, value, scores):
+        self.count += 1
+        self.value_total += value
+        for sums, score in zip(self.sums, scores):
+            if score:
+                weighted = value * score
+                sums[0] += score
+                sums[1] += weighted
+                sums[2] += score * score
+                sums[3] += weighted * score
+                sums[4] += weighted * weighted
+
+    def merge(self, other):
+        self.count += other.count
+        self.value_total += other.value_total
+        for mine, theirs in zip(self.sums, other.sums):
+            for i, value in enumerate(theirs):
+                mine[i] += value
+
+    def gradient(self, index):
+        # (dEV/dp, standard error) for SCORE_NAMES[index]
+        n = self.count
+        if n < 2:
+            return float('nan'), float('nan')
+        mean = self.value_total / n
+        score, weighted, squared, weighted_squared, weighted_weighted = self.sums[index]
+        estimate = (weighted - mean * score) / n
+        second_moment = (weighted_weighted - 2 * mean * weighted_squared + mean * mean * squared) / n # E[(X - mean)^2 S^2]
+        return estimate, max(second_moment - estimate * estimate, 0.0) ** 0.5 / (n - 1) ** 0.5
+
+    def to_dict(self):
+        return {name: dict(zip(("gradient", "standard_error"), self.gradient(i))) for i, name in enumerate(SCORE_NAMES)}
+
+
+class GroveStats:
+    # Everything a worker reports about one weight combination. detailed=False only keeps the moments (used for quick per-batch bookkeeping),
+    # detailed=True also keeps a fixed-bin histogram, a t-digest for quantiles, and mean/variance broken down by plot count and by color mix.
+    def __init__(self, detailed=True, bin_width=50, compression=200):
+        self.detailed = detailed
+        self.moments = RunningMoments()
+        self.bin_width = bin_width
+        self.histogram = {} # bin index -> count, bin i covers [i * bin_width, (i + 1) * bin_width)
+        self.digest = TDigest(compression) if detailed else None
+        self.by_plot_count = {} # 3/4/5 plots -> RunningMoments
+        self.by_colors = {} # (yellow, blue, purple) crop counts -> RunningMoments
+        self.tiers = None # TierTotals, only created when the engine reports harvested tiers
+        self.scores = None # ScoreGradients, only created when the engine reports scores
+
+    def add(self, value, plot_count=None, colors=None, tiers=None, scores=None):
+        self.moments.add(value)
+        if tiers is not None:
+            if self.tiers is None:
+                self.tiers = TierTotals()
+            self.tiers.add(tiers)
+        if scores is not None:
+            if self.scores is None:
+                self.scores = ScoreGradients()
+            self.scores.add(value, scores)
+        if not self.detailed:
+            return
+        bin_index = int(value // self.bin_width)
+        self.histogram[bin_index] = self.histogram.get(bin_index, 0) + 1
+        self.digest.add(value)
+        if plot_count is not None:
+            self._breakdown(self.by_plot_count, plot_count).add(value)
+        if colors is not None:
+            self._breakdown(self.by_colors, colors).add(value)
+
+    def add_many(self, values, plot_counts=None, colors=None, tiers=None):
+        # Batch version of add() for the NumPy engine, values/plot_counts are arrays, colors is an (n, 3) array of color counts
+        # and tiers an (n, 9) array of harvested tiers
+        import numpy as np
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        self.moments.add_moments(values.size, float(values.sum()), float(((values - values.mean()) ** 2).sum()))
+        if tiers is not None:
+            tiers = np.asarray(tiers, dtype=float)
+            centered = tiers - tiers.mean(axis=0)
+            if self.tiers is None:
+                self.tiers = TierTotals()
+            self.tiers.add_moments(len(tiers), tiers.mean(axis=0).tolist(), (centered.T @ centered).tolist())
+        if not self.detailed:
+            return
+        bins, counts = np.unique((values // self.bin_width).astype(np.int64), return_counts=True)
+        for bin_index, count in zip(bins.tolist(), counts.tolist()):
+            self.histogram[bin_index] = self.histogram.get(bin_index, 0) + count
+        self.digest.add_many(values.tolist())
+        groups = []
+        if plot_counts is not None:
+            groups.append((self.by_plot_count, np.asarray(plot_counts)[:, None]))
+        if colors is not None:
+            groups.append((self.by_colors, np.asarray(colors)))
+        for breakdown, keys in groups:
+            unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            for group, key in enumerate(unique_keys.tolist()):
+                group_values = values[inverse == group]
+                key = key[0] if len(key) == 1 else tuple(key)
+                self._breakdown(breakdown, key).add_moments(group_values.size, float(group_values.sum()),
+                                                            float(((group_values - group_values.mean()) ** 2).sum()))
+
+    @staticmethod
+    def _breakdown(breakdown, key):
+        moments = breakdown.get(key)
+        if moments is None:
+            moments = breakdown[key] = RunningMoments()
+        return moments
+
+    def merge(self, other):
+        # Folds another summary (e.g. from a different chunk or process) into this one
+        self.moments.merge(other.moments)
+        if getattr(other, 'tiers', None) is not None: # getattr: summaries cached before tier accounting existed don't have it
+            if self.tiers is None:
+                self.tiers = TierTotals()
+            self.tiers.merge(other.tiers)
+        if getattr(other, 'scores', None) is not None:
+            if self.scores is None:
+                self.scores = ScoreGradients()
+            self.scores.merge(other.scores)
+        if not (self.detailed and other.detailed):
+            self.detailed = False
+            self.digest = None
+            return
+        for bin_index, count in other.histogram.items():
+            self.histogram[bin_index] = self.histogram.get(bin_index, 0) + count
+        self.digest.merge(other.digest)
+        for mine, theirs in ((self.by_plot_count, other.by_plot_count), (self.by_colors, other.by_colors)):
+            for key, moments in theirs.items():
+                self._breakdown(mine, key).merge(moments)
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def total(self):
+        return self.moments.total
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+    @property
+    def variance(self):
+        return self.moments.variance
+
+    def quantile(self, q):
+        return self.digest.quantile(q) if self.detailed else float('nan')
+
+    def to_dict(self, quantiles=(0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)):
+        # JSON-friendly version of the summary
+        summary = self.moments.to_dict()
+        if self.tiers is not None:
+            summary["tier_totals"] = self.tiers.to_dict()
+        if self.scores is not None:
+            summary["sensitivities"] = self.scores.to_dict()
+        if self.detailed:
+            summary["quantiles"] = {str(q): self.quantile(q) for q in quantiles if isfinite(self.quantile(q))}
+            summary["histogram_bin_width"] = self.bin_width
+            summary["histogram"] = {str(bin_index * self.bin_width): count for bin_index, count in sorted(self.histogram.items())}
+            summary["by_plot_count"] = {str(key): moments.to_dict() for key, moments in sorted(self.by_plot_count.items())}
+            summary["by_colors"] = {"Y{}/B{}/P{}".format(*key): moments.to_dict() for key, moments in sorted(self.by_colors.items())}
+        return summary
@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import random
+import sys
+from harvest_core import Crop, simulate_process, exact_process, find_best_orders, price_multipliers
+from random_streams import derive_seed
+
+# Command line version of HarvestSimEXEv4: evaluates harvest orders for many groves at once, without opening the GUI.
+#
+# Scenarios come from a JSON file, a list of
+#   {"name": "map 12", "crops": [{"color": "Yellow", "plot": "A", "tiers": [23, 0, 0, 0]}, ...],
+#    "orders": [[1, 2, 3, ...], ...], "settings": {"t3": 26, "wild": 12000}}
+# where crop ids default to their position in the list (1, 2, ...), "orders" defaults to the list order and "settings" overrides the command line values,
+# or from a CSV file with one row per crop: scenario, plot, color, t1, t2, t3, t4 and an optional position column giving the harvest order.
+# Like the GUI, a crop with no tier counts at all is an unupgraded crop (23 T1 seeds).
+#
+#   python harvest_batch.py groves.json --mode best --top 3 -o best_orders.csv
+
+COLOR_ALIASES = {'yellow': 'Yellow', 'vivid': 'Yellow', 'blue': 'Blue', 'primal': 'Blue', 'purple': 'Purple', 'wild': 'Purple'}
+SETTING_NAMES = ('t3', 't4', 'vivid', 'primal', 'wild', 'p1', 'p2', 'p3')
+OUTPUT_FIELDS = ('scenario', 'rank', 'order', 'mean', 'sd', 'ci_low', 'ci_high')
+
+
+def parse_crop(spec, default_id):
+    # One crop from its JSON form, returns (id, color, plot, (t1, t2, t3, t4))
+    color = COLOR_ALIASES.get(str(spec['color']).strip().lower())
+    if color is None:
+        raise ValueError(f"Unknown crop color {spec['color']!r}")
+    tiers = [int(value) if value not in (None, '') else None for value in spec.get('tiers', [])]
+    tiers += [None] * (4 - len(tiers))
+    if all(value is None for value in tiers):
+        tiers = [23, 0, 0, 0]  # Same default as the GUI: no numbers at all means an unupgraded crop
+    return int(spec.get('id', default_id)), color, str(spec['plot']), tuple(value or 0 for value in tiers)
+
+
+def load_json(path):
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data['scenarios']
+    scenarios = []
+    for index, entry in enumerate(data, start=1):
+        crops = [parse_crop(spec, position) for position, spec in enumerate(entry['crops'], start=1)]
+        orders = [[int(crop_id) for crop_id in order] for order in entry.get('orders', [])]
+        scenarios.append({'name': str(entry.get('name', index)), 'crops': crops, 'orders': orders, 'settings': entry.get('settings', {})})
+    return scenarios
+
+
+def load_csv(path):
+    scenarios = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            scenario = scenarios.setdefault(row['scenario'], {'name': row['scenario'], 'crops': [], 'positions': [], 'orders': [], 'settings': {}})
+            crop = parse_crop({'color': row['color'], 'plot': row['plot'], 'tiers': [row.get(f't{tier}') for tier in range(1, 5)]}, len(scenario['crops']) + 1)
+            scenario['crops'].append(crop)
+            scenario['positions'].append(float(row['position']) if row.get('position') else len(scenario['positions']))
+    for scenario in scenarios.values():
+        positions = scenario.pop('positions')
+        ids = [crop[0] for crop in scenario['crops']]
+        scenario['orders'] = [[crop_id for _, crop_id in sorted(zip(positions, ids))]]
+    return list(scenarios.values())
+
+
+def check_order(order, crop_specs, name):
+    # An order has to harvest every crop of the grove exactly once. Anything else (a missing, repeated or unknown id) would quietly
+    # score a different grove, so it's rejected with the scenario named
+    ids = [crop[0] for crop in crop_specs]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Scenario {name!r} has duplicate crop ids {sorted(crop_id for crop_id in set(ids) if ids.count(crop_id) > 1)}")
+    if sorted(order) != sorted(ids):
+        raise ValueError(f"Scenario {name!r} has order {list(order)}, which isn't a permutation of its crop ids {sorted(ids)}")
+
+
+def build_crops(crop_specs):
+    return [Crop(crop_id, color, 1, plot, *tiers) for crop_id, color, plot, tiers in crop_specs]
+
+
+def evaluate(task):
+    # Pool entry point: one order (exact/simulate) or one grove's search (best), returns a list of output rows
+    mode, name, crop_specs, order, settings, iterations, top_n, seed = task
+    crops = build_crops(crop_specs)
+    multipliers = price_multipliers(settings['vivid'], settings['primal'], settings['wild'])
+    probabilities = (settings['p1'], settings['p2'], settings['p3'])
+    if mode == 'best':
+        results = find_best_orders(crops, settings['t3'], settings['t4'], *multipliers, *probabilities, top_n=top_n, processes=1, seed=seed)
+        return [{'scenario': name, 'rank': rank, 'order': result['order'], 'mean': result['mean'], 'sd': result['sd'],
+                 'ci_low': result['ci'][0] if result['ci'] else None, 'ci_high': result['ci'][1] if result['ci'] else None}
+                for rank, result in enumerate(results, start=1)]
+    if mode == 'exact':
+        mean, variance = exact_process(crops, order, settings['t3'], settings['t4'], *multipliers, *probabilities)
+        return [{'scenario': name, 'rank': None, 'order': order, 'mean': mean, 'sd': variance ** 0.5, 'ci_low': None, 'ci_high': None}]
+    mean, variance = simulate_process(crops, order, settings['t3'], settings['t4'], *multipliers, *probabilities, iterations=iterations, rng=random.Random(seed))
+    half_width = 1.96 * (variance / iterations) ** 0.5
+    return [{'scenario': name, 'rank': None, 'order': order, 'mean': mean, 'sd': variance ** 0.5, 'ci_low': mean - half_width, 'ci_high': mean + half_width}]
+
+
+def make_tasks(scenarios, args):
+    defaults = {name: getattr(args, name) for name in SETTING_NAMES}
+    tasks = []
+    for scenario in scenarios:
+        unknown = set(scenario['settings']) - set(SETTING_NAMES)
+        if unknown:
+            raise ValueError(f"Scenario {scenario['name']!r} has unknown settings {sorted(unknown)}")
+        settings = dict(defaults, **scenario['settings'])
+        if args.mode == 'best':
+            orders = [None]
+        else:
+            orders = scenario['orders'] or [[crop[0] for crop in scenario['crops']]]
+            for order in orders:
+                check_order(order, scenario['crops'], scenario['name'])
+        for order_index, order in enumerate(orders):
+            seed = derive_seed(args.seed, scenario['name'], order_index)  # Fixed per task, so results don't depend on how the pool schedules them
+            tasks.append((args.mode, scenario['name'], scenario['crops'], order, settings, args.iterations, args.top, seed))
+    return tasks
+
+
+def write_rows(rows, output):
+    rows = [dict(row, order=' '.join(str(crop_id) for crop_id in row['order'])) for row in rows]
+    if output and output.endswith('.json'):
+        with open(output, 'w') as f:
+            json.dump(rows, f, indent=2)
+        return
+    f = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if output:
+            f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate harvest orders for a batch of groves without the GUI.")
+    parser.add_argument('scenarios', help="JSON or CSV file of groves")
+    parser.add_argument('--mode', choices=('exact', 'simulate', 'best'), default='exact', help="exact expected value, Monte Carlo, or search for the best orders")
+    parser.add_argument('--iterations', type=int, default=10000, help="groves per order in simulate mode")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores, 1 runs in this process)")
+    parser.add_argument('--t3', type=float, default=26, help="T3 seed value relative to T2")
+    parser.add_argument('--t4', type=float, default=100, help="T4 seed value relative to T2")
+    parser.add_argument('--vivid', type=float, default=4000, help="yellow lifeforce per divine")
+    parser.add_argument('--primal', type=float, default=9000, help="blue lifeforce per divine")
+    parser.add_argument('--wild', type=float, default=9000, help="purple lifeforce per divine")
+    parser.add_argument('--p1', type=float, default=5, help="T3->T4 upgrade chance in percent")
+    parser.add_argument('--p2', type=float, default=20, help="T2->T3 upgrade chance in percent")
+    parser.add_argument('--p3', type=float, default=25, help="T1->T2 upgrade chance in percent")
+    parser.add_argument('--top', type=int, default=5, help="orders to list per grove in best mode")
+    parser.add_argument('--seed', type=int, default=None, help="master seed for simulate mode and the best mode confidence intervals")
+    parser.add_argument('-o', '--output', default=None, help="output file, .json or .csv (default: CSV on stdout)")
+    args = parser.parse_args(argv)
+    if args.seed is None:
+        args.seed = random.SystemRandom().randrange(2 ** 63)
+
+    scenarios = load_json(args.scenarios) if args.scenarios.lower().endswith('.json') else load_csv(args.scenarios)
+    try:
+        tasks = make_tasks(scenarios, args)
+    except ValueError as error:
+        parser.error(str(error))
+    processes = min(args.processes or multiprocessing.cpu_count(), len(tasks))
+    if processes > 1:
+        with multiprocessing.Pool(processes=processes) as pool:
+            results = pool.map(evaluate, tasks)
+    else:
+        results = [evaluate(task) for task in tasks]
+    write_rows([row for rows in results for row in rows], args.output)
+
+
+if __name__ == '__main__':
+    main()
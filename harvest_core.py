@@ -0,0 +1,524 @@
+import random
+import math
+import heapq
+import multiprocessing
+import time
+from collections import deque, OrderedDict
+from upgrade_kernel import upgrade_crop
+from grove_stats import RunningMoments
+from random_streams import derive_seed
+
+# Headless core of HarvestSimEXEv4: the crop model, the Monte Carlo and exact evaluation of a harvest order, and the best-order search.
+# Nothing in here needs tkinter or a display, so it can be imported from scripts and servers (see harvest_batch.py for the command line version).
+
+class Crop:
+    """Represents a crop with various attributes and methods to manage its state."""
+    def __init__(self, id, color, harvestable, plot_id, tier_one, tier_two, tier_three, tier_four):
+        """Initialize a new crop with specific attributes."""
+        self.id = id  # Unique identifier for the crop
+        self.color = color  # Visual representation color for the crop
+        self.harvestable = harvestable  # Status indicating if the crop can be harvested
+        self.plot_id = plot_id  # Identifier for the plot this crop belongs to
+        self.tier_one = tier_one  # First tier value influencing the crop's output
+        self.tier_two = tier_two  # Second tier value
+        self.tier_three = tier_three  # Third tier value
+        self.tier_four = tier_four  # Fourth tier value
+        self.initial_state = (harvestable, tier_one, tier_two, tier_three, tier_four)  # Save initial state for reset
+
+    def reset(self):
+        """Reset the crop to its initial state."""
+        self.harvestable, self.tier_one, self.tier_two, self.tier_three, self.tier_four = self.initial_state
+
+    def __repr__(self):
+        """Provide a string representation of the crop for debugging and logging purposes."""
+        return (f"Crop(ID={self.id}, Color={self.color}, Harvestable={self.harvestable}, "
+                f"PlotID={self.plot_id}, TierOne={self.tier_one}, TierTwo={self.tier_two}, "
+                f"TierThree={self.tier_three}, TierFour={self.tier_four})")
+
+def price_multipliers(vivid_price, primal_price, wild_price):
+    """Turn lifeforce prices (per divine) into color multipliers, the most expensive color per seed gets 1."""
+    max_value = max(vivid_price, primal_price, wild_price)
+    vivid_mult = max_value / vivid_price if vivid_price != 0 else 0
+    primal_mult = max_value / primal_price if primal_price != 0 else 0
+    wild_mult = max_value / wild_price if wild_price != 0 else 0
+    return vivid_mult, primal_mult, wild_mult
+
+class CompiledGrove:
+    """Index-array form of a list of crops, so the simulation loop never has to search the list by id or rebuild plot mate lists."""
+    def __init__(self, crops, vivid_mult=1, primal_mult=1, wild_mult=1):
+        self.crops = crops
+        self.index_of = {crop.id: i for i, crop in enumerate(crops)}
+        # Plot mates and upgrade targets in list order, so the random draws happen in the same order as the original loops
+        self.mates = tuple(tuple(j for j, other in enumerate(crops) if other.plot_id == crop.plot_id and j != i) for i, crop in enumerate(crops))
+        self.other_colors = tuple(tuple(j for j, other in enumerate(crops) if other.color != crop.color) for crop in crops)
+        color_mults = {'Yellow': vivid_mult, 'Blue': primal_mult, 'Purple': wild_mult}
+        self.mults = tuple(color_mults.get(crop.color, 1) for crop in crops)
+
+    def order(self, permutation):
+        """Crop positions for a list of crop ids, ids that aren't in the grove are skipped."""
+        return [self.index_of[crop_id] for crop_id in permutation if crop_id in self.index_of]
+
+def simulate_process(crops, permutation, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1=5, p2=20, p3=25, iterations=10000, legacy_upgrades=False, rng=random):
+    """Simulate the crop processing to calculate average and variance of seed counts."""
+    seed_counts = RunningMoments()  # Streaming mean/variance, no need to keep every iteration's seed count
+    p1 /= 100.0  # Convert percentage probability to decimal for calculation
+    p2 /= 100.0
+    p3 /= 100.0
+    grove = CompiledGrove(crops, vivid_mult, primal_mult, wild_mult)
+    order = grove.order(permutation)
+    mates, other_colors, mults = grove.mates, grove.other_colors, grove.mults
+    for _ in range(iterations):  # Loop through each simulation iteration
+        for crop in crops:
+            crop.reset()  # Reset crops to initial state before each simulation run
+        seed_count = 0       # Sets the seed count to 0 for the start of the iteration
+        for i in order:  # Process each crop based on the permutation of IDs
+            current_crop = crops[i]
+            if current_crop.harvestable:
+                current_crop.harvestable = 0  # Mark crop as non-harvestable after processing
+                # Check for adjacency effects within the same plot
+                for j in mates[i]:
+                    if rng.random() < 0.4:
+                        crops[j].harvestable = 0
+                # Calculate seed addition based on crop tier values and the color multiplier
+                seed_count += (current_crop.tier_two + t3_mult * current_crop.tier_three + t4_mult * current_crop.tier_four) * mults[i]
+
+                # Additional effects on other crops based on tier probabilities
+                for j in other_colors[i]:
+                    if crops[j].harvestable == 1:
+                        upgrade_crop(crops[j], p1, p2, p3, rng, legacy_upgrades)  # One alias table draw per crop, or per-seed rolls if legacy_upgrades is set
+
+        seed_counts.add(seed_count)  # Record seed count separately for this iteration so the value can be reset
+
+    return seed_counts.mean, seed_counts.population_variance
+
+def _simulate_chunk(args):
+    """Pool entry point for one slice of a progressive simulation, returns (count, total, m2) so slices merge exactly."""
+    crops, permutation, settings, iterations, legacy_upgrades, seed = args
+    mean, variance = simulate_process(crops, permutation, *settings, iterations=iterations, legacy_upgrades=legacy_upgrades, rng=random.Random(seed))
+    return iterations, mean * iterations, variance * iterations
+
+class ProgressiveSimulation:
+    """simulate_process split into seeded chunks on a process pool, with a running estimate that can be read at any time."""
+    def __init__(self, pool, crops, permutation, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1=5, p2=20, p3=25, iterations=10000,
+                 chunk_size=500, max_in_flight=None, time_budget=None, legacy_upgrades=False, seed=None):
+        self.pool = pool
+        self.crops = crops
+        self.permutation = list(permutation)
+        self.settings = (t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3)
+        self.iterations = iterations
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight or 2 * multiprocessing.cpu_count()  # Enough to keep every core busy without queueing up the whole run
+        self.legacy_upgrades = legacy_upgrades
+        self.seed = random.randrange(2 ** 63) if seed is None else seed
+        self.moments = RunningMoments()
+        self.submitted = 0  # Iterations handed to the pool so far
+        self.pending = deque()  # AsyncResults in submission order
+        self.cancelled = False
+        self.started = time.perf_counter()
+        self.deadline = None if time_budget is None else self.started + time_budget
+        self._submit()
+
+    def _submit(self):
+        while self.submitted < self.iterations and len(self.pending) < self.max_in_flight:
+            size = min(self.chunk_size, self.iterations - self.submitted)
+            chunk_seed = derive_seed(self.seed, self.submitted)  # Keyed by where the chunk starts, so the result doesn't depend on the pool size
+            task = (self.crops, self.permutation, self.settings, size, self.legacy_upgrades, chunk_seed)
+            self.pending.append(self.pool.apply_async(_simulate_chunk, (task,)))
+            self.submitted += size
+
+    def poll(self):
+        """Merge the chunks that have finished and top the pool back up. Returns True while there's still work running."""
+        if self.done:
+            return False
+        # Chunks are merged strictly in submission order, so a seeded run always gives the same numbers
+        while self.pending and self.pending[0].ready():
+            self.moments.add_moments(*self.pending.popleft().get())
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.cancel()  # Out of time, keep the best estimate so far
+            return False
+        self._submit()
+        return not self.done
+
+    def cancel(self):
+        """Stop handing out chunks. Chunks already on the pool finish in the background and are ignored."""
+        self.cancelled = True
+        self.pending.clear()
+
+    def limit_time(self, time_budget):
+        """Stop within time_budget seconds from now at the latest, for a run that started without the budget it's now held to."""
+        if time_budget is not None:
+            deadline = time.perf_counter() + time_budget
+            self.deadline = deadline if self.deadline is None else min(self.deadline, deadline)
+
+    @property
+    def done(self):
+        return self.cancelled or (not self.pending and self.submitted >= self.iterations)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def result(self):
+        """Current (mean, population variance, iterations merged), same scale as simulate_process."""
+        return self.moments.mean, self.moments.population_variance, self.moments.count
+
+def tier_transition_powers(p1, p2, p3, max_upgrades):
+    """Distribution of a single seed's tier after k upgrades, for every starting tier and k = 0..max_upgrades."""
+    # Each seed moves up one tier per upgrade independently: T1->T2 with p3, T2->T3 with p2, T3->T4 with p1
+    step = ((1 - p3, p3, 0, 0), (0, 1 - p2, p2, 0), (0, 0, 1 - p1, p1), (0, 0, 0, 1))
+    powers = [tuple(tuple(1.0 if i == j else 0.0 for j in range(4)) for i in range(4))]
+    for _ in range(max_upgrades):
+        previous = powers[-1]
+        powers.append(tuple(tuple(sum(previous[i][k] * step[k][j] for k in range(4)) for j in range(4)) for i in range(4)))
+    return powers
+
+def exact_process(crops, permutation, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1=5, p2=20, p3=25):
+    """Exact mean and variance of the seed count for a fixed harvest order, with no sampling noise."""
+    # Seeds upgrade independently of each other, so given which crops are still harvestable at each step, a crop's value is a sum of
+    # independent per-seed Markov chains whose mean and variance are known exactly. The only thing left to branch on is which plot mates the 40% roll removes.
+    p1 /= 100.0  # Convert percentage probability to decimal for calculation
+    p2 /= 100.0
+    p3 /= 100.0
+    grove = CompiledGrove(crops, vivid_mult, primal_mult, wild_mult)
+    order = grove.order(permutation)
+    mates = grove.mates
+    seed_values = (0, 1, t3_mult, t4_mult)  # T1 seeds are worth nothing
+    powers = tier_transition_powers(p1, p2, p3, len(crops))
+
+    moment_cache = {}
+    def crop_moments(i, upgrades):
+        # Mean and second moment of crop i's harvested value after a given number of upgrades
+        key = (i, upgrades)
+        if key not in moment_cache:
+            crop = crops[i]
+            mult = grove.mults[i]
+            mean = 0.0
+            variance = 0.0
+            for tier, count in enumerate(crop.initial_state[1:5]):
+                distribution = powers[upgrades][tier]
+                seed_mean = sum(prob * value for prob, value in zip(distribution, seed_values))
+                seed_square = sum(prob * value * value for prob, value in zip(distribution, seed_values))
+                mean += count * seed_mean
+                variance += count * (seed_square - seed_mean * seed_mean)
+            mean *= mult
+            variance *= mult * mult
+            moment_cache[key] = (mean, variance + mean * mean)
+        return moment_cache[key]
+
+    branch_cache = {}
+    def remaining(position, harvestable, upgrades):
+        # Returns (E[V], E[V^2]) of the value still to be collected from this position on; shared branch prefixes are memoized
+        if position == len(order):
+            return 0.0, 0.0
+        key = (position, harvestable, upgrades)
+        if key in branch_cache:
+            return branch_cache[key]
+        current = order[position]
+        if not harvestable[current]:
+            result = remaining(position + 1, harvestable, upgrades)
+        else:
+            mean, square = crop_moments(current, upgrades[current])
+            at_risk = [j for j in mates[current] if harvestable[j]]
+            expected = 0.0
+            expected_square = 0.0
+            for lost_mask in range(1 << len(at_risk)):  # Every combination of plot mates lost to the 40% roll
+                probability = 1.0
+                after = list(harvestable)
+                after[current] = False
+                for bit, j in enumerate(at_risk):
+                    if lost_mask >> bit & 1:
+                        probability *= 0.4
+                        after[j] = False
+                    else:
+                        probability *= 0.6
+                new_upgrades = tuple(count + 1 if after[j] and crops[j].color != crops[current].color else count for j, count in enumerate(upgrades))
+                rest_mean, rest_square = remaining(position + 1, tuple(after), new_upgrades)
+                expected += probability * (mean + rest_mean)
+                expected_square += probability * (square + 2 * mean * rest_mean + rest_square)
+            result = (expected, expected_square)
+        branch_cache[key] = result
+        return result
+
+    start = tuple(bool(crop.initial_state[0]) for crop in crops)
+    average_seed_count, expected_square = remaining(0, start, tuple(0 for _ in crops))
+    variance = max(expected_square - average_seed_count ** 2, 0.0)
+    return average_seed_count, variance
+
+def order_key(crops, permutation, settings, exact):
+    """Hashable key for one evaluation: the grove as entered, the harvest order, the settings tuple and exact vs simulated."""
+    grove = tuple((crop.id, crop.color, crop.plot_id, crop.initial_state) for crop in crops)
+    return grove, tuple(permutation), tuple(settings), bool(exact)
+
+def adjacent_swaps(permutation):
+    """Every order that differs from permutation by swapping two neighbouring crops."""
+    swaps = []
+    for i in range(len(permutation) - 1):
+        order = list(permutation)
+        order[i], order[i + 1] = order[i + 1], order[i]
+        swaps.append(order)
+    return swaps
+
+class OrderCache:
+    """Least recently used cache of evaluated orders, keyed by order_key()."""
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+def _order_search_context(crops, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3):
+    """Precompute everything the best-order search needs, in a picklable form so it can be shipped to worker processes."""
+    n = len(crops)
+    color_mults = {'Yellow': vivid_mult, 'Blue': primal_mult, 'Purple': wild_mult}
+    seed_values = (0, 1, t3_mult, t4_mult)
+    powers = tier_transition_powers(p1 / 100.0, p2 / 100.0, p3 / 100.0, n)
+    # Expected harvested value of each crop after k upgrades, k = 0..n
+    mean_table = tuple(
+        tuple(color_mults.get(crop.color, 1) * sum(count * sum(prob * value for prob, value in zip(powers[k][tier], seed_values))
+                                                    for tier, count in enumerate(crop.initial_state[1:5]))
+              for k in range(n + 1))
+        for crop in crops)
+    mates = tuple(tuple(j for j, other in enumerate(crops) if other.plot_id == crop.plot_id and j != i) for i, crop in enumerate(crops))
+    colors = tuple(crop.color for crop in crops)
+    # Crops with the same color and tier counts are interchangeable, and so are whole plots holding the same crops
+    crop_types = tuple((crop.color,) + tuple(crop.initial_state[1:5]) for crop in crops)
+    plots = tuple(crop.plot_id for crop in crops)
+    plot_types = {plot: tuple(sorted(crop_types[i] for i in range(n) if plots[i] == plot)) for plot in set(plots)}
+    # The upper bound used for pruning assumes more upgrades never lower a crop's value, which only holds if higher tiers are worth more
+    monotone = 0 <= t3_mult and 1 <= t3_mult <= t4_mult and all(mult >= 0 for mult in color_mults.values())
+    return n, mean_table, mates, colors, crop_types, plots, plot_types, monotone
+
+def _rank_order(best, value, order, top_n):
+    """Add a finished order to the min-heap best, keeping one order per expected value so the top_n are really different choices."""
+    # Orders that tie exactly only differ in a shuffle that can't change anything (e.g. the last crops of separate plots), so listing
+    # more than one of them would just push real alternatives out of the top_n
+    tolerance = 1e-9 * max(1.0, abs(value))
+    if len(best) == top_n and value < best[0][0] - tolerance:
+        return
+    for i, (other_value, other_order) in enumerate(best):
+        if abs(other_value - value) <= tolerance:
+            if order < other_order:
+                best[i] = (other_value, order)  # Ties keep the first order, so the result doesn't depend on which subtree finishes first
+            return
+    if len(best) < top_n:
+        heapq.heappush(best, (value, order))
+    elif value > best[0][0]:
+        heapq.heapreplace(best, (value, order))
+
+def _search_orders(context, prefix, top_n):
+    """Branch and bound over every harvest order that starts with prefix, returns the top_n (expected value, order) pairs."""
+    n, mean_table, mates, colors, crop_types, plots, plot_types, monotone = context
+    best = []  # Min-heap of the top_n orders found so far, one per expected value
+    # Branch states are (harvestable bitmask, upgrade counts packed into one int with `bits` bits per crop), which keeps them cheap to hash and update
+    bits = max(4, n.bit_length())
+    field = (1 << bits) - 1
+    spread = [sum(1 << (bits * j) for j in range(n) if mask >> j & 1) for mask in range(1 << n)]  # Adds one upgrade to every crop in a mask
+    other_color_mask = [sum(1 << j for j in range(n) if colors[j] != colors[c]) for c in range(n)]
+    bound_cache = {}
+
+    def step(states, crop):
+        # Harvest crop in every branch: expected value gained, and the new distribution over (harvestable mask, upgrade counts)
+        gain = 0.0
+        new_states = {}
+        crop_bit = 1 << crop
+        shift = bits * crop
+        values = mean_table[crop]
+        upgrade_mask = other_color_mask[crop]
+        for (harvestable, upgrades), prob in states.items():
+            if not harvestable & crop_bit:
+                new_states[(harvestable, upgrades)] = new_states.get((harvestable, upgrades), 0.0) + prob
+                continue
+            gain += prob * values[upgrades >> shift & field]
+            after = harvestable & ~crop_bit
+            at_risk = [j for j in mates[crop] if after >> j & 1]
+            for lost_mask in range(1 << len(at_risk)):  # Every combination of plot mates lost to the 40% roll
+                branch_prob = prob
+                branch = after
+                for bit, j in enumerate(at_risk):
+                    if lost_mask >> bit & 1:
+                        branch_prob *= 0.4
+                        branch &= ~(1 << j)
+                    else:
+                        branch_prob *= 0.6
+                key = (branch, upgrades + spread[branch & upgrade_mask])
+                new_states[key] = new_states.get(key, 0.0) + branch_prob
+        return gain, new_states
+
+    def upper_bound(states, remaining):
+        # Optimistic value of the rest of the order: every remaining crop survives and gets every upgrade it could still get
+        bound = 0.0
+        for (harvestable, upgrades), prob in states.items():
+            key = (harvestable & remaining, upgrades, remaining)
+            state_bound = bound_cache.get(key)
+            if state_bound is None:
+                alive = harvestable & remaining
+                state_bound = 0.0
+                for c in range(n):
+                    if alive >> c & 1:
+                        extra = bin(alive & other_color_mask[c]).count('1')  # Remaining crops of a different color
+                        state_bound += mean_table[c][min((upgrades >> bits * c & field) + extra, n)]
+                bound_cache[key] = state_bound
+            bound += prob * state_bound
+        return bound
+
+    def search(order, states, value, remaining):
+        if not remaining:
+            _rank_order(best, value, order, top_n)
+            return
+        seen_plots = {}
+        for position, c in enumerate(order):
+            seen_plots.setdefault(plots[c], position)
+        tried = set()
+        candidates = []
+        for c in range(n):
+            if not remaining >> c & 1:
+                continue
+            # Symmetry reduction: two candidates lead to equivalent orders if they are the same kind of crop in an already visited plot,
+            # or the same kind of crop opening an unvisited plot with the same contents
+            plot = plots[c]
+            symmetry_key = (crop_types[c], seen_plots[plot]) if plot in seen_plots else (crop_types[c], None, plot_types[plot])
+            if symmetry_key in tried:
+                continue
+            tried.add(symmetry_key)
+            gain, new_states = step(states, c)
+            rest = remaining & ~(1 << c)
+            bound = value + gain + upper_bound(new_states, rest) if monotone else 0.0
+            candidates.append((bound, c, gain, new_states, rest))
+        candidates.sort(key=lambda candidate: -candidate[0])  # Most promising first, so good orders are found early and prune the rest
+        for bound, c, gain, new_states, rest in candidates:
+            if monotone and len(best) == top_n and bound <= best[0][0]:
+                break  # Dominated: even the best case for the rest of this order can't make the top_n, and neither can anything after it
+            search(order + (c,), new_states, value + gain, rest)
+
+    states = {((1 << n) - 1, 0): 1.0}
+    value = 0.0
+    remaining = (1 << n) - 1
+    for c in prefix:
+        gain, states = step(states, c)
+        value += gain
+        remaining &= ~(1 << c)
+    search(tuple(prefix), states, value, remaining)
+    return best
+
+def _search_orders_task(args):
+    """Pool entry point for one subtree of the search."""
+    return _search_orders(*args)
+
+def _search_tasks(context, top_n):
+    """One search task per distinct first crop, so the subtrees can run across cores."""
+    n, _, _, _, crop_types, plots, plot_types, _ = context
+    first_moves = {}
+    for c in range(n):
+        first_moves.setdefault((crop_types[c], plot_types[plots[c]]), c)
+    return [(context, (c,), top_n) for c in first_moves.values()]
+
+def _verify_order(args):
+    """Exact value of one ranked order plus a seeded re-simulation for its confidence interval (pool entry point)."""
+    crops, permutation, settings, verify_iterations, seed = args
+    expected, variance = exact_process(crops, permutation, *settings)
+    result = {"order": permutation, "mean": expected, "sd": math.sqrt(variance), "ci": None}
+    if verify_iterations:
+        rng = random.Random(seed)  # Same draws for every candidate
+        sampled_mean, sampled_variance = simulate_process(crops, permutation, *settings, iterations=verify_iterations, rng=rng)
+        half_width = 1.96 * math.sqrt(sampled_variance / verify_iterations)
+        result["ci"] = (sampled_mean - half_width, sampled_mean + half_width)
+    return result
+
+def _merge_ranked(partial_results, top_n):
+    """Combine the subtrees' top_n lists into the overall top_n, best first."""
+    best = []
+    for partial in partial_results:
+        for value, order in partial:
+            _rank_order(best, value, order, top_n)
+    return sorted(best, reverse=True)
+
+def find_best_orders(crops, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1=5, p2=20, p3=25, top_n=5, processes=None, verify_iterations=2000, seed=None,
+                     pool=None):
+    """Search every harvest order for the current grove and return the top_n with different expected values, best first."""
+    # Orders are ranked on their exact expected value, so there is no sampling noise in the search itself.
+    # Each returned order is then re-simulated verify_iterations times with the same random seed for every candidate (common random numbers),
+    # which gives a confidence interval for each order whose differences are not swamped by independent noise.
+    # pool is an existing multiprocessing pool to run on. Without one, processes > 1 starts a pool just for this call.
+    settings = (t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3)
+    context = _order_search_context(crops, *settings)
+    if context[0] == 0:
+        return []
+
+    tasks = _search_tasks(context, top_n)
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    processes = processes or multiprocessing.cpu_count()
+    if pool is None and processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(processes=min(processes, len(tasks))) as pool:
+            return find_best_orders(crops, *settings, top_n=top_n, verify_iterations=verify_iterations, seed=seed, pool=pool)
+    run = pool.map if pool is not None else lambda function, items: [function(item) for item in items]
+    ranked = _merge_ranked(run(_search_orders_task, tasks), top_n)
+    return run(_verify_order, [(crops, [crops[c].id for c in order], settings, verify_iterations, seed) for _, order in ranked])
+
+class ProgressiveSearch:
+    """find_best_orders on an existing process pool, polled from the GUI so the window stays responsive while it runs."""
+    def __init__(self, pool, crops, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1=5, p2=20, p3=25, top_n=5, verify_iterations=2000, seed=None):
+        self.pool = pool
+        self.crops = crops
+        self.settings = (t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3)
+        self.top_n = top_n
+        self.verify_iterations = verify_iterations
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        tasks = _search_tasks(_order_search_context(crops, *self.settings), top_n) if crops else []
+        self.subtrees = len(tasks)
+        self.pending = [pool.apply_async(_search_orders_task, (task,)) for task in tasks]  # One per distinct first crop
+        self.ranked = []  # Top orders of each finished subtree
+        self.verifying = None  # AsyncResults of the re-simulation stage, once every subtree is in
+        self.results = None
+        self.cancelled = False
+        self.started = time.perf_counter()
+
+    def poll(self):
+        """Collect finished subtrees and move on to verifying the best orders. Returns True while there's still work running."""
+        if self.done:
+            return False
+        if self.verifying is None:
+            running = []
+            for pending in self.pending:
+                if pending.ready():
+                    self.ranked.append(pending.get())
+                else:
+                    running.append(pending)
+            self.pending = running
+            if not running:
+                ranked = _merge_ranked(self.ranked, self.top_n)
+                self.verifying = [self.pool.apply_async(_verify_order, ((self.crops, [self.crops[c].id for c in order], self.settings, self.verify_iterations, self.seed),))
+                                  for _, order in ranked]
+        if self.verifying is not None and all(pending.ready() for pending in self.verifying):
+            self.results = [pending.get() for pending in self.verifying]
+        return not self.done
+
+    def cancel(self):
+        """Stop waiting for the search. Subtrees already on the pool finish in the background and are ignored."""
+        self.cancelled = True
+        self.pending = []
+        self.verifying = None
+
+    @property
+    def done(self):
+        return self.cancelled or self.results is not None
+
+    @property
+    def searched(self):
+        return self.subtrees - len(self.pending)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
@@ -0,0 +1,54 @@
+from time import perf_counter
+
+# Opt-in instrumentation for the random grove harvester.
+# A HarvestProfile collects time per phase of the harvest (reset, plan, harvest, upgrades, decision) and counts how often each branch
+# of the decision block fires. The simulators only touch it behind an "if profile is not None" check, so it costs next to nothing when it's off.
+# Worker processes fill their own profile per chunk and the parent merges them, the same way GroveStats summaries are merged.
+
+PHASES = ('reset', 'plan', 'harvest', 'upgrades', 'decision', 'engine', 'stats')
+# reset/plan/harvest/upgrades/decision are timed inside the python and compact engines, engine is the whole chunk for the numpy and jit
+# engines (which can't be split up from Python), stats is the time spent adding groves to the GroveStats summaries.
+
+COUNTERS = (
+    'groves', 'harvests', 'neighbor_losses', 'upgrades', 'plan_cache_misses',
+    'yellow_at_risk',      # Next crop is a non-yellow whose yellow neighbor is still harvestable, the decision block's main trigger
+    'hybrid_swap',         # A less juicy yellow's non-yellow neighbor was moved up in place of the next crop
+    'three_plus_yellows',  # 3+ yellows left, sent it without an EV check
+    'one_yellow_check', 'one_yellow_reorder',  # EV check with one yellow left, and how often it moved the yellow up
+    'two_yellow_check', 'two_yellow_reorder',  # Same with two yellows left
+    'same_color_check', 'same_color_swap',     # Same color plot mates with 2+ upgrades, and how often the juicier one was moved up
+)
+
+
+class HarvestProfile:
+    __slots__ = ('seconds', 'counts')
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+    def merge(self, other):
+        if other is None:
+            return
+        for name, value in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + value
+        for name, value in other.counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self):
+        # Totals plus per-grove figures, which are what's comparable between runs of different sizes
+        groves = self.counts['groves']
+        total = sum(self.seconds.values())
+        phases = {name: {"seconds": round(seconds, 6), "share": round(seconds / total, 4) if total else 0.0,
+                         "us_per_grove": round(seconds / groves * 1e6, 3) if groves else None}
+                  for name, seconds in self.seconds.items() if seconds}
+        counters = {name: {"count": count, "per_grove": round(count / groves, 5) if groves else None} for name, count in self.counts.items()
+                    if self.counts['harvests'] or name == 'groves'}  # The numpy and jit engines only count groves
+        return {"groves": groves, "seconds": round(total, 6), "phases": phases, "counters": counters}
+
+
+def timed(profile, phase, start):
+    # Adds the time since start to a phase and returns the new start, for chaining phases back to back
+    now = perf_counter()
+    profile.seconds[phase] += now - start
+    return now
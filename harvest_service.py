@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from harvest_batch import parse_crop, evaluate, check_order, SETTING_NAMES
+from harvest_core import OrderCache
+from random_streams import derive_seed
+
+# Local HTTP/JSON service around harvest_core, so a group of players can share one warm process pool instead of each running the GUI.
+#
+#   python harvest_service.py --port 8765
+#   POST /evaluate  {"crops": [{"color": "Yellow", "plot": "A", "tiers": [10, 5, 2, 0]}, ...], "order": [2, 1, ...],
+#                    "mode": "exact" | "simulate" | "best", "iterations": 10000, "top": 5, "settings": {"t3": 26, "wild": 12000}, "deadline_ms": 2000}
+#   GET  /stats     queue depth, batch and dedupe counters
+#
+# Crops use the same format as harvest_batch.py. Requests are queued, collected into micro-batches, deduplicated (identical groves with identical
+# settings share one evaluation, including ones already in flight or recently finished) and sent to the pool a few tasks per worker call.
+# A full queue answers 503 straight away instead of letting latency grow without bound, and a request that misses its deadline gets a 504.
+# Simulations are seeded from the service seed and the request itself, so identical requests always get identical answers.
+#
+# tests/test_harvest_service.py starts a server on a free localhost port, fires concurrent requests at it and checks the answers.
+
+DEFAULT_SETTINGS = {'t3': 26, 't4': 100, 'vivid': 4000, 'primal': 9000, 'wild': 9000, 'p1': 5, 'p2': 20, 'p3': 25}
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+               500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+MAX_BODY = 1 << 20
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_request(payload, max_iterations, default_deadline):
+    # Validates one /evaluate body and turns it into the task tuple harvest_batch.evaluate() takes (seed filled in later),
+    # returns (key, task, seconds until the deadline)
+    if not isinstance(payload, dict) or not isinstance(payload.get('crops'), list) or not payload['crops']:
+        raise RequestError(400, "Expected a JSON object with a non-empty crops list")
+    mode = payload.get('mode', 'exact')
+    if mode not in ('exact', 'simulate', 'best'):
+        raise RequestError(400, f"Unknown mode {mode!r}")
+    try:
+        crops = tuple(parse_crop(spec, position) for position, spec in enumerate(payload['crops'], start=1))
+        ids = [crop[0] for crop in crops]
+        order = tuple(int(crop_id) for crop_id in payload.get('order', ids)) if mode != 'best' else None
+        iterations = int(payload.get('iterations', 10000))
+        top_n = int(payload.get('top', 5))
+        settings = dict(DEFAULT_SETTINGS)
+        if not isinstance(payload.get('settings', {}), dict):
+            raise RequestError(400, "settings must be a JSON object")
+        for name, value in payload.get('settings', {}).items():
+            if name not in SETTING_NAMES:
+                raise RequestError(400, f"Unknown setting {name!r}")
+            settings[name] = float(value)
+    except (KeyError, TypeError, ValueError) as error:
+        raise RequestError(400, f"Bad crop or order: {error}")
+    if len(set(ids)) != len(ids):
+        raise RequestError(400, "Crop ids must be unique")
+    if order is not None:
+        try:
+            check_order(order, crops, 'request')
+        except ValueError as error:
+            raise RequestError(400, str(error))
+    if not 0 < iterations <= max_iterations:
+        raise RequestError(400, f"iterations must be between 1 and {max_iterations}")
+    deadline_ms = payload.get('deadline_ms', default_deadline * 1000)
+    if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or not 0 < deadline_ms < float('inf'):
+        raise RequestError(400, "deadline_ms must be a positive number")
+    key = (mode, crops, order, tuple(sorted(settings.items())), iterations if mode == 'simulate' else None, top_n if mode == 'best' else None)
+    return key, (mode, 'request', crops, list(order) if order else None, settings, iterations, top_n), deadline_ms / 1000
+
+
+def evaluate_many(tasks):
+    # Pool entry point: several tasks per call, so small exact evaluations don't pay one round trip each
+    return [evaluate(task) for task in tasks]
+
+
+def warm_up():
+    return None
+
+
+class HarvestService:
+    def __init__(self, processes=None, max_queue=256, batch_size=64, batch_window=0.005, default_deadline=5.0, max_iterations=1000000,
+                 cache_size=4096, seed=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.max_queue = max_queue  # Most distinct evaluations queued or running at once
+        self.batch_size = batch_size
+        self.batch_window = batch_window  # How long the batcher waits for more requests after the first one arrives
+        self.default_deadline = default_deadline
+        self.max_iterations = max_iterations
+        self.seed = random.SystemRandom().randrange(2 ** 63) if seed is None else seed
+        self.cache = OrderCache(maxsize=cache_size)  # Finished results, key -> rows
+        self.in_flight = {}  # key -> Future shared by every request waiting on that evaluation
+        self.deadlines = {}  # key -> latest deadline of anyone still waiting, so the batcher can drop work nobody wants anymore
+        self.queue = None
+        self.executor = None
+        self.server = None
+        self.batcher = None
+        self.stats = {'requests': 0, 'evaluated': 0, 'deduplicated': 0, 'cached': 0, 'batches': 0, 'rejected': 0, 'timed_out': 0, 'expired': 0}
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self.queue = asyncio.Queue()
+        self.executor = ProcessPoolExecutor(max_workers=self.processes)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, warm_up) for _ in range(self.processes)))  # Start the workers before the first request
+        self.batcher = asyncio.create_task(self.run_batcher())
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            self.batcher.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    async def submit(self, payload):
+        # Returns the result rows for one request, or raises RequestError
+        self.stats['requests'] += 1
+        key, task, timeout = parse_request(payload, self.max_iterations, self.default_deadline)
+        deadline = time.monotonic() + timeout
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats['cached'] += 1
+            return cached
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.stats['deduplicated'] += 1
+            self.deadlines[key] = max(self.deadlines[key], deadline)
+        else:
+            if len(self.in_flight) >= self.max_queue:
+                self.stats['rejected'] += 1
+                raise RequestError(503, "Queue is full, try again shortly")
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+            self.deadlines[key] = deadline
+            self.queue.put_nowait((key, task))
+        try:
+            # shield() so one caller timing out doesn't cancel the evaluation for everyone else sharing it
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self.stats['timed_out'] += 1
+            raise RequestError(504, "Deadline exceeded")
+
+    async def run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            window_end = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = window_end - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Work whose every requester has already given up isn't worth a worker's time
+            now = time.monotonic()
+            live = []
+            for key, task in batch:
+                if self.deadlines.get(key, 0) <= now:
+                    self.stats['expired'] += 1
+                    self.finish(key, error=RequestError(504, "Deadline exceeded"))
+                else:
+                    live.append((key, task))
+            if live:
+                self.stats['batches'] += 1
+                asyncio.create_task(self.dispatch(live))
+
+    async def dispatch(self, batch):
+        # Splits a batch into one call per worker and resolves every future as its call comes back
+        loop = asyncio.get_running_loop()
+        tasks = []
+        for key, task in batch:
+            mode, name, crops, order, settings, iterations, top_n = task
+            tasks.append((mode, name, crops, order, settings, iterations, top_n, derive_seed(self.seed, key)))
+        per_call = -(-len(batch) // self.processes)
+        calls = []
+        for start in range(0, len(batch), per_call):
+            keys = [key for key, _ in batch[start:start + per_call]]
+            calls.append((keys, loop.run_in_executor(self.executor, evaluate_many, tasks[start:start + per_call])))
+        for keys, call in calls:
+            try:
+                results = await call
+            except Exception as error:
+                for key in keys:
+                    self.finish(key, error=error)
+                continue
+            for key, rows in zip(keys, results):
+                for row in rows:
+                    row.pop('scenario', None)
+                self.stats['evaluated'] += 1
+                self.cache.put(key, rows)
+                self.finish(key, rows)
+
+    def finish(self, key, rows=None, error=None):
+        future = self.in_flight.pop(key, None)
+        self.deadlines.pop(key, None)
+        if future is not None and not future.done():
+            if error is not None:
+                future.set_exception(error)
+                future.exception()  # Marks it retrieved, everyone who was waiting on it may already have timed out
+            else:
+                future.set_result(rows)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {'error': "Request body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, response = await self.route(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, response, close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if path == '/stats':
+            return 200, dict(self.stats, queue_depth=self.queue.qsize(), in_flight=len(self.in_flight))
+        if path != '/evaluate':
+            return 404, {'error': f"No such endpoint {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST"}
+        try:
+            payload = json.loads(body or b'null')
+            return 200, {'results': await self.submit(payload)}
+        except json.JSONDecodeError as error:
+            return 400, {'error': f"Invalid JSON: {error}"}
+        except RequestError as error:
+            return error.status, {'error': str(error)}
+        except Exception as error: # A bug or a worker failure (including one shared by deduplicated requests) still gets an answer
+            return 500, {'error': f"{type(error).__name__}: {error}"}
+
+    async def respond(self, writer, status, payload, close=False):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"{'Connection: close' if close else 'Connection: keep-alive'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        await writer.drain()
+
+
+async def serve(args):
+    service = HarvestService(processes=args.processes, max_queue=args.max_queue, batch_size=args.batch_size, batch_window=args.batch_window / 1000,
+                             default_deadline=args.deadline / 1000, seed=args.seed)
+    port = await service.start(args.host, args.port)
+    print(f"Harvest service listening on http://{args.host}:{port} with {service.processes} worker processes")
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON service for harvest order evaluations.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--max-queue', type=int, default=256, help="queued evaluations before new ones get a 503")
+    parser.add_argument('--batch-size', type=int, default=64, help="most evaluations per micro-batch")
+    parser.add_argument('--batch-window', type=float, default=5, help="ms to wait for more requests before dispatching a batch")
+    parser.add_argument('--deadline', type=float, default=5000, help="default per-request deadline in ms")
+    parser.add_argument('--seed', type=int, default=None, help="service seed for simulate mode")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import numpy as np
+from upgrade_kernel import binomial_cdf_table
+from compact_grove import YELLOW, BLUE, PURPLE, PLOT_COUNT_OPTIONS
+
+# Optional Numba-compiled version of the whole per-grove harvest (reset, initial order, harvesting, upgrades and the decision block)
+# on plain integer arrays. Same heuristic as simulate_compact_iteration, which is what it falls back to when Numba isn't installed
+# (make_chunk_runner checks NUMBA_AVAILABLE). Without Numba the kernel below still runs as ordinary Python, just far too slowly to be useful,
+# which is only handy for stepping through it.
+# tests/test_jit_engine.py checks it against simulate_process_single_iteration.
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+# Crop state columns
+HARVESTABLE, TIER_ONE, TIER_TWO, TIER_THREE, TIER_FOUR, UPGRADE_COUNT = range(6)
+
+
+def grove_template_arrays(initial_crops_dict):
+    # (initial states, neighbor index) arrays for the kernel, crops in id order. Like GrovePlanCache it needs both crops of a plot to be
+    # in or out of every grove size together, which the hardcoded 10 crop dictionary is.
+    crops = sorted(initial_crops_dict.values(), key=lambda crop: crop.id)
+    position = {crop.id: index for index, crop in enumerate(crops)}
+    neighbors = np.array([position[crop.neighbor.id] for crop in crops], dtype=np.int64)
+    for num_crops in PLOT_COUNT_OPTIONS:
+        if any((index < num_crops) != (neighbors[index] < num_crops) for index in range(len(crops))):
+            raise ValueError("The JIT kernel needs both crops of a plot to be in or out of the grove together")
+    return np.array([crop.initial_state for crop in crops], dtype=np.int64), neighbors
+
+
+def binomial_tables(p1, p2, p3, max_seeds):
+    # cdf[i, n, k] = P(Binomial(n, p) <= k) for p = p1, p2, p3, from the same cached tables upgrade_kernel.py uses
+    tables = np.ones((3, max_seeds + 1, max_seeds + 1))
+    for i, p in enumerate((p1, p2, p3)):
+        for n in range(max_seeds + 1):
+            tables[i, n, :n + 1] = binomial_cdf_table(n, p)
+    return tables
+
+
+@njit(cache=True)
+def _draw(tables, which, n):
+    if n <= 0:
+        return 0
+    u = np.random.random()
+    k = 0
+    while k < n and tables[which, n, k] <= u: # bisect_right on the cdf, n is at most a few dozen
+        k += 1
+    return k
+
+
+@njit(cache=True)
+def _move_to_front(queue, head, crop):
+    # ordered_ids.remove(crop); ordered_ids.insert(index + 1, crop) on the part of the order that hasn't been reached yet
+    position = head
+    while queue[position] != crop:
+        position += 1
+    while position > head:
+        queue[position] = queue[position - 1]
+        position -= 1
+    queue[head] = crop
+
+
+@njit(cache=True)
+def _simulate_groves(n_groves, cum_weights, initial_states, neighbors, t3_mult, t4_mult, color_mults, tables, seed):
+    np.random.seed(seed)
+    max_crops = initial_states.shape[0]
+    seed_counts = np.zeros(n_groves)
+    plot_counts = np.zeros(n_groves, dtype=np.int64)
+    color_counts = np.zeros((n_groves, 3), dtype=np.int64)
+    harvested_tiers = np.zeros((n_groves, 9))
+    state = np.zeros((max_crops, 6), dtype=np.int64)
+    colors = np.zeros(max_crops, dtype=np.int64)
+    pending = np.zeros(max_crops, dtype=np.bool_)
+    queue = np.zeros(max_crops, dtype=np.int64)
+    yellows = np.zeros(max_crops, dtype=np.int64)
+    bucket_of = np.zeros(max_crops, dtype=np.int64)
+
+    for grove in range(n_groves):
+        # Reset: colors for every crop, then the plot count, same draws as CompactGrove.reset()
+        for crop in range(max_crops):
+            state[crop, :] = initial_states[crop, :]
+            u = np.random.random() * cum_weights[2]
+            colors[crop] = 0 if u < cum_weights[0] else (1 if u < cum_weights[1] else 2)
+        u = np.random.random() * 4
+        num_crops = 6 if u < 1 else (8 if u < 3 else 10)
+        plot_counts[grove] = num_crops // 2
+
+        # Initial order, see compact_grove.initial_order()
+        blue_count = 0
+        purple_count = 0
+        for crop in range(num_crops):
+            color_counts[grove, colors[crop]] += 1
+            if colors[crop] == BLUE:
+                blue_count += 1
+            elif colors[crop] == PURPLE:
+                purple_count += 1
+        primary = BLUE if blue_count > purple_count else PURPLE
+        num_yellows = 0
+        for crop in range(num_crops):
+            neighbor_color = colors[neighbors[crop]]
+            if colors[crop] == YELLOW:
+                bucket_of[crop] = 7 if neighbor_color == YELLOW else 6
+                yellows[num_yellows] = crop
+                num_yellows += 1
+            else:
+                pairing = 0 if neighbor_color == colors[crop] else (2 if neighbor_color == YELLOW else 1)
+                bucket_of[crop] = pairing if colors[crop] == primary else 3 + pairing
+        length = 0
+        for bucket in range(8):
+            for crop in range(num_crops):
+                if bucket_of[crop] == bucket:
+                    queue[length] = crop
+                    pending[crop] = True
+                    length += 1
+        for crop in range(num_crops, max_crops):
+            pending[crop] = False
+
+        seed_count = 0.0
+        head = 0
+        while head < length:
+            current = queue[head]
+            head += 1
+            pending[current] = False
+            if state[current, HARVESTABLE]:
+                state[current, HARVESTABLE] = 0
+                neighbor = neighbors[current]
+                if state[neighbor, HARVESTABLE] == 1 and np.random.random() < 0.4:
+                    state[neighbor, HARVESTABLE] = 0
+
+                current_color = colors[current]
+                seed_count += (state[current, TIER_TWO] + t3_mult * state[current, TIER_THREE] + t4_mult * state[current, TIER_FOUR]) * color_mults[current_color]
+                harvested_tiers[grove, current_color * 3] += state[current, TIER_TWO]
+                harvested_tiers[grove, current_color * 3 + 1] += state[current, TIER_THREE]
+                harvested_tiers[grove, current_color * 3 + 2] += state[current, TIER_FOUR]
+
+                for other in range(num_crops):
+                    if state[other, HARVESTABLE] == 1 and colors[other] != current_color:
+                        state[other, UPGRADE_COUNT] += 1
+                        t3_success = _draw(tables, 0, state[other, TIER_THREE])
+                        state[other, TIER_FOUR] += t3_success
+                        t2_success = _draw(tables, 1, state[other, TIER_TWO])
+                        state[other, TIER_THREE] += t2_success - t3_success
+                        t1_success = _draw(tables, 2, state[other, TIER_ONE])
+                        state[other, TIER_TWO] += t1_success - t2_success
+                        state[other, TIER_ONE] -= t1_success
+
+            if head < length:
+                # Decision block, same branches as simulate_compact_iteration
+                next_crop = queue[head]
+                next_neighbor = neighbors[next_crop]
+                if state[next_neighbor, HARVESTABLE] == 1 and colors[next_neighbor] == YELLOW and colors[next_crop] != YELLOW:
+                    least_juicy = -1
+                    least_value = 0.0
+                    for i in range(num_yellows):
+                        crop = yellows[i]
+                        if (state[crop, HARVESTABLE] == 1 and pending[crop] and colors[neighbors[crop]] == colors[next_crop]
+                                and state[neighbors[crop], HARVESTABLE] == 1):
+                            value = state[crop, TIER_TWO] + t3_mult * state[crop, TIER_THREE] + t4_mult * state[crop, TIER_FOUR]
+                            if least_juicy < 0 or value < least_value:
+                                least_juicy = crop
+                                least_value = value
+                    if least_juicy >= 0:
+                        next_crop = neighbors[least_juicy]
+                        _move_to_front(queue, head, next_crop)
+
+                    at_risk = neighbors[next_crop]
+                    harvestable_yellows = 0
+                    outside_two = 0
+                    outside_three = 0
+                    for i in range(num_yellows):
+                        crop = yellows[i]
+                        if state[crop, HARVESTABLE] == 1:
+                            if pending[crop]:
+                                harvestable_yellows += 1
+                            if crop != at_risk:
+                                outside_two += state[crop, TIER_TWO]
+                                outside_three += state[crop, TIER_THREE]
+                    risk_ev = state[at_risk, TIER_TWO] * .12 - state[at_risk, TIER_THREE] * .28 - state[at_risk, TIER_FOUR] * 1.6
+                    if harvestable_yellows == 1:
+                        if risk_ev <= 0:
+                            _move_to_front(queue, head, at_risk)
+                    elif harvestable_yellows == 2:
+                        if risk_ev + outside_two * .08 + outside_three * .08 <= 0:
+                            _move_to_front(queue, head, at_risk)
+
+                # next_crop deliberately not updated after the yellow move, same as the original
+                neighbor = neighbors[next_crop]
+                if state[neighbor, HARVESTABLE] == 1 and colors[neighbor] == colors[next_crop] and state[next_crop, UPGRADE_COUNT] >= 2:
+                    if state[next_crop, TIER_THREE] + state[next_crop, TIER_FOUR] * 4 < state[neighbor, TIER_THREE] + state[neighbor, TIER_FOUR] * 4:
+                        _move_to_front(queue, head, neighbor)
+
+        seed_counts[grove] = seed_count
+
+    return seed_counts, plot_counts, color_counts, harvested_tiers
+
+
+def simulate_groves_jit(n_groves, weights, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, template, seed):
+    # Simulates n_groves random groves from a grove_template_arrays() template.
+    # Returns (seed counts, plot counts, (n, 3) color counts, (n, 9) harvested tiers), the same extras the NumPy engine reports.
+    initial_states, neighbors = template
+    cum_weights = np.cumsum(np.asarray(weights, dtype=float))
+    tables = binomial_tables(p1, p2, p3, int(initial_states[:, TIER_ONE:TIER_FOUR + 1].sum(axis=1).max()))
+    color_mults = np.array([vivid_mult, primal_mult, wild_mult], dtype=float)
+    return _simulate_groves(n_groves, cum_weights, initial_states, neighbors, float(t3_mult), float(t4_mult), color_mults, tables, seed & 0xffffffff)
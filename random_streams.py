@@ -0,0 +1,48 @@
+import hashlib
+import random
+
+# Seeded random streams for the random grove harvester.
+# Every stream is keyed by a tuple (e.g. master seed, grove number, stream name) and hashed into its own seed,
+# so two configurations asking for the same key get exactly the same draws no matter which process they run in.
+
+
+def derive_seed(*key):
+    # Turns any tuple of ints/strings into a 64 bit seed, different keys give unrelated seeds
+    digest = hashlib.sha256(repr(key).encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+class CoupledRandom(random.Random):
+    # A stream whose draws are meant to line up with another configuration's (or its antithetic partner's).
+    # upgrade_crop() sees monotone and rolls each tier against its inverse CDF instead of using the alias tables, so a higher roll always means more upgrades
+    monotone = True
+
+
+class AntitheticRandom(CoupledRandom):
+    # Mirror image of a normal stream: every uniform u becomes 1 - u (shifted by one ulp so it stays inside [0, 1)),
+    # so a grove simulated with it rolls high exactly where its partner rolled low
+    def random(self):
+        return 1.0 - 2.0 ** -53 - super().random()
+
+
+class GroveStreams:
+    # Separate streams per grove for the colors/plot count, the 40% neighbor rolls and the upgrade rolls.
+    # Keeping them apart means a configuration that draws different colors still lines up its neighbor and upgrade rolls with the others
+    # as far as possible, instead of everything after the first difference being shifted onto different random numbers.
+    STREAM_NAMES = ('colors', 'neighbor', 'upgrades')
+
+    def __init__(self):
+        self.normal = tuple(CoupledRandom() for _ in self.STREAM_NAMES)
+        self.mirrored = tuple(AntitheticRandom() for _ in self.STREAM_NAMES)
+
+    def for_grove(self, base_seed, grove_index, antithetic=False):
+        # Returns (color_rng, neighbor_rng, upgrade_rng) for one grove. With antithetic pairs, groves 2k and 2k + 1 share a seed
+        # and the second one gets the mirrored streams.
+        if antithetic:
+            streams = self.mirrored if grove_index % 2 else self.normal
+            grove_index //= 2
+        else:
+            streams = self.normal
+        for rng, name in zip(streams, self.STREAM_NAMES):
+            rng.seed(derive_seed(base_seed, grove_index, name))
+        return streams
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+
+# Persistent store for finished blocks of a random grove sweep.
+# Every block of groves is saved under a hash of everything that decides its result (grove template, weights, multipliers, p1-p3,
+# engine, strategy version, seeds, block size), so rerunning a sweep skips the blocks it already has, a killed sweep picks up where it
+# stopped, and overlapping sweeps share whatever combinations they have in common.
+
+
+def config_key(**params):
+    # Stable hash of a combination's parameters. json with sorted keys so the key doesn't depend on argument order
+    encoded = json.dumps(params, sort_keys=True, default=repr)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL") # Readers don't block the sweep that's writing
+        self.connection.execute("CREATE TABLE IF NOT EXISTS configs (key TEXT PRIMARY KEY, params TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS blocks (key TEXT, block INTEGER, count INTEGER, total REAL, stats BLOB, PRIMARY KEY (key, block))")
+        self.connection.commit()
+
+    def register(self, key, params):
+        # Keeps a readable copy of the parameters next to the hash, only for looking around in the database
+        self.connection.execute("INSERT OR IGNORE INTO configs VALUES (?, ?)", (key, json.dumps(params, sort_keys=True, default=repr)))
+        self.connection.commit()
+
+    def load_blocks(self, key, num_blocks):
+        # {block index: GroveStats} for every saved block of this combination below num_blocks
+        rows = self.connection.execute("SELECT block, stats FROM blocks WHERE key = ? AND block < ?", (key, num_blocks))
+        return {block: pickle.loads(stats) for block, stats in rows}
+
+    def store_blocks(self, key, first_block, block_stats):
+        self.connection.executemany("INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?)",
+                                    [(key, block, stats.count, stats.total, pickle.dumps(stats, pickle.HIGHEST_PROTOCOL))
+                                     for block, stats in enumerate(block_stats, first_block)])
+        self.connection.commit() # Committed right away so a killed sweep loses at most the chunks that were still running
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
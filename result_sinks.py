@@ -0,0 +1,186 @@
+import csv
+import os
+import sys
+import time
+
+# Streaming output for run_parallel_simulation. A sink gets two kinds of rows while the sweep runs:
+#   summaries  one row per weight combination, written as soon as that combination finishes (same columns as the returned rows)
+#   blocks     one row per merged block of groves (weights, block number, groves, mean, variance, total), written in merge order
+# so a long sweep that gets killed still leaves everything finished so far on disk.
+#
+# The format follows the file extension, summaries go to the path itself and blocks to the same name with .blocks before the extension:
+#   .arrow / .feather   Arrow IPC stream, appended batch by batch and readable up to the last complete batch even if the run dies (needs pyarrow)
+#   .parquet            Parquet, one row group per flush (needs pyarrow). The footer is only written on close, so use .arrow if partial files matter
+#   .npz                NumPy arrays per column, rewritten in full on every flush (atomically, so the file on disk is always complete)
+#   anything else       CSV, one line per row, flushed as it's written
+# When pyarrow or NumPy isn't installed the sink falls back to CSV next to the requested path and says so on stderr.
+
+
+def column_kind(values):
+    # 'float', 'int64', 'uint64' or 'str', decided from the first batch of a column. Stream seeds use all 64 bits, so a column of big
+    # non-negative ints is taken to be seeds and stored unsigned even if the first few happen to fit in an int64
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return 'uint64' if present and min(present) >= 0 and max(present) >= 2 ** 32 else 'int64'
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return 'float'
+    return 'str'
+
+
+def companion_path(path, suffix):
+    root, extension = os.path.splitext(path)
+    return f"{root}{suffix}{extension}"
+
+
+class CsvTable:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.writer = None
+
+    def append(self, rows):
+        if not rows:
+            return
+        if self.writer is None:
+            self.file = open(self.path, 'w', newline='')
+            self.writer = csv.DictWriter(self.file, fieldnames=list(rows[0]), extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class ArrowTable:
+    # The schema comes from the first batch, later rows are matched to it by column name (missing values become nulls),
+    # so a column that can hold fractions needs floats in the first batch too
+    def __init__(self, path, parquet=False):
+        import pyarrow # Only needed for these formats
+        self.pa = pyarrow
+        self.path = path
+        self.parquet = parquet
+        self.schema = None
+        self.writer = None
+        self.sink = None
+
+    def append(self, rows):
+        if not rows:
+            return
+        pa = self.pa
+        if self.schema is None:
+            types = {'float': pa.float64(), 'int64': pa.int64(), 'uint64': pa.uint64(), 'str': pa.string()}
+            self.schema = pa.schema([(column, types[column_kind([row.get(column) for row in rows])]) for column in rows[0]])
+            if self.parquet:
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.path, self.schema)
+            else:
+                self.sink = pa.OSFile(self.path, 'wb')
+                self.writer = pa.ipc.new_stream(self.sink, self.schema)
+        table = pa.Table.from_pylist(rows, schema=self.schema)
+        if self.parquet:
+            self.writer.write_table(table)
+        else:
+            for batch in table.to_batches():
+                self.writer.write_batch(batch)
+            self.sink.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+
+
+class NpzTable:
+    # .npz files can't be appended to, so every flush rewrites the file from all rows so far (fine for sweep-sized outputs).
+    # That also means column types can be picked from every value so far rather than just the first batch
+    def __init__(self, path):
+        import numpy
+        self.np = numpy
+        self.path = path
+        self.columns = None
+        self.values = {}
+
+    def append(self, rows):
+        if not rows:
+            return
+        np = self.np
+        if self.columns is None:
+            self.columns = list(rows[0])
+            self.values = {column: [] for column in self.columns}
+        for row in rows:
+            for column in self.columns:
+                self.values[column].append(row.get(column))
+        arrays = {}
+        for column, values in self.values.items():
+            kind = column_kind(values)
+            if kind == 'str':
+                arrays[column] = np.array(['' if value is None else str(value) for value in values]) # Plain unicode arrays, so np.load needs no pickle
+            elif kind == 'float' or any(value is None for value in values):
+                arrays[column] = np.array([np.nan if value is None else value for value in values], dtype=float)
+            else:
+                arrays[column] = np.array(values, dtype=kind)
+        temporary = self.path + '.tmp.npz'
+        self.np.savez(temporary, **arrays)
+        os.replace(temporary, self.path) # Readers never see a half written file
+
+    def close(self):
+        pass
+
+
+def open_table(path):
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension in ('.arrow', '.feather'):
+            return ArrowTable(path)
+        if extension == '.parquet':
+            return ArrowTable(path, parquet=True)
+        if extension == '.npz':
+            return NpzTable(path)
+    except ImportError as error:
+        fallback = os.path.splitext(path)[0] + '.csv'
+        print(f"{error.name} isn't installed, writing {fallback} instead of {path}", file=sys.stderr)
+        return CsvTable(fallback)
+    return CsvTable(path)
+
+
+class ResultSink:
+    # Buffers rows and flushes them every flush_interval seconds (summaries straight away), so a sweep with thousands of small blocks
+    # doesn't make one tiny write per block
+    def __init__(self, path, flush_interval=5.0):
+        self.summaries = open_table(path)
+        self.blocks = open_table(companion_path(path, '.blocks'))
+        self.pending_summaries = []
+        self.pending_blocks = []
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+
+    def write_summary(self, row):
+        self.pending_summaries.append(row)
+        self.flush()
+
+    def write_block(self, row):
+        self.pending_blocks.append(row)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.blocks.append(self.pending_blocks)
+        self.summaries.append(self.pending_summaries)
+        self.pending_blocks = []
+        self.pending_summaries = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.blocks.close()
+        self.summaries.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,125 @@
+import multiprocessing
+import random
+from itertools import combinations_with_replacement
+from math import factorial
+from compact_grove import CompactGrove, simulate_compact_iteration, YELLOW, BLUE, PURPLE, PLOT_COUNT_OPTIONS, PLOT_COUNT_CUM_WEIGHTS
+from grove_stats import RunningMoments
+from random_streams import derive_seed
+
+# Stratified engine for the random grove harvester.
+# The atlas weights only change how likely each color configuration is, never what happens once the colors are set. So instead of
+# simulating every weight combination separately, this enumerates every distinct configuration (which plots hold which color pairs,
+# for 6, 8 and 10 crops), estimates each one's average seed count once, and prices every weight combination with the exact
+# probability of each configuration. All combinations share one simulation budget and the color sampling noise is gone entirely.
+# Plots are interchangeable and so are the two crops in a plot as long as every crop starts out the same, which is what keeps it to
+# 434 configurations instead of 3^10.
+
+PLOT_TYPES = tuple(combinations_with_replacement((YELLOW, BLUE, PURPLE), 2)) # YY, YB, YP, BB, BP, PP
+PLOT_COUNT_PROBABILITIES = {crops: (cum - previous) / PLOT_COUNT_CUM_WEIGHTS[-1]
+                            for crops, cum, previous in zip(PLOT_COUNT_OPTIONS, PLOT_COUNT_CUM_WEIGHTS, (0,) + PLOT_COUNT_CUM_WEIGHTS[:-1])}
+
+
+def enumerate_configurations():
+    # Every distinct grove up to plot order and crop order within a plot, as (colors of crops 1..n in id order, number of ordered color
+    # assignments it stands for). Each ordered assignment has probability P(plot count) * product of the color probabilities.
+    configurations = []
+    for num_crops in PLOT_COUNT_OPTIONS:
+        num_plots = num_crops // 2
+        for plots in combinations_with_replacement(PLOT_TYPES, num_plots):
+            arrangements = factorial(num_plots)
+            for plot_type in set(plots):
+                arrangements //= factorial(plots.count(plot_type))
+            arrangements *= 2 ** sum(1 for first, second in plots if first != second) # Mixed plots can be either way round
+            colors = tuple(color for plot in plots for color in plot)
+            configurations.append((colors, arrangements))
+    return configurations
+
+
+def configuration_probability(colors, arrangements, weights):
+    # Exact chance that a grove rolled with these atlas weights ends up in this configuration
+    total = sum(weights)
+    probability = PLOT_COUNT_PROBABILITIES[len(colors)] * arrangements
+    for color in colors:
+        probability *= weights[color] / total
+    return probability
+
+
+def stratum_worker(params):
+    # Simulates count groves of one configuration on the compact engine, seeded by (seed, colors, part) so results don't depend on scheduling
+    index, part, colors, count, initial_crops_dict, sim_args, seed = params
+    grove = CompactGrove.from_crops_dict(initial_crops_dict, (1, 1, 1))
+    rng = random.Random(derive_seed(seed, colors, part))
+    moments = RunningMoments()
+    for _ in range(count):
+        moments.add(simulate_compact_iteration(grove, *sim_args, rng=rng, colors=colors))
+    return index, part, moments
+
+
+def simulate_strata(configurations, counts, initial_crops_dict, sim_args, seed, num_parallel_processes, round_index, part_size=20000):
+    # Runs counts[i] more groves of configuration i, split into parts of at most part_size groves, and returns one RunningMoments per configuration.
+    # Parts are merged back in order so the result is the same for any number of processes.
+    tasks = []
+    for index, ((colors, _), count) in enumerate(zip(configurations, counts)):
+        for part, start in enumerate(range(0, count, part_size)):
+            tasks.append((index, (round_index, part), colors, min(part_size, count - start), initial_crops_dict, sim_args, seed))
+    tasks.sort(key=lambda task: -task[3]) # Biggest parts first, so the small ones fill in the tail
+    if num_parallel_processes:
+        with multiprocessing.Pool(processes=num_parallel_processes) as pool:
+            results = pool.map(stratum_worker, tasks, chunksize=1)
+    else:
+        results = [stratum_worker(task) for task in tasks]
+
+    moments = [RunningMoments() for _ in configurations]
+    for index, _, part_moments in sorted(results, key=lambda result: (result[0], result[1])):
+        moments[index].merge(part_moments)
+    return moments
+
+
+def run_stratified_simulation(initial_crops_dict, t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3, total_budget, num_parallel_processes, weight_combinations,
+                              seed=None, pilot_size=500):
+    # Prices every weight combination from one shared budget of total_budget groves.
+    # A pilot of pilot_size groves per configuration (fewer if that would take more than half the budget) measures how noisy each one is,
+    # and the rest of the budget goes where it helps most (Neyman allocation: average probability across the weight combinations x std. dev.).
+    # A budget too small for a pilot of 2 groves per configuration raises ValueError. Returns rows like run_parallel_simulation,
+    # with "Std Error" being the standard error of each average (nothing is left of the color sampling noise, only the harvest's own).
+    states = {crop.initial_state for crop in initial_crops_dict.values()}
+    if len(states) != 1:
+        raise ValueError("The stratified engine needs every crop to start out the same, otherwise plots aren't interchangeable")
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(63)
+    sim_args = (t3_mult, t4_mult, vivid_mult, primal_mult, wild_mult, p1, p2, p3)
+
+    configurations = enumerate_configurations()
+    pilot_size = min(pilot_size, total_budget // (2 * len(configurations)))
+    if pilot_size < 2:
+        raise ValueError(f"A budget of {total_budget} groves is too small for the stratified engine, it needs at least {4 * len(configurations)} "
+                         f"(a pilot of 2 groves for each of the {len(configurations)} configurations, using at most half the budget)")
+    probabilities = [[configuration_probability(colors, arrangements, weights) for colors, arrangements in configurations] for weights in weight_combinations]
+    average_probability = [sum(column) / len(probabilities) for column in zip(*probabilities)]
+
+    moments = simulate_strata(configurations, [pilot_size] * len(configurations), initial_crops_dict, sim_args, seed, num_parallel_processes, 0)
+    remaining = total_budget - pilot_size * len(configurations)
+    if remaining > 0:
+        scores = [probability * moment.variance ** 0.5 for probability, moment in zip(average_probability, moments)]
+        total_score = sum(scores)
+        if total_score > 0:
+            extra = [int(remaining * score / total_score) for score in scores]
+            for moment, extra_moments in zip(moments, simulate_strata(configurations, extra, initial_crops_dict, sim_args, seed, num_parallel_processes, 1)):
+                moment.merge(extra_moments)
+
+    results = []
+    for weights, weight_probabilities in zip(weight_combinations, probabilities):
+        mean = sum(p * moment.mean for p, moment in zip(weight_probabilities, moments))
+        second_moment = sum(p * (moment.variance + moment.mean ** 2) for p, moment in zip(weight_probabilities, moments))
+        standard_error = sum(p * p * moment.variance / moment.count for p, moment in zip(weight_probabilities, moments) if moment.count) ** 0.5
+        results.append({
+            "Yellow Weight": weights[0],
+            "Blue Weight": weights[1],
+            "Purple Weight": weights[2],
+            "Average Seed Count": round(mean, 2),
+            "Std Dev": round(max(second_moment - mean * mean, 0.0) ** 0.5, 2),
+            "Std Error": round(standard_error, 3),
+            "Iterations Used": sum(moment.count for moment in moments), # Shared by every row
+            "Seed": seed,
+        })
+    return results
@@ -0,0 +1,273 @@
+import argparse
+import importlib
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from multiprocessing.connection import Listener, Client
+
+# Executors for run_chunked() in RandomGroveHarvesterWithLogic.py. The scheduler only needs three things from one: submit(function, args, callback,
+# error_callback), a max_in_flight it can read before handing out more chunks, and to be usable as a context manager around a sweep.
+#
+#   InProcessExecutor   runs every chunk right away in this process (num_parallel_processes=0)
+#   PoolExecutor        the local multiprocessing.Pool (the default)
+#   SocketCoordinator   hands chunks to worker processes that connect over TCP (or a Unix socket), on this machine or any other
+#
+# A worker on another machine runs the same checkout of this repo and connects with:
+#   python sweep_executors.py worker coordinator-host:5800 --authkey <key> --processes 8 --retry
+# Messages are pickled, so only ever accept workers (and coordinators) you trust. The authkey is checked with an HMAC handshake
+# before anything is unpickled. A busy worker sends a heartbeat every HEARTBEAT_INTERVAL seconds while it simulates a chunk, and one that disconnects,
+# misses heartbeats for heartbeat_timeout seconds (a machine that lost power or network never closes its socket) or runs past task_timeout
+# has its chunk put back in the queue for someone else.
+# Chunks are merged in block order whoever simulates them, so a sweep gives the same numbers on any mix of machines.
+#
+# tests/test_sweep_executors.py runs a seeded sweep through a coordinator and several localhost workers, kills one of them mid-sweep,
+# and compares the results with an in-process run.
+
+HEARTBEAT_INTERVAL = 5 # Seconds between a busy worker's heartbeats
+HEARTBEAT_TIMEOUT = 60 # Seconds without a heartbeat or result before the coordinator gives up on a worker. Generous, since a compiled (jit) kernel
+                       # holds the GIL and can delay heartbeats for as long as one call into it takes
+
+
+class InProcessExecutor:
+    max_in_flight = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, function, args, callback, error_callback):
+        try:
+            result = function(*args)
+        except Exception as error:
+            error_callback(error)
+            return
+        callback(result)
+
+
+class PoolExecutor:
+    def __init__(self, processes=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.pool = None
+
+    @property
+    def max_in_flight(self):
+        return 2 * self.processes # About two chunks per process, so no core waits on the scheduler
+
+    def __enter__(self):
+        self.pool = multiprocessing.Pool(processes=self.processes)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.terminate() # Same as leaving a with multiprocessing.Pool() block, anything still running is dropped
+        self.pool = None
+        return False
+
+    def submit(self, function, args, callback, error_callback):
+        self.pool.apply_async(function, args, callback=callback, error_callback=error_callback)
+
+
+def parse_address(text):
+    # "host:port" for TCP, anything else is a Unix socket path
+    host, _, port = text.rpartition(':')
+    return (host or '127.0.0.1', int(port)) if port.isdigit() else text
+
+
+class SocketCoordinator:
+    # Accepts worker connections in the background and keeps serving them across sweeps, so workers only have to be started once.
+    # Every connection gets its own thread that hands its worker one chunk at a time and waits for the result.
+    def __init__(self, address, authkey, task_timeout=None, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+        self.task_timeout = task_timeout # Seconds before a chunk is given up on and requeued even if its worker is still alive, None for no limit
+        self.heartbeat_timeout = heartbeat_timeout # Seconds of silence before a worker counts as dead
+        self.tasks = queue.Queue()
+        self.generation = 0 # Bumped every sweep, results for an older sweep's chunks are dropped
+        self.workers = 0
+        self.requeued = 0
+        self.lock = threading.Lock()
+        self.listener = None
+        self.closed = False
+
+    @property
+    def max_in_flight(self):
+        return 2 * max(1, self.workers)
+
+    def start(self):
+        if self.listener is None:
+            self.listener = Listener(self.address, authkey=self.authkey)
+            self.address = self.listener.address # Picks up the real port when port 0 was asked for
+            threading.Thread(target=self.accept_loop, daemon=True).start()
+        return self.address
+
+    def __enter__(self):
+        self.start()
+        with self.lock:
+            self.generation += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        # Chunks nobody has picked up yet are dropped, ones already running finish on their worker and are ignored
+        while True:
+            try:
+                self.tasks.get_nowait()
+            except queue.Empty:
+                break
+        with self.lock:
+            self.generation += 1
+        return False
+
+    def close(self):
+        # Tells connected workers to stop and stops accepting new ones
+        self.closed = True
+        if self.listener is not None:
+            self.listener.close()
+
+    def submit(self, function, args, callback, error_callback):
+        self.tasks.put((self.generation, function, args, callback, error_callback))
+
+    def accept_loop(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                if self.closed:
+                    return
+                continue # A failed handshake only costs that one connection
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        with self.lock:
+            self.workers += 1
+        task = None
+        try:
+            while not self.closed:
+                try:
+                    task = self.tasks.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                generation, function, args, callback, error_callback = task
+                if generation != self.generation:
+                    task = None
+                    continue
+                connection.send((function, args))
+                status, result = self.wait_for_result(connection)
+                finished, task = task, None
+                if finished[0] == self.generation:
+                    (callback if status == 'ok' else error_callback)(result)
+            connection.send(None) # Coordinator is closing
+        except (OSError, EOFError, TimeoutError):
+            if task is not None:
+                # The worker died (or hung) holding a chunk, someone else gets it
+                with self.lock:
+                    self.requeued += 1
+                self.tasks.put(task)
+        finally:
+            with self.lock:
+                self.workers -= 1
+            connection.close()
+
+    def wait_for_result(self, connection):
+        # Skips heartbeats until the worker's reply comes in
+        deadline = None if self.task_timeout is None else time.monotonic() + self.task_timeout
+        while True:
+            wait = self.heartbeat_timeout if deadline is None else min(self.heartbeat_timeout, deadline - time.monotonic())
+            if wait <= 0 or not connection.poll(wait):
+                raise TimeoutError("Worker missed its heartbeats or took longer than task_timeout")
+            status, result = connection.recv()
+            if status != 'alive':
+                return status, result
+
+
+def run_worker(address, authkey, retry=False, main_module=None):
+    # Connects to a coordinator and runs whatever it sends until it says stop. With retry, keeps reconnecting when the coordinator
+    # isn't up yet or goes away, so a worker can be left running on an idle machine between sweeps.
+    # main_module names the script the coordinator runs as __main__ (e.g. RandomGroveHarvesterWithLogic): the Crop objects and chunk_worker it sends
+    # are pickled as __main__.<name>, so that module's names are made available under __main__ here too.
+    address = parse_address(address) if isinstance(address, str) else address
+    authkey = authkey.encode() if isinstance(authkey, str) else authkey
+    if main_module:
+        main = sys.modules['__main__']
+        for name, value in vars(importlib.import_module(main_module)).items():
+            if not name.startswith('__') and not hasattr(main, name):
+                setattr(main, name, value)
+    while True:
+        try:
+            connection = Client(address, authkey=authkey)
+        except OSError:
+            if not retry:
+                raise
+            time.sleep(2)
+            continue
+        stopped = False
+        lock = threading.Lock() # The heartbeat thread and the reply share the connection
+        try:
+            while True:
+                message = connection.recv()
+                if message is None:
+                    stopped = True
+                    break
+                function, args = message
+                done = threading.Event()
+                threading.Thread(target=send_heartbeats, args=(connection, lock, done), daemon=True).start()
+                try:
+                    reply = ('ok', function(*args))
+                except Exception as error:
+                    reply = ('error', error)
+                finally:
+                    done.set()
+                with lock:
+                    connection.send(reply)
+        except (OSError, EOFError):
+            pass
+        finally:
+            connection.close()
+        if not retry or stopped:
+            return
+        time.sleep(1)
+
+
+def send_heartbeats(connection, lock, done):
+    # Runs next to a chunk so the coordinator can tell a busy worker from a dead machine. Checking done under the lock means no heartbeat
+    # can follow the reply
+    while not done.wait(HEARTBEAT_INTERVAL):
+        with lock:
+            if done.is_set():
+                return
+            try:
+                connection.send(('alive', None))
+            except OSError:
+                return
+
+
+def start_local_workers(address, authkey, processes, retry=False, main_module=None):
+    workers = [multiprocessing.Process(target=run_worker, args=(address, authkey, retry, main_module), daemon=True) for _ in range(processes)]
+    for process in workers:
+        process.start()
+    return workers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remote workers for run_parallel_simulation sweeps.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker_parser = commands.add_parser('worker', help="connect to a coordinator and simulate the chunks it hands out")
+    worker_parser.add_argument('address', help="coordinator host:port, or a Unix socket path")
+    worker_parser.add_argument('--authkey', required=True, help="shared secret, same as the coordinator's")
+    worker_parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(), help="worker processes to start (default: all cores)")
+    worker_parser.add_argument('--retry', action='store_true', help="keep reconnecting instead of exiting when the coordinator goes away")
+    worker_parser.add_argument('--main-module', default='RandomGroveHarvesterWithLogic', help="script the coordinator runs as __main__")
+    args = parser.parse_args(argv)
+
+    processes = start_local_workers(args.address, args.authkey, args.processes, args.retry, args.main_module)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import random
+import pytest
+from RandomGroveHarvesterWithLogic import simulate_process_single_iteration
+from compact_grove import CompactGrove, simulate_compact_iteration
+from grove_fixtures import grove_crops_dict, SIM_ARGS
+
+
+@pytest.mark.parametrize('legacy', [False, True])
+@pytest.mark.parametrize('weights', [(.55, .55, 1), (1, 1, 1), (1, .55, .55)])
+def test_compact_engine_matches_crop_loop(weights, legacy, groves=300):
+    # Seeds the global generator the same way for both engines, so every grove has to come out with exactly the same seed count
+    crops_dict = grove_crops_dict(weights)
+    grove = CompactGrove.from_crops_dict(crops_dict, weights)
+    for index in range(groves):
+        random.seed(index)
+        expected = simulate_process_single_iteration(crops_dict, *SIM_ARGS, legacy)
+        random.seed(index)
+        assert simulate_compact_iteration(grove, *SIM_ARGS, legacy, random) == expected, f"Grove {index} differs"
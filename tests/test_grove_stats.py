@@ -0,0 +1,13 @@
+from RandomGroveHarvesterWithLogic import run_parallel_simulation
+from grove_fixtures import grove_crops_dict, SIM_ARGS
+
+
+def test_python_and_compact_engines_score_the_same_rolls(iterations=5000, seed=4):
+    # The python and compact engines make the same draws for the same seed, so they have to score exactly the same rolls:
+    # any difference means one of them is scoring upgrades or losses that can't affect the seed count
+    weights = (.55, .55, 1)
+    rows = [run_parallel_simulation(grove_crops_dict(weights), *SIM_ARGS, iterations, 0, [weights], engine=engine, seed=seed, detailed_stats=False,
+                                    sensitivities=True)[0] for engine in ('python', 'compact')]
+    gradients = [{name: value for name, value in row.items() if name.startswith('dEV/')} for row in rows]
+    assert gradients[0]
+    assert gradients[0] == gradients[1]
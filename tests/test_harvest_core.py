@@ -0,0 +1,62 @@
+import multiprocessing
+import time
+from itertools import permutations
+import pytest
+from harvest_core import Crop, exact_process, find_best_orders, ProgressiveSearch, ProgressiveSimulation
+
+SETTINGS = (26, 100, 2.25, 1, 1)  # t3, t4, vivid, primal, wild, the GUI defaults
+COLORS = ('Yellow', 'Blue', 'Purple', 'Yellow', 'Blue', 'Blue')
+TIERS = ((23, 0, 0, 0), (10, 9, 3, 1), (15, 6, 2, 0), (23, 0, 0, 0), (5, 12, 5, 1), (20, 3, 0, 0))
+
+
+def grove(colors=COLORS):
+    return [Crop(i + 1, colors[i], 1, 'ABC'[i // 2], *TIERS[i]) for i in range(len(colors))]
+
+
+def test_best_orders_are_the_top_distinct_expected_values():
+    crops = grove()
+    values = {round(exact_process(crops, list(order), *SETTINGS)[0], 6) for order in permutations(range(1, 7))}
+    results = find_best_orders(crops, *SETTINGS, processes=1, seed=1)
+    assert [round(result['mean'], 6) for result in results] == sorted(values, reverse=True)[:5]
+
+
+def test_orders_that_tie_are_listed_once():
+    # Nothing upgrades anything in a single color grove, so every order of these unupgraded crops ties
+    crops = [Crop(i + 1, 'Yellow', 1, 'ABC'[i // 2], 23, 0, 0, 0) for i in range(6)]
+    results = find_best_orders(crops, *SETTINGS, processes=1, seed=1)
+    assert len(results) == 1
+
+
+def test_pool_and_progressive_search_match_the_serial_search():
+    crops = grove()
+    expected = find_best_orders(crops, *SETTINGS, processes=1, seed=1)
+    with multiprocessing.Pool(processes=2) as pool:
+        assert find_best_orders(crops, *SETTINGS, seed=1, pool=pool) == expected
+        search = ProgressiveSearch(pool, crops, *SETTINGS, seed=1)
+        deadline = time.monotonic() + 30
+        while search.poll():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    assert search.results == expected
+
+
+def test_cancelled_search_has_no_results():
+    with multiprocessing.Pool(processes=1) as pool:
+        search = ProgressiveSearch(pool, grove(), *SETTINGS, seed=1)
+        search.cancel()
+        assert not search.poll()
+    assert search.results is None and search.done
+
+
+def test_limit_time_stops_a_running_simulation():
+    # An adopted background run has no deadline of its own, limit_time holds it to the user's budget from then on
+    with multiprocessing.Pool(processes=1) as pool:
+        evaluation = ProgressiveSimulation(pool, grove(), [1, 2, 3, 4, 5, 6], *SETTINGS, iterations=10 ** 7, chunk_size=200)
+        evaluation.limit_time(None)
+        assert evaluation.deadline is None
+        evaluation.limit_time(0.2)
+        limited = time.perf_counter()
+        while evaluation.poll():
+            time.sleep(0.01)
+        assert time.perf_counter() - limited < 2
+    assert evaluation.cancelled and evaluation.result()[2] < evaluation.iterations
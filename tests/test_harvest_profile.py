@@ -0,0 +1,17 @@
+import json
+from RandomGroveHarvesterWithLogic import run_parallel_simulation
+from grove_fixtures import grove_crops_dict, SIM_ARGS
+
+
+def test_python_and_compact_engines_count_the_same_branches(tmp_path, iterations=5000, seed=4):
+    # The python and compact engines make the same draws for the same seed, so apart from plan_cache_misses (their plan caches live for
+    # different lengths of time) every counter has to come out identical, otherwise cross-engine profiles aren't comparable
+    weights = (.55, .55, 1)
+    counts = {}
+    for engine in ('python', 'compact'):
+        path = tmp_path / f"{engine}.json"
+        run_parallel_simulation(grove_crops_dict(weights), *SIM_ARGS, iterations, 0, [weights], engine=engine, seed=seed, profile_file=str(path))
+        counters = json.loads(path.read_text())["total"]["counters"]
+        counts[engine] = {name: counter["count"] for name, counter in counters.items() if name != 'plan_cache_misses'}
+    assert counts['python']['upgrades'] > 0
+    assert counts['python'] == counts['compact']
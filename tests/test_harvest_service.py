@@ -0,0 +1,94 @@
+import asyncio
+import json
+import pytest
+from harvest_batch import parse_crop, evaluate
+from harvest_service import HarvestService, DEFAULT_SETTINGS
+
+
+def grove(n):
+    crops = [{"color": "Yellow", "plot": "A", "tiers": [10 + n, 5, 2, 0]}, {"color": "Blue", "plot": "A", "tiers": [15, 4, 1, 0]},
+             {"color": "Purple", "plot": "B"}, {"color": "Yellow", "plot": "B", "tiers": [5, 6, 3, 1]}]
+    return {"crops": crops, "mode": "exact"}
+
+
+async def post(port, path, payload):
+    # Minimal one-shot HTTP client, returns (status, json body)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode() if payload is not None else b''
+    method = 'POST' if payload is not None else 'GET'
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response = await reader.read()
+    writer.close()
+    return status, json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+def run_with_service(scenario, **kwargs):
+    # Runs scenario(service, port) against a service on a free localhost port
+    async def main():
+        service = HarvestService(**dict({'processes': 2, 'max_queue': 8, 'seed': 1}, **kwargs))
+        port = await service.start(port=0)
+        try:
+            await scenario(service, port)
+        finally:
+            await service.close()
+    asyncio.run(main())
+
+
+def test_concurrent_requests_are_deduplicated():
+    async def scenario(service, port):
+        groves = [grove(n) for n in range(5)]
+        responses = await asyncio.gather(*(post(port, '/evaluate', groves[n % 5]) for n in range(40)))
+        assert all(status == 200 for status, _ in responses), responses
+        for n, (_, body) in enumerate(responses):
+            expected = evaluate(('exact', 'request', tuple(parse_crop(spec, i) for i, spec in enumerate(groves[n % 5]['crops'], start=1)),
+                                 [1, 2, 3, 4], DEFAULT_SETTINGS, 1, 1, 0))[0]
+            assert body['results'][0]['mean'] == pytest.approx(expected['mean'], abs=1e-9)
+        assert service.stats['evaluated'] <= 5, service.stats
+    run_with_service(scenario)
+
+
+def test_identical_simulate_requests_share_one_seeded_evaluation():
+    async def scenario(service, port):
+        simulate = dict(grove(0), mode="simulate", iterations=20000)
+        first, second = await asyncio.gather(post(port, '/evaluate', simulate), post(port, '/evaluate', simulate))
+        assert first == second
+    run_with_service(scenario)
+
+
+def test_request_past_its_deadline_answers_504():
+    async def scenario(service, port):
+        slow = dict(grove(1), mode="simulate", iterations=1000000, deadline_ms=1)  # Expires inside the batch window, so it's never dispatched
+        status, body = await post(port, '/evaluate', slow)
+        await asyncio.sleep(0.05)
+        assert status == 504 and service.stats['expired'] == 1, (status, body, service.stats)
+    run_with_service(scenario)
+
+
+def test_full_queue_answers_503():
+    async def scenario(service, port):
+        flood = [dict(grove(n % 20), mode="simulate", iterations=2000 + n) for n in range(60)]
+        statuses = [status for status, _ in await asyncio.gather(*(post(port, '/evaluate', payload) for payload in flood))]
+        assert 503 in statuses and 200 in statuses, statuses
+    run_with_service(scenario)
+
+
+def test_bad_requests_answer_400():
+    async def scenario(service, port):
+        bad_requests = [{"crops": [{"color": "Green", "plot": "A"}]}, dict(grove(0), order=[1, 9]), dict(grove(0), order=[1, 1, 2, 3]),
+                        dict(grove(0), settings=[1]), dict(grove(0), deadline_ms="x"), dict(grove(0), deadline_ms=-5), dict(grove(0), deadline_ms=True)]
+        for bad in bad_requests:
+            status, body = await post(port, '/evaluate', bad)
+            assert status == 400, (bad, status, body)
+    run_with_service(scenario)
+
+
+def test_unexpected_failure_answers_500():
+    async def scenario(service, port):
+        async def broken(payload):
+            raise ZeroDivisionError("worker failed")
+        service.submit = broken
+        status, body = await post(port, '/evaluate', grove(0))
+        assert status == 500, (status, body)
+    run_with_service(scenario)
@@ -0,0 +1,35 @@
+import random
+from copy import deepcopy
+from statistics import NormalDist
+import pytest
+
+pytest.importorskip('numba')
+np = pytest.importorskip('numpy')
+
+from RandomGroveHarvesterWithLogic import simulate_process_single_iteration
+from jit_grove_engine import simulate_groves_jit, grove_template_arrays
+from grove_fixtures import grove_crops_dict, SIM_ARGS
+
+
+@pytest.mark.parametrize('weights', [(1, 1, 1), (1, .55, .55)])
+def test_kernel_matches_crop_loop_distribution(weights, iterations=3000, seed=0):
+    # The kernel has its own random generator, so it can't match grove for grove. Instead 10x as many kernel groves are compared with
+    # simulate_process_single_iteration: means with a z-score, seed count histograms with a chi-square test
+    crops_dict = grove_crops_dict(weights)
+    random.seed(seed)
+    reference = np.array([simulate_process_single_iteration(crops_dict, *SIM_ARGS) for _ in range(iterations)])
+    kernel, _, _, _ = simulate_groves_jit(10 * iterations, weights, *SIM_ARGS, grove_template_arrays(deepcopy(crops_dict)), seed + 1)
+
+    standard_error = (reference.var(ddof=1) / len(reference) + kernel.var(ddof=1) / len(kernel)) ** 0.5
+    z_mean = (kernel.mean() - reference.mean()) / standard_error
+    assert abs(z_mean) < 4, (reference.mean(), kernel.mean())
+
+    # Chi-square on 20 bins with equal counts under the reference distribution
+    edges = np.unique(np.quantile(reference, np.linspace(0, 1, 21)[1:-1]))
+    observed_reference = np.bincount(np.searchsorted(edges, reference, side='right'), minlength=len(edges) + 1)
+    observed_kernel = np.bincount(np.searchsorted(edges, kernel, side='right'), minlength=len(edges) + 1)
+    scale = len(reference) / len(kernel)
+    chi_square = float(np.sum((observed_reference - scale * observed_kernel) ** 2 / (observed_reference + scale * scale * observed_kernel)))
+    degrees = len(edges)
+    z_chi = ((chi_square / degrees) ** (1 / 3) - (1 - 2 / (9 * degrees))) / (2 / (9 * degrees)) ** 0.5  # Wilson-Hilferty
+    assert 1 - NormalDist().cdf(z_chi) > 1e-4, (chi_square, degrees)
@@ -0,0 +1,27 @@
+import pytest
+from RandomGroveHarvesterWithLogic import run_parallel_simulation
+from stratified_grove_engine import run_stratified_simulation, enumerate_configurations
+from grove_fixtures import grove_crops_dict, SIM_ARGS
+
+WEIGHT_COMBINATIONS = [(1, 1, 1), (.55, .55, 1)]
+
+
+def test_sweep_stays_within_its_budget(budget=20000):
+    rows = run_stratified_simulation(grove_crops_dict((1, 1, 1)), *SIM_ARGS, budget, 0, WEIGHT_COMBINATIONS, seed=3)
+    used = rows[0]["Iterations Used"]
+    assert budget - len(enumerate_configurations()) <= used <= budget
+    assert all(row["Std Error"] > 0 for row in rows)
+
+
+def test_budget_too_small_for_the_pilot_raises():
+    with pytest.raises(ValueError, match="too small"):
+        run_stratified_simulation(grove_crops_dict((1, 1, 1)), *SIM_ARGS, 1000, 0, WEIGHT_COMBINATIONS, seed=3)
+
+
+@pytest.mark.parametrize('option, value', [('legacy_upgrades', True), ('crn_seed', 0), ('target_half_width', 2.0), ('tier_accounting', True),
+                                           ('price_scenarios', [(3, 1, 1)]), ('cache_file', 'cache.sqlite'), ('results_file', 'sweep.csv'),
+                                           ('executor', object()), ('profile_file', 'profile.json'), ('sensitivities', True),
+                                           ('distribution_file', 'distributions.json')])
+def test_unsupported_options_raise(option, value):
+    with pytest.raises(ValueError, match=option):
+        run_parallel_simulation(grove_crops_dict((1, 1, 1)), *SIM_ARGS, 20000, 0, WEIGHT_COMBINATIONS, engine='stratified', **{option: value})
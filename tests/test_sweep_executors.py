@@ -0,0 +1,113 @@
+import threading
+import time
+from multiprocessing.connection import Client
+import sweep_executors
+from RandomGroveHarvesterWithLogic import run_parallel_simulation
+from sweep_executors import SocketCoordinator, start_local_workers
+from grove_fixtures import grove_crops_dict, SIM_ARGS
+
+WEIGHT_COMBINATIONS = [(.55, .55, 1), (1, .55, .55), (.55, 1, 1)]
+
+
+def test_coordinator_matches_in_process_run_when_a_worker_dies(workers=3, iterations=12000):
+    # Seeded sweep through a coordinator with several localhost workers, one of which is killed after the first chunk comes back.
+    # The results have to match an in-process run exactly, and so does a second sweep on the same coordinator.
+    crops_dict = grove_crops_dict(WEIGHT_COMBINATIONS[0])
+    expected = run_parallel_simulation(crops_dict, *SIM_ARGS, iterations, 0, WEIGHT_COMBINATIONS, engine='compact', seed=7, block_size=2000)
+
+    coordinator = SocketCoordinator(('127.0.0.1', 0), authkey=b'test')
+    address = coordinator.start()
+    processes = start_local_workers(address, b'test', workers)
+    killed = []
+    def kill_one(weights, stats):
+        if not killed:
+            processes[0].kill()
+            killed.append(weights)
+    try:
+        rows = run_parallel_simulation(crops_dict, *SIM_ARGS, iterations, workers, WEIGHT_COMBINATIONS, engine='compact', seed=7, block_size=2000,
+                                       executor=coordinator, progress_callback=kill_one)
+        again = run_parallel_simulation(crops_dict, *SIM_ARGS, iterations, workers, WEIGHT_COMBINATIONS, engine='compact', seed=7, block_size=2000,
+                                        executor=coordinator)
+    finally:
+        coordinator.close()
+        for process in processes:
+            process.join(timeout=5)
+    assert killed
+    assert rows == expected
+    assert again == expected
+
+
+def sleep_then_return(seconds, value):
+    time.sleep(seconds)
+    return value
+
+
+def run_one_chunk(coordinator, function, args, timeout=10):
+    # Submits one chunk in a sweep of its own and waits for its result
+    finished = threading.Event()
+    results = []
+    def callback(result):
+        results.append(result)
+        finished.set()
+    with coordinator:
+        coordinator.submit(function, args, callback, callback)
+        assert finished.wait(timeout), "Chunk never came back"
+    return results[0]
+
+
+def test_chunk_held_by_a_silent_worker_is_requeued():
+    # A machine that loses power or network never closes its socket. This fake worker takes a chunk and then says nothing,
+    # so the coordinator has to notice the missing heartbeats and hand the chunk to a real worker.
+    coordinator = SocketCoordinator(('127.0.0.1', 0), authkey=b'test', heartbeat_timeout=0.5)
+    address = coordinator.start()
+    silent = Client(address, authkey=b'test')
+    processes = []
+    try:
+        with coordinator:
+            finished = threading.Event()
+            results = []
+            coordinator.submit(pow, (2, 10), lambda result: (results.append(result), finished.set()), results.append)
+            assert silent.poll(5), "The silent worker never got the chunk"
+            silent.recv()
+            processes = start_local_workers(address, b'test', 1)
+            assert finished.wait(10), "The chunk was never requeued"
+        assert results == [1024]
+        assert coordinator.requeued == 1
+    finally:
+        coordinator.close()
+        silent.close()
+        for process in processes:
+            process.join(timeout=5)
+
+
+def test_busy_worker_keeps_its_chunk_with_heartbeats(monkeypatch):
+    # A chunk that runs well past heartbeat_timeout stays with its worker as long as the heartbeats keep coming
+    monkeypatch.setattr(sweep_executors, 'HEARTBEAT_INTERVAL', 0.1) # Forked workers inherit it
+    coordinator = SocketCoordinator(('127.0.0.1', 0), authkey=b'test', heartbeat_timeout=0.5)
+    processes = start_local_workers(coordinator.start(), b'test', 1)
+    try:
+        assert run_one_chunk(coordinator, sleep_then_return, (1.5, 'done')) == 'done'
+        assert coordinator.requeued == 0
+    finally:
+        coordinator.close()
+        for process in processes:
+            process.join(timeout=5)
+
+
+def test_task_timeout_still_requeues_a_busy_worker(monkeypatch):
+    monkeypatch.setattr(sweep_executors, 'HEARTBEAT_INTERVAL', 0.1)
+    coordinator = SocketCoordinator(('127.0.0.1', 0), authkey=b'test', task_timeout=0.5, heartbeat_timeout=0.5)
+    address = coordinator.start()
+    processes = start_local_workers(address, b'test', 1)
+    try:
+        finished = threading.Event()
+        with coordinator:
+            coordinator.submit(sleep_then_return, (3, 'late'), lambda result: finished.set(), lambda error: finished.set())
+            deadline = time.monotonic() + 5
+            while coordinator.requeued == 0 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        assert coordinator.requeued >= 1
+    finally:
+        coordinator.close()
+        for process in processes:
+            process.join(timeout=5)
@@ -0,0 +1,19 @@
+import pytest
+from upgrade_kernel import TransitionTable, binomial_pmf
+
+
+@pytest.mark.parametrize('t1, t2, t3', [(23, 0, 0), (10, 9, 3), (5, 12, 5), (0, 0, 7)])
+def test_alias_table_matches_binomial_products(t1, t2, t3, p=(.05, .2, .25)):
+    # Rebuilds every outcome's probability from the alias table (its own cutoff plus the leftovers of the slots aliased to it)
+    # and compares it with the product of the three binomials
+    size, outcomes, cutoffs, aliases = TransitionTable(*p).build(t1, t2, t3)
+    probabilities = dict.fromkeys(outcomes, 0.0)
+    for i in range(size):
+        probabilities[outcomes[i]] += cutoffs[i] / size
+        probabilities[outcomes[aliases[i]]] += (1 - cutoffs[i]) / size
+    pmf4, pmf3, pmf2 = binomial_pmf(t3, p[0]), binomial_pmf(t2, p[1]), binomial_pmf(t1, p[2])
+    for (d1, d2, d3, d4), probability in probabilities.items():
+        c = -d1
+        b = c - d2
+        assert probability == pytest.approx(pmf4[d4] * pmf3[b] * pmf2[c], abs=1e-12)
+    assert sum(probabilities.values()) == pytest.approx(1, abs=1e-12)
@@ -0,0 +1,146 @@
+import random
+from bisect import bisect_right
+from functools import lru_cache
+from math import comb
+
+# Shared upgrade step for RandomGroveHarvesterWithLogic.py and HarvestSimEXEv4.py.
+# Every seed of a tier upgrades independently with the same odds, so the number of successes in a tier is just Binomial(count, p),
+# and the three tiers of one crop are independent of each other. That makes the whole upgrade of a crop one draw from a fixed joint distribution
+# over (T3->T4, T2->T3, T1->T2) successes that only depends on the crop's (T1, T2, T3) counts and p1-p3.
+# By default that draw comes from a Walker alias table built the first time a crop with those counts is upgraded: one random() and one lookup per crop.
+# Random streams with monotone = True (the common random number streams in random_streams.py) get one inverse-CDF roll per tier instead,
+# since that keeps the result monotone in each roll, which is what lines up CRN partners and makes antithetic pairs roll opposite ways.
+# legacy=True switches back to the original one-roll-per-seed loop, which gives the same distribution and is kept for validation.
+
+
+@lru_cache(maxsize=4096)
+def binomial_cdf_table(n, p):
+    # Cumulative probabilities P(X <= k) for k = 0..n, cached per (n, p) since crops only ever hold a handful of distinct counts
+    table = []
+    total = 0.0
+    for k in range(n + 1):
+        total += comb(n, k) * p ** k * (1 - p) ** (n - k)
+        table.append(total)
+    table[-1] = 1.0 # Guards against float round-off leaving a sliver of probability past the last entry
+    return tuple(table)
+
+
+def binomial_draw(n, p, rng=random, legacy=False):
+    # Number of seeds out of n that upgrade with probability p
+    if n <= 0:
+        return 0
+    if legacy:
+        return sum(rng.random() < p for _ in range(n))
+    return bisect_right(binomial_cdf_table(n, p), rng.random())
+
+
+class TransitionTable:
+    # Alias tables for every (T1, T2, T3) start seen so far under one (p1, p2, p3). Each entry is (size, outcomes, cutoffs, aliases) where
+    # outcomes are the (T1, T2, T3, T4) changes. A grove only ever reaches a few hundred distinct starts, max_states just keeps odd inputs from the GUI in check.
+    __slots__ = ('p1', 'p2', 'p3', 'states', 'max_states')
+
+    def __init__(self, p1, p2, p3, max_states=4096):
+        self.p1, self.p2, self.p3 = p1, p2, p3
+        self.states = {}
+        self.max_states = max_states
+
+    def build(self, t1, t2, t3):
+        # Joint distribution of the three independent binomials, then Vose's version of Walker's alias method
+        pmf4 = binomial_pmf(t3, self.p1)
+        pmf3 = binomial_pmf(t2, self.p2)
+        pmf2 = binomial_pmf(t1, self.p3)
+        outcomes = []
+        weights = []
+        for a, pa in enumerate(pmf4):
+            for b, pb in enumerate(pmf3):
+                for c, pc in enumerate(pmf2):
+                    probability = pa * pb * pc
+                    if probability > 0:
+                        outcomes.append(delta_tuple(a, b, c))
+                        weights.append(probability)
+        size = len(outcomes)
+        total = sum(weights)
+        scaled = [weight * size / total for weight in weights]
+        cutoffs = [1.0] * size
+        aliases = list(range(size))
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            low, high = small.pop(), large[-1]
+            cutoffs[low] = scaled[low]
+            aliases[low] = high
+            scaled[high] -= 1.0 - scaled[low]
+            if scaled[high] < 1.0:
+                small.append(large.pop())
+        # Whatever is left over is 1 up to round-off and keeps cutoff 1.0
+        if len(self.states) >= self.max_states:
+            self.states.clear()
+        entry = self.states[t1, t2, t3] = (size, tuple(outcomes), tuple(cutoffs), tuple(aliases))
+        return entry
+
+    def draw(self, t1, t2, t3, u):
+        # (T1, T2, T3, T4) changes for one upgrade of a crop holding t1/t2/t3 seeds, u is a uniform draw in [0, 1)
+        entry = self.states.get((t1, t2, t3))
+        if entry is None:
+            entry = self.build(t1, t2, t3)
+        size, outcomes, cutoffs, aliases = entry
+        x = u * size
+        i = int(x)
+        if i == size: # u * size can round up to size when u is within an ulp of 1
+            i -= 1
+        return outcomes[i] if x - i < cutoffs[i] else outcomes[aliases[i]]
+
+
+@lru_cache(maxsize=None)
+def delta_tuple(t4_success, t3_success, t2_success):
+    # Shared between every table, so a table only holds references to a few hundred distinct tuples
+    return (-t2_success, t2_success - t3_success, t3_success - t4_success, t4_success)
+
+
+@lru_cache(maxsize=4096)
+def binomial_pmf(n, p):
+    # P(X = k) for k = 0..n
+    return tuple(comb(n, k) * p ** k * (1 - p) ** (n - k) for k in range(n + 1))
+
+
+@lru_cache(maxsize=16)
+def transition_table(p1, p2, p3):
+    # One table per set of upgrade odds, only the most recently used few are kept
+    return TransitionTable(p1, p2, p3)
+
+
+def add_upgrade_scores(scores, n1, n2, n3, t1_success, t2_success, t3_success, p1, p2, p3):
+    # Score function d/dp log P(successes) of one upgrade, k/p - (n - k)/(1 - p) per tier, added to scores[0..2] (p1, p2, p3).
+    # Summed over a grove and multiplied by its seed count this gives an unbiased estimate of dEV/dp, see grove_stats.ScoreGradients
+    scores[0] += t3_success / p1 - (n3 - t3_success) / (1 - p1)
+    scores[1] += t2_success / p2 - (n2 - t2_success) / (1 - p2)
+    scores[2] += t1_success / p3 - (n1 - t1_success) / (1 - p3)
+
+
+def upgrade_crop(crop, p1, p2, p3, rng=random, legacy=False, scores=None):
+    # Upgrades one crop in place. p1 is T3->T4, p2 is T2->T3 and p3 is T1->T2, same as the simulators.
+    # A seed can only move up one tier per upgrade.
+    # scores (a list of at least 3 floats) gets this upgrade's score for p1, p2 and p3 added to it, the draws themselves don't change.
+    if not legacy and (rng is random or not getattr(rng, 'monotone', False)): # The module itself is checked first, a failed getattr on it is slow
+        d1, d2, d3, d4 = transition_table(p1, p2, p3).draw(crop.tier_one, crop.tier_two, crop.tier_three, rng.random())
+        if scores is not None:
+            add_upgrade_scores(scores, crop.tier_one, crop.tier_two, crop.tier_three, -d1, d4 + d3, d4, p1, p2, p3)
+        crop.tier_one += d1
+        crop.tier_two += d2
+        crop.tier_three += d3
+        crop.tier_four += d4
+        return
+    # Tiers rolled top down, one roll per tier (or per seed with legacy)
+    n1, n2, n3 = crop.tier_one, crop.tier_two, crop.tier_three
+    t3_success = binomial_draw(crop.tier_three, p1, rng, legacy)
+    crop.tier_four += t3_success
+
+    t2_success = binomial_draw(crop.tier_two, p2, rng, legacy)
+    crop.tier_three += t2_success - t3_success
+
+    t1_success = binomial_draw(crop.tier_one, p3, rng, legacy)
+    crop.tier_two += t1_success - t2_success
+
+    crop.tier_one -= t1_success
+    if scores is not None:
+        add_upgrade_scores(scores, n1, n2, n3, t1_success, t2_success, t3_success, p1, p2, p3)